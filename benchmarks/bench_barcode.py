@@ -0,0 +1,171 @@
+# Barcode decoding benchmark:
+# Decodes barcodes/QR codes on the frames of a video three ways and reports
+# throughput and decode latency (src/barcodes.py):
+# - full:   both OpenCV detectors on every whole frame, on one thread
+# - crops:  every detection crop of every frame through a pool of --workers
+#           threads, no cache: crops/s and latency per crop
+# - cached: the BarcodeScanner as the pipeline runs it, frames paced at the
+#           video's fps: per-frame cost on the streaming thread (track lookup,
+#           crop, hand-off), crops decoded vs answered from the per-track cache,
+#           crops skipped with the pool full, and decode latency
+# There is no detector here, so stand-in detections are laid out on a grid of
+# --tracks boxes of --box-size (fraction of the frame side); every --track-life
+# seconds they get new track IDs, as if the objects left and others came in.
+# With --untracked they carry no track ID, like the classes the app's tracker
+# does not follow, and are cached by label and box position instead.
+# The codes in resources/barcode.mp4 are too small and blurred at 640x640 for
+# OpenCV to decode, so on that clip every mode reports 0 codes and measures
+# the cost of failed decodes. --stamp-codes draws a QR code (OpenCV's encoder)
+# into every stand-in box, so the modes also measure successful decodes.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_barcode --video barcode.mp4 --workers 1 2 4
+#   python -m benchmarks.bench_barcode --stamp-codes
+import argparse
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+from src.barcodes import BarcodeScanner, crop_gray, decode_codes
+from src.sources import make_source
+
+def load_frames(video, count):
+    frames = []
+    with make_source(video, realtime=False, max_frames=count) as source:
+        while True:
+            frame = source.read()
+            if frame is None:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if source.bgr else frame)
+    return frames, source.fps
+
+# Stand-in detections of frame 'index': (label, track_id, (x0, y0, x1, y1))
+def standin_detections(index, width, height, args, fps):
+    columns = math.ceil(math.sqrt(args.tracks))
+    rows = math.ceil(args.tracks / columns)
+    box_width, box_height = int(width * args.box_size), int(height * args.box_size)
+    generation = int(index / fps / args.track_life)
+    detections = []
+    for track in range(args.tracks):
+        row, column = divmod(track, columns)
+        x0 = int((column + 0.5) * width / columns - box_width / 2)
+        y0 = int((row + 0.5) * height / rows - box_height / 2)
+        track_id = None if args.untracked else generation * args.tracks + track
+        detections.append(("package", track_id, (x0, y0, x0 + box_width, y0 + box_height)))
+    return detections
+
+# Draws a QR code holding the track's number, at 'args.code_size' of the box
+# side, into the middle of every stand-in box of every frame:
+def stamp_codes(frames, fps, args):
+    encoder = cv2.QRCodeEncoder.create()
+    stamped = []
+    for index, frame in enumerate(frames):
+        frame = frame.copy()
+        height, width = frame.shape[:2]
+        for track, (_, _, (x0, y0, x1, y1)) in enumerate(standin_detections(index, width, height, args, fps)):
+            side = int(min(x1 - x0, y1 - y0) * args.code_size)
+            code = cv2.resize(encoder.encode(f"package {track}"), (side, side), interpolation=cv2.INTER_NEAREST)
+            cx, cy = max((x0 + x1 - side) // 2, 0), max((y0 + y1 - side) // 2, 0)
+            patch = frame[cy:cy + side, cx:cx + side]
+            patch[:] = code[:patch.shape[0], :patch.shape[1], None]
+        stamped.append(frame)
+    return stamped
+
+def percentiles(times):
+    times = sorted(times)
+    if not times:
+        return "n/a"
+    return (f"p50 {times[len(times) // 2] * 1000:6.2f} ms, "
+            f"p99 {times[min(int(len(times) * 0.99), len(times) - 1)] * 1000:6.2f} ms")
+
+def run_full(frames):
+    times = []
+    found = 0
+    start = time.perf_counter()
+    for frame in frames:
+        t = time.perf_counter()
+        found += len(decode_codes(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY), min_size=0))
+        times.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    print(f"   full: {len(frames) / elapsed:7.1f} frames/s, {percentiles(times)} per frame, {found} codes")
+
+def run_crops(frames, fps, workers, args):
+    height, width = frames[0].shape[:2]
+    crops = [
+        crop_gray(frame, box)
+        for index, frame in enumerate(frames)
+        for _, _, box in standin_detections(index, width, height, args, fps)
+    ]
+    def decode(crop):
+        t = time.perf_counter()
+        codes = decode_codes(crop, args.min_size)
+        return time.perf_counter() - t, len(codes)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(decode, crops))
+    elapsed = time.perf_counter() - start
+    print(f"  crops: {workers} workers, {len(crops) / elapsed:7.1f} crops/s, "
+          f"{percentiles([t for t, _ in results])} per crop, {sum(n for _, n in results)} codes")
+
+def run_cached(frames, fps, workers, args):
+    height, width = frames[0].shape[:2]
+    scanner = BarcodeScanner(
+        workers=workers, max_pending=args.max_pending, min_size=args.min_size, retry_after=args.retry_after
+    )
+    probe_time = 0.0
+    start = time.monotonic()
+    for index, frame in enumerate(frames):
+        delay = start + index / fps - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        t = time.perf_counter()
+        wanted = scanner.wanted(0, standin_detections(index, width, height, args, fps))
+        if wanted:
+            scanner.scan(frame, wanted)
+        probe_time += time.perf_counter() - t
+    elapsed = time.monotonic() - start
+    scanner.close()
+    stats = scanner.stats()
+    decoded = stats["crops_submitted"]
+    print(
+        f" cached: {workers} workers, {decoded / elapsed:7.1f} crops/s decoded, "
+        f"streaming thread {probe_time / len(frames) * 1e6:6.1f} us/frame, "
+        f"{decoded} decoded / {stats['cache_hits']} cached / {stats['crops_skipped']} skipped, "
+        f"decode p50 {stats['decode_p50_ms'] or 0:.2f} ms, p99 {stats['decode_p99_ms'] or 0:.2f} ms, "
+        f"{stats['tracks_with_codes']} tracks with codes"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark barcode/QR decoding on whole frames and on detection crops.")
+    parser.add_argument("--video", default="barcode.mp4", help="video file (looked up in resources/) or 'synthetic'")
+    parser.add_argument("--frames", type=int, default=192)
+    parser.add_argument("--modes", nargs="+", default=["full", "crops", "cached"], choices=["full", "crops", "cached"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--tracks", type=int, default=6, help="stand-in detections per frame")
+    parser.add_argument("--box-size", type=float, default=0.2, help="stand-in box side, fraction of the frame")
+    parser.add_argument("--untracked", action="store_true", help="stand-in detections without track IDs")
+    parser.add_argument("--track-life", type=float, default=2.0, help="seconds before the stand-in tracks are replaced")
+    parser.add_argument("--min-size", type=int, default=200, help="crops are scaled up to this shorter side")
+    parser.add_argument("--max-pending", type=int, default=4)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--stamp-codes", action="store_true", help="draw a decodable QR code into every stand-in box")
+    parser.add_argument("--code-size", type=float, default=0.6, help="stamped code side, fraction of the box side")
+    args = parser.parse_args()
+
+    frames, fps = load_frames(args.video, args.frames)
+    if args.stamp_codes:
+        frames = stamp_codes(frames, fps, args)
+    height, width = frames[0].shape[:2]
+    print(
+        f"{len(frames)} frames of {width}x{height} at {fps} fps, {args.tracks} stand-in tracks"
+        f"{', QR codes stamped' if args.stamp_codes else ''}"
+    )
+    if "full" in args.modes:
+        run_full(frames)
+    for workers in args.workers:
+        if "crops" in args.modes:
+            run_crops(frames, fps, workers, args)
+        if "cached" in args.modes:
+            run_cached(frames, fps, workers, args)
@@ -0,0 +1,96 @@
+# Event clip benchmark:
+# Feeds JPEG frames encoded from a video (as the clip branch's jpegenc would
+# hand them over) into the clip ring of src/clips.py at the clip frame rate,
+# triggers events at a given rate and reports:
+# - append: time per frame on the appsink thread (copy into the ring arena)
+# - trigger: time per event on the event thread (must never block)
+# - memory held, time span held, and the ring's frame loss for the window
+# - clips written/dropped, write time per clip
+# With --events-per-s above what the writer sustains, dropped clips show the
+# writer falling behind.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_clips --memory-mb 4 8 16 --events-per-s 0.5
+import argparse
+import itertools
+import shutil
+import tempfile
+import time
+import cv2
+
+from src.clips import ClipRecorder
+from src.sources import make_source
+
+def encode_frames(video, count, quality):
+    frames = []
+    with make_source(video, realtime=False, loop=True, max_frames=count) as source:
+        while True:
+            frame = source.read()
+            if frame is None:
+                break
+            frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    return frames
+
+def run(frames, memory_mb, args):
+    directory = tempfile.mkdtemp(prefix="clips-")
+    recorder = ClipRecorder(
+        directory, max_bytes=memory_mb << 20, pre_seconds=args.pre, post_seconds=args.post,
+        clip_fps=args.clip_fps, max_pending=args.max_pending
+    )
+    period_ns = int(1e9 / args.clip_fps)
+    event_every = max(int(args.clip_fps / args.events_per_s), 1) if args.events_per_s > 0 else None
+    append_time = 0.0
+    trigger_time = 0.0
+    triggers = 0
+
+    start = time.monotonic()
+    for i, data in enumerate(itertools.islice(itertools.cycle(frames), args.frames)):
+        # Paced at the clip frame rate, so the writer sees a live ring:
+        delay = start + i / args.clip_fps - time.monotonic()
+        if delay > 0 and not args.fast:
+            time.sleep(delay)
+        pts = i * period_ns
+        t = time.perf_counter()
+        recorder.ring.append(data, pts)
+        append_time += time.perf_counter() - t
+        recorder.note(pts, (("person", 0.9, 1),))
+        if event_every is not None and i >= args.pre * args.clip_fps and i % event_every == 0:
+            t = time.perf_counter()
+            recorder.trigger(pts, "person", 0.9, 1, stream_id=None)
+            trigger_time += time.perf_counter() - t
+            triggers += 1
+
+    # Let the writer finish what it accepted:
+    while recorder.requests.qsize() and time.monotonic() - start < args.frames / args.clip_fps + 30:
+        time.sleep(0.1)
+    recorder.close()
+    stats = recorder.stats()
+    shutil.rmtree(directory)
+
+    print(
+        f"{memory_mb:4d} MB: append {append_time / args.frames * 1e6:6.1f} us/frame, "
+        f"trigger {trigger_time / max(triggers, 1) * 1e6:5.1f} us, "
+        f"held {stats['bytes'] / 2**20:5.1f} MB / {stats['span_s']:4.1f} s, "
+        f"lost {stats['frames_lost']} frames, "
+        f"clips {stats['clips_written']} written / {stats['clips_dropped']} dropped, "
+        f"write {recorder.write_time / max(stats['clips_written'], 1) * 1000:5.1f} ms/clip"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the event clip ring and writer.")
+    parser.add_argument("--video", default="example.mp4", help="video file (looked up in resources/) or 'synthetic'")
+    parser.add_argument("--quality", type=int, default=70, help="JPEG quality, as in clips.clip_branch")
+    parser.add_argument("--memory-mb", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--clip-fps", type=float, default=10)
+    parser.add_argument("--pre", type=float, default=5.0)
+    parser.add_argument("--post", type=float, default=2.0)
+    parser.add_argument("--events-per-s", type=float, default=0.5)
+    parser.add_argument("--max-pending", type=int, default=4)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fast", action="store_true", help="do not pace frames at the clip frame rate")
+    args = parser.parse_args()
+
+    frames = encode_frames(args.video, 100, args.quality)
+    print(f"{len(frames)} frames of {sum(map(len, frames)) / len(frames) / 1024:.0f} kB on average")
+    for memory_mb in args.memory_mb:
+        run(frames, memory_mb, args)
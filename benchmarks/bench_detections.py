@@ -0,0 +1,81 @@
+# Detection extraction benchmark:
+# Per-frame cost of turning a frame's detections into what the callbacks need,
+# for 1 to 100 synthetic detections (benchmarks/fake_hailo.py):
+# - loop:      the previous DetectionEventHandler probe (one tuple per detection)
+# - best loop: the previous callback_func search for the best detection
+# - tuples:    DetectionExtractor.tuples() without filters
+# - batch:     DetectionExtractor batch + to_tuples, no filtering
+# - top-1:     DetectionExtractor.tuples() keeping the best detection
+# - filtered:  DetectionExtractor.tuples() with per-class thresholds,
+#              allowlist, minimum area and top-5 (as the probes call it)
+#
+# The fake objects are plain Python, so getter calls are cheaper than the real
+# pybind11 ones; the gap between the loop and the extractor grows with them.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_detections --counts 1 5 20 50 100
+import argparse
+import time
+
+from benchmarks import fake_hailo
+fake_hailo.install()
+import hailo
+
+from src.detections import DetectionExtractor
+
+def loop_probe(roi):
+    def get_track_id(detection):
+        unique_ids = detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)
+        if not unique_ids:
+            return None
+        return unique_ids[0].get_id()
+    return tuple(
+        (detection.get_label(), detection.get_confidence(), get_track_id(detection))
+        for detection in roi.get_objects_typed(hailo.HAILO_DETECTION)
+    )
+
+def best_loop(roi):
+    best_detection = None
+    best_score = 0.0
+    for detection in roi.get_objects_typed(hailo.HAILO_DETECTION):
+        if detection.get_confidence() > best_score:
+            best_score = detection.get_confidence()
+            best_detection = detection
+    return best_detection
+
+def time_per_frame(function, rois, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for roi in rois:
+            function(roi)
+    return (time.perf_counter() - start) / (repeat * len(rois)) * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-frame detection extraction.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 5, 10, 20, 50, 100], help="detections per frame")
+    parser.add_argument("--frames", type=int, default=200, help="distinct frames per count")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    plain = DetectionExtractor()
+    top1 = DetectionExtractor(top_k=1)
+    filtered = DetectionExtractor(
+        min_confidence=0.5,
+        class_thresholds={"person": 0.6, "car": 0.7},
+        allowlist=["person", "car", "dog", "cat", "bicycle"],
+        min_area=0.006,
+        top_k=5
+    )
+    print(f"{'count':>6} {'loop':>9} {'tuples':>9} {'batch':>9} {'best loop':>10} {'top-1':>9} {'filtered':>9}  (us/frame)")
+    for count in args.counts:
+        detector = fake_hailo.StandInDetector(count)
+        rois = [fake_hailo.HailoROI(detector.detect()) for _ in range(args.frames)]
+        print(
+            f"{count:>6} "
+            f"{time_per_frame(loop_probe, rois, args.repeat):9.1f} "
+            f"{time_per_frame(plain.tuples, rois, args.repeat):9.1f} "
+            f"{time_per_frame(lambda roi: plain.to_tuples(plain(roi)), rois, args.repeat):9.1f} "
+            f"{time_per_frame(best_loop, rois, args.repeat):10.1f} "
+            f"{time_per_frame(top1.tuples, rois, args.repeat):9.1f} "
+            f"{time_per_frame(filtered.tuples, rois, args.repeat):9.1f}"
+        )
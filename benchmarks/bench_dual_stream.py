@@ -0,0 +1,93 @@
+# Dual-stream capture benchmark:
+# Per-frame CPU time of the ingest thread (time.thread_time, as IngestStats
+# counts it) for the full-resolution main stream and for the camera's lores
+# stream at model resolution (src/sources.py, DualStreamCameraSource). The
+# frame is copied into a preallocated buffer with the R/B swap if needed, like
+# FramePool.fill does. 'scale' is the CPU time of scaling the frame down to
+# the lores size, which the main-stream pipeline pays on a streaming thread
+# (videoscale / the inference wrapper) and the lores stream does not.
+#
+# With --camera the real Picamera2 sources are read (on the device); without
+# it the camera's output is simulated from synthetic frames: R, G, B for main
+# and the Pi 5 lores stream, planar YUV420 for the lores stream of older ISPs.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_dual_stream --frames 600
+#   python -m benchmarks.bench_dual_stream --camera --frames 300
+import argparse
+import itertools
+import time
+import cv2
+import numpy as np
+
+from src.sources import PicameraSource, DualStreamCameraSource, SyntheticSource
+
+def ingest(read, bgr, frames, lores_size=None):
+    destination = None
+    ingest_cpu = 0.0
+    scale_cpu = 0.0
+    start = time.perf_counter()
+    for _ in range(frames):
+        cpu_start = time.thread_time()
+        frame = read()
+        if destination is None:
+            destination = np.empty(frame.shape, dtype=np.uint8)
+        if bgr:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=destination)
+        else:
+            np.copyto(destination, frame)
+        ingest_cpu += time.thread_time() - cpu_start
+        if lores_size is not None:
+            cpu_start = time.thread_time()
+            cv2.resize(destination, lores_size, interpolation=cv2.INTER_AREA)
+            scale_cpu += time.thread_time() - cpu_start
+    elapsed = time.perf_counter() - start
+    return frames / elapsed, ingest_cpu * 1000 / frames, scale_cpu * 1000 / frames
+
+def report(name, fps, ingest_ms, scale_ms):
+    print(f"{name:>16}: {fps:7.1f} frames/s, ingest {ingest_ms:6.3f} ms/frame, scale {scale_ms:6.3f} ms/frame, "
+          f"total {ingest_ms + scale_ms:6.3f} ms/frame")
+
+def simulated(args):
+    main = SyntheticSource(args.width, args.height)
+    main.open()
+    lores = SyntheticSource(args.lores_width, args.lores_height)
+    lores.open()
+    lores_yuv = [cv2.cvtColor(frame, cv2.COLOR_RGB2YUV_I420) for frame in lores.frames]
+    rgb = np.empty((args.lores_height, args.lores_width, 3), dtype=np.uint8)
+    lores_size = (args.lores_width, args.lores_height)
+
+    yuv_frames = itertools.cycle(lores_yuv)
+    def read_yuv():
+        cv2.cvtColor(next(yuv_frames), cv2.COLOR_YUV420p2RGB, dst=rgb)
+        return rgb
+
+    report("main", *ingest(main.read, False, args.frames, lores_size))
+    report("main+swap", *ingest(main.read, True, args.frames, lores_size))
+    report("lores rgb", *ingest(lores.read, False, args.frames))
+    report("lores yuv420", *ingest(read_yuv, False, args.frames))
+
+def camera(args):
+    lores_size = (args.lores_width, args.lores_height)
+    with PicameraSource(args.width, args.height, args.fps) as source:
+        report("main", *ingest(source.read, source.bgr, args.frames, lores_size))
+    for keep_main in (False, True):
+        with DualStreamCameraSource(args.width, args.height, args.fps, *lores_size, keep_main=keep_main) as source:
+            name = f"lores {source.lores_format.lower()}" + (" +main" if keep_main else "")
+            report(name, *ingest(source.read, source.bgr, args.frames))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest CPU per frame for main-stream and lores-stream capture.")
+    parser.add_argument("--camera", action="store_true", help="read the Pi camera instead of simulated frames")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--lores-width", type=int, default=640)
+    parser.add_argument("--lores-height", type=int, default=360)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--frames", type=int, default=600)
+    args = parser.parse_args()
+
+    if args.camera:
+        camera(args)
+    else:
+        simulated(args)
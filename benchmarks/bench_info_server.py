@@ -0,0 +1,89 @@
+# SLM/TTS server throughput benchmark:
+# Many simulated detectors send labels over the framed channel and wait for
+# the resume message, against a fake Ollama endpoint with a fixed delay.
+# Compares the blocking serve_channel loop with the asyncio server mode.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_info_server --detectors 8 --labels 5 --delay 0.2
+import argparse
+import asyncio
+import contextlib
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_ollama import start_fake_ollama
+from src.info_server import LabelProcessingServer, AsyncLabelProcessingServer
+from src.ipc import make_socket, send_message, recv_message, MSG_LABEL, MSG_RESUME
+
+def detector(address, labels, latencies, lock):
+    with make_socket(address) as sock:
+        while True:
+            try:
+                sock.connect(address)
+                break
+            except OSError:
+                time.sleep(0.01)
+        for i in range(labels):
+            start = time.perf_counter()
+            send_message(sock, {"type": MSG_LABEL, "id": i, "label": "cat", "confidence": 0.9, "track_id": i})
+            while recv_message(sock)["type"] != MSG_RESUME:
+                pass
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+def run_detectors(name, address, detectors, labels):
+    latencies = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=detector, args=(address, labels, latencies, lock))
+        for _ in range(detectors)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    return (
+        f"{name:>8}: {len(latencies) / elapsed:7.2f} labels/s, "
+        f"latency p50 {p50 * 1000:8.1f} ms, p99 {p99 * 1000:8.1f} ms"
+    )
+
+def configure(server, url):
+    server.ollama_url = url
+    server.speech_time = 0
+    return server
+
+def bench_sync(address, url, detectors, labels):
+    server = configure(LabelProcessingServer(channel_address=address, use_cache=False), url)
+    threading.Thread(target=server.serve_channel, daemon=True).start()
+    return run_detectors("blocking", address, detectors, labels)
+
+def bench_async(address, url, detectors, labels, workers):
+    server = configure(AsyncLabelProcessingServer(channel_address=address, workers=workers, use_cache=False), url)
+    threading.Thread(target=asyncio.run, args=(server.serve(),), daemon=True).start()
+    return run_detectors("asyncio", address, detectors, labels)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark LabelProcessingServer throughput.")
+    parser.add_argument("--detectors", type=int, default=8)
+    parser.add_argument("--labels", type=int, default=5, help="labels sent by each detector")
+    parser.add_argument("--delay", type=float, default=0.2, help="fake Ollama reply delay in seconds")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent generations in asyncio mode")
+    parser.add_argument("--port", type=int, default=11500)
+    args = parser.parse_args()
+
+    fake_ollama, url = start_fake_ollama(args.port, args.delay)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            results.append(bench_sync(os.path.join(tmp, "sync.sock"), url, args.detectors, args.labels))
+            results.append(bench_async(os.path.join(tmp, "async.sock"), url, args.detectors, args.labels, args.workers))
+    for result in results:
+        print(result)
@@ -0,0 +1,82 @@
+# Ingest micro-benchmark:
+# Pushes synthetic frames through 'appsrc ! fakesink' using the legacy conversion
+# and the pooled ingest path from src/camera.py, and reports frames/s and bytes
+# copied per frame for each. The pooled figure is FramePool's own count of the
+# bytes it copied. The legacy one is an estimate, LEGACY_COPIES_PER_FRAME times
+# the frame size: the copy made inside Gst.Buffer.new_wrapped is not visible
+# from Python, so it is not measured.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_ingest --width 1280 --height 720 --frames 600
+import argparse
+import time
+import gi
+import numpy as np
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+from src.camera import FramePool, legacy_frame_to_buffer, LEGACY_COPIES_PER_FRAME
+
+def build_pipeline(width, height):
+    pipeline = Gst.parse_launch(
+        "appsrc name=app_source is-live=false format=time block=true max-buffers=3 ! "
+        "fakesink sync=false"
+    )
+    caps = Gst.Caps.from_string(
+        f"video/x-raw, format=RGB, width={width}, height={height}, "
+        f"framerate=30/1, pixel-aspect-ratio=1/1"
+    )
+    app_source = pipeline.get_by_name("app_source")
+    app_source.set_property("caps", caps)
+    pipeline.set_state(Gst.State.PLAYING)
+    return pipeline, app_source, caps
+
+def run_path(name, width, height, frames, make_buffer, estimate=None):
+    pipeline, app_source, caps = build_pipeline(width, height)
+    # Same frame every time - the camera hands us a new array anyway, and
+    # regenerating noise would dominate the measurement.
+    frame = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+    duration = Gst.util_uint64_scale_int(1, Gst.SECOND, 30)
+
+    to_buffer, teardown = make_buffer(caps)
+    start = time.perf_counter()
+    for i in range(frames):
+        gst_buffer = to_buffer(frame)
+        gst_buffer.pts = i * duration
+        gst_buffer.duration = duration
+        app_source.emit("push-buffer", gst_buffer)
+    elapsed = time.perf_counter() - start
+
+    app_source.emit("end-of-stream")
+    pipeline.set_state(Gst.State.NULL)
+    copied = teardown()
+    print(
+        f"{name:>8}: {frames / elapsed:8.1f} frames/s, "
+        f"{copied / frames / 1e6:6.2f} MB copied/frame" + (f" (estimate: {estimate})" if estimate else "")
+    )
+
+def legacy_path(width, height, frames):
+    def make_buffer(caps):
+        return legacy_frame_to_buffer, lambda: frames * width * height * 3 * LEGACY_COPIES_PER_FRAME
+    run_path("legacy", width, height, frames, make_buffer, estimate=f"{LEGACY_COPIES_PER_FRAME} copies of the frame")
+
+def pooled_path(width, height, frames, swap_rb):
+    def make_buffer(caps):
+        frame_pool = FramePool(caps, width, height)
+        def teardown():
+            frame_pool.close()
+            return frame_pool.bytes_copied
+        return lambda frame: frame_pool.fill(frame, swap_rb), teardown
+    run_path("pooled" + ("+swap" if swap_rb else ""), width, height, frames, make_buffer)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the camera ingest paths.")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=600)
+    args = parser.parse_args()
+
+    Gst.init(None)
+    legacy_path(args.width, args.height, args.frames)
+    pooled_path(args.width, args.height, args.frames, swap_rb=False)
+    pooled_path(args.width, args.height, args.frames, swap_rb=True)
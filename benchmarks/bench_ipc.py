@@ -0,0 +1,101 @@
+# IPC round-trip benchmark:
+# Measures label -> resume latency between the detector side and the
+# LabelProcessingServer, with label processing stubbed out, for:
+# - legacy:  one TCP connection per label, resume over a second listening socket
+# - channel: the persistent framed channel from src/ipc.py (Unix socket and TCP)
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_ipc --rounds 500
+import argparse
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+from src.info_server import LabelProcessingServer
+from src.ipc import LabelChannel, MSG_RESUME
+
+class StubServer(LabelProcessingServer):
+    def process_label(self, label):
+        pass
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1e6
+    print(f"{name:>14}: p50 {p50:8.1f} us, p99 {p99:8.1f} us, mean {statistics.mean(latencies) * 1e6:8.1f} us")
+
+# Waits for 'event', failing the benchmark if a server thread died and it never comes:
+def wait_for(event, timeout, what):
+    if not event.wait(timeout):
+        raise SystemExit(f"No {what} within {timeout} s, is the server thread still running?")
+
+# Mirrors send_label_thread and resume_pipeline_thread from callbacks.py
+# (which need the hailo module) on the detector side.
+def bench_legacy(rounds, label_port, resume_port, timeout):
+    server = StubServer(label_port=label_port, resume_port=resume_port, use_cache=False)
+    threading.Thread(target=server.listen_for_label, daemon=True).start()
+
+    resumed = threading.Event()
+    def resume_listener():
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind(('localhost', resume_port))
+            listener.listen(1)
+            while True:
+                conn, addr = listener.accept()
+                with conn:
+                    if conn.recv(1024).decode().strip() == "resume":
+                        resumed.set()
+    threading.Thread(target=resume_listener, daemon=True).start()
+
+    def send_label(label):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.connect(('localhost', label_port))
+            s.sendall(label.encode())
+
+    time.sleep(0.2)
+    latencies = []
+    for _ in range(rounds):
+        resumed.clear()
+        start = time.perf_counter()
+        threading.Thread(target=send_label, args=("person",), daemon=True).start()
+        wait_for(resumed, timeout, "legacy resume")
+        latencies.append(time.perf_counter() - start)
+    report("legacy", latencies)
+
+def bench_channel(name, rounds, address, timeout):
+    server = StubServer(channel_address=address, use_cache=False)
+    threading.Thread(target=server.serve_channel, daemon=True).start()
+
+    resumed = threading.Event()
+    def on_message(message):
+        if message.get("type") == MSG_RESUME:
+            resumed.set()
+    time.sleep(0.2)
+    channel = LabelChannel(address, on_message=on_message, reconnect_delay=0.05)
+    wait_for(channel.connected, timeout, f"{name} connection")
+
+    latencies = []
+    for _ in range(rounds):
+        resumed.clear()
+        start = time.perf_counter()
+        channel.send_label("person", 0.9, 1)
+        wait_for(resumed, timeout, f"{name} resume")
+        latencies.append(time.perf_counter() - start)
+    channel.close()
+    report(name, latencies)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark detector <-> SLM/TTS server round trips.")
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--port", type=int, default=15001, help="first of three consecutive TCP ports to use")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds to wait for a resume before failing")
+    args = parser.parse_args()
+
+    bench_legacy(args.rounds, args.port, args.port + 1, args.timeout)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_channel("channel (unix)", args.rounds, os.path.join(tmp, "slm.sock"), args.timeout)
+    bench_channel("channel (tcp)", args.rounds, ('localhost', args.port + 2), args.timeout)
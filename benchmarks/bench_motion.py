@@ -0,0 +1,47 @@
+# Motion gate benchmark:
+# Replays a video with the picture frozen for --freeze seconds in the middle
+# (a static scene) and reports how many frames the MotionGate skips, what the
+# gate costs per frame, and its reaction latency when motion starts again.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_motion --source example.mp4 --freeze 20
+import argparse
+import time
+
+from src.motion import MotionGate
+from src.sources import make_source
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ingest motion gate.")
+    parser.add_argument("--source", default="example.mp4", help="video file (looked up in resources/) or 'synthetic'")
+    parser.add_argument("--live", type=float, default=5, help="seconds of live video before and after the freeze")
+    parser.add_argument("--freeze", type=float, default=20, help="seconds the picture stays frozen")
+    parser.add_argument("--hold", type=float, default=2, help="MotionGate hold time in seconds")
+    args = parser.parse_args()
+
+    source = make_source(args.source, realtime=False)
+    gate = MotionGate(hold_time=args.hold)
+    fps = source.fps
+    live_frames = int(args.live * fps)
+    freeze_frames = int(args.freeze * fps)
+
+    gate_time = 0.0
+    frames = 0
+    with source:
+        frame = None
+        for i in range(2 * live_frames + freeze_frames):
+            # Reads stop during the freeze, so the same frame is shown again:
+            if frame is None or not (live_frames <= i < live_frames + freeze_frames):
+                frame = source.read()
+                if frame is None:
+                    break
+            start = time.perf_counter()
+            gate.admit(frame, now=i / fps)
+            gate_time += time.perf_counter() - start
+            frames += 1
+
+    stats = gate.stats()
+    print(f"source {args.source} ({source.width}x{source.height} @ {fps} fps), {frames} frames")
+    print(f"inferred {stats['inferred']}, skipped {stats['skipped']} ({stats['skipped'] / frames:.0%})")
+    print(f"gate cost {gate_time / frames * 1e6:.1f} us/frame")
+    print(f"activations {stats['activations']}, reaction latency avg {stats['avg_reaction_ms']} ms, max {stats['max_reaction_ms']} ms")
@@ -0,0 +1,126 @@
+# Multi-stream scaling benchmark:
+# Runs 1..N file sources through one stand-in inference stage (the app's
+# pipeline as bench_pipeline builds it, the streams merged by hailoroundrobin,
+# or a funnel without TAPPAS, in front of the detection gate) and reports
+# aggregate and per-stream fps at the callback, split by the stream ID carried
+# in the PTS.
+#
+# The stand-in NPU works in batches like hailonet: every --batch-size frames it
+# holds the streaming thread for --npu-overhead-ms + batch * --npu-frame-ms, so
+# a fuller batch costs less per frame. In 'live' mode each stream is paced at
+# its video's fps, so aggregate fps should grow with N until the NPU saturates;
+# in 'fast' mode the streams push as fast as they can.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_multistream --streams 1 2 3 4 --batch-size 4
+import argparse
+import threading
+import time
+
+from benchmarks.bench_pipeline import app_pipeline_string, standin_pipeline, run_isolated
+
+DEFAULT_VIDEOS = ["example.mp4", "example_640.mp4", "barcode.mp4"]
+
+def run_streams(config, results):
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+    from src.camera import push_thread_func, stream_source_name, IngestStats
+    from src.streams import stream_of
+    from src.sources import make_source
+
+    Gst.init(None)
+    sources = [
+        make_source(config["videos"][i % len(config["videos"])], realtime=config["live"], loop=True,
+                    max_frames=config["frames"])
+        for i in range(config["streams"])
+    ]
+    pipeline, handler = standin_pipeline(
+        app_pipeline_string(sources, 0, batch_size=config["batch_size"]), config["detections"]
+    )
+
+    batch = {"frames": 0}
+    def npu(pad, info):
+        if info.get_buffer() is None:
+            return Gst.PadProbeReturn.OK
+        batch["frames"] += 1
+        if batch["frames"] == config["batch_size"]:
+            time.sleep((config["npu_overhead_ms"] + config["batch_size"] * config["npu_frame_ms"]) / 1000)
+            batch["frames"] = 0
+        return Gst.PadProbeReturn.OK
+    pipeline.get_by_name("inference_hailonet").get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, npu)
+
+    per_stream = [0] * config["streams"]
+    def count(pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            per_stream[stream_of(buffer.pts)] += 1
+        return Gst.PadProbeReturn.OK
+    pipeline.get_by_name("identity_callback").get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, count)
+    handler.start()
+
+    pipeline.set_state(Gst.State.PLAYING)
+    start = time.monotonic()
+    threads = []
+    for stream_id, source in enumerate(sources):
+        thread = threading.Thread(
+            target=push_thread_func,
+            args=(pipeline, source, config["ingest"], None, IngestStats()),
+            kwargs={"stream_id": stream_id, "element_name": stream_source_name(stream_id)},
+            daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+
+    message = pipeline.get_bus().timed_pop_filtered(
+        int(config["timeout"] * Gst.SECOND), Gst.MessageType.EOS | Gst.MessageType.ERROR
+    )
+    elapsed = time.monotonic() - start
+    handler.stop()
+    pipeline.set_state(Gst.State.NULL)
+    if message is None or message.type == Gst.MessageType.ERROR:
+        results.put({"error": message.parse_error()[0].message if message is not None else "no end of stream"})
+        return
+    results.put({
+        "fps": sum(per_stream) / elapsed,
+        "stream_fps": [frames / elapsed for frames in per_stream],
+        "probe_us": handler.probe_timer.percentiles()
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark aggregate fps with several streams sharing one inference stage.")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--videos", nargs="+", default=DEFAULT_VIDEOS, help="video files, assigned to the streams in turn")
+    parser.add_argument("--modes", nargs="+", default=["live", "fast"], choices=["live", "fast"])
+    parser.add_argument("--ingest", default="pooled", choices=["pooled", "legacy"])
+    parser.add_argument("--frames", type=int, default=300, help="frames per stream")
+    parser.add_argument("--detections", type=int, default=5, help="synthetic detections per frame")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--npu-overhead-ms", type=float, default=8.0, help="stand-in NPU cost per batch")
+    parser.add_argument("--npu-frame-ms", type=float, default=4.0, help="stand-in NPU cost per frame")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        for streams in args.streams:
+            config = {
+                "streams": streams,
+                "videos": args.videos,
+                "live": mode == "live",
+                "ingest": args.ingest,
+                "frames": args.frames,
+                "detections": args.detections,
+                "batch_size": args.batch_size,
+                "npu_overhead_ms": args.npu_overhead_ms,
+                "npu_frame_ms": args.npu_frame_ms,
+                "timeout": args.timeout
+            }
+            result = run_isolated(config, target=run_streams)
+            if "error" in result:
+                print(f"{mode:>4} x{streams}: {result['error']}")
+                continue
+            print(
+                f"{mode:>4} x{streams}: {result['fps']:6.1f} fps aggregate, per stream "
+                f"{', '.join(f'{fps:.1f}' for fps in result['stream_fps'])}, "
+                f"probe p50 {result['probe_us'].get('p50_us', 0):.1f} us"
+            )
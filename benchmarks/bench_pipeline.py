@@ -0,0 +1,285 @@
+# Detection pipeline benchmark (no Hailo hardware needed):
+# Builds the pipeline through GstDetectionApp.get_pipeline_string() with
+# stand-ins for the Hailo elements (app_pipeline_string below) and feeds it the
+# bundled videos through the app's own ingest path (push_thread_func), probe
+# and event handler:
+# - hailonet: an identity that holds each frame for --inference-ms (the NPU
+#   time); a probe on it attaches synthetic detections (benchmarks/fake_hailo.py)
+# - hailocropper/hailoaggregator, hailotracker: identities with the same names,
+#   so the queues, probes and trace stages sit where they do in the app
+#
+# Each configuration runs in its own process, so peak memory is per run:
+# - fps:         sustained frames/s at the callback probe
+# - probe_us:    DetectionEventHandler probe cost percentiles
+# - latency_ms:  capture -> callback probe, and capture -> event logic
+# - rss_mb:      peak RSS and RSS growth after the first second
+#
+# Results are written as JSON (one file per commit); pass --baseline with an
+# older file to print the differences.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_pipeline --frames 300
+#   python -m benchmarks.bench_pipeline --baseline benchmarks/results/pipeline-abc1234.json
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import subprocess
+import threading
+import time
+
+DEFAULT_VIDEOS = ["example.mp4", "example_640.mp4", "barcode.mp4"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Stand-in app pipeline:
+# The string GstDetectionApp.get_pipeline_string() builds for 'sources', with
+# hailo_apps_infra's helpers replaced by the stand-ins of fake_hailo.py and any
+# Hailo plugin the app names itself (hailoroundrobin, hailooverlay) replaced if
+# it is not installed. The app is constructed as it runs (profile, frame
+# sources, sizes); only create_pipeline() is overridden, to keep the string
+# instead of parsing it. 'options' are app attributes set before the string is
+# built, e.g. preview_port=None or clip_dir.
+def app_pipeline_string(sources, inference_ms=0.0, batch_size=2, **options):
+    import signal
+    from benchmarks import fake_hailo
+    fake_hailo.install()
+    fake_hailo.install_helpers(inference_ms)
+    from src.callbacks import DetectionEventHandler
+    from src.events import REACTION_PAUSE
+    from src.config import DEFAULT_PROFILE
+    from src.gst_v2_detection_app import GstDetectionApp
+
+    class PipelineStringApp(GstDetectionApp):
+        def create_pipeline(self):
+            for name, value in options.items():
+                setattr(self, name, value)
+            self.pipeline_string = fake_hailo.replace_missing_elements(self.get_pipeline_string())
+
+    profile = dict(DEFAULT_PROFILE, batch_size=batch_size, video_fps=sources[0].fps)
+    sigint = signal.getsignal(signal.SIGINT)
+    # Pause mode, so no detection gate is looked up in the pipeline that is never made:
+    app = PipelineStringApp(None, DetectionEventHandler(reaction_mode=REACTION_PAUSE), frame_source=list(sources), profile=profile)
+    signal.signal(signal.SIGINT, sigint)
+    return app.pipeline_string
+
+# Stand-in pipeline harness:
+# Parses 'pipeline_string' (see app_pipeline_string), attaches 'detections'
+# synthetic detections per frame behind the stand-in hailonet and probes
+# identity_callback with a quiet event handler (src/callbacks.py), as the app's
+# attach_probes does. Returns (pipeline, handler); the handler is not started.
+def standin_pipeline(pipeline_string, detections=5):
+    from gi.repository import Gst
+    from benchmarks import fake_hailo
+    fake_hailo.install()
+    from src.callbacks import quiet_handler
+
+    pipeline = Gst.parse_launch(pipeline_string)
+    detector = fake_hailo.StandInDetector(detections)
+    def attach_detections(pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            fake_hailo.attach(buffer.pts, detector.detect())
+        return Gst.PadProbeReturn.OK
+    pipeline.get_by_name("inference_hailonet").get_static_pad("src").add_probe(
+        Gst.PadProbeType.BUFFER, attach_detections
+    )
+
+    handler = quiet_handler()
+    handler.pipeline = pipeline
+    pipeline.get_by_name("identity_callback").get_static_pad("src").add_probe(
+        Gst.PadProbeType.BUFFER, handler.__call__, handler
+    )
+    return pipeline, handler
+
+def percentiles(values, points=(50, 90, 99)):
+    values = sorted(values)
+    if not values:
+        return {}
+    result = {f"p{p}": values[min(len(values) * p // 100, len(values) - 1)] for p in points}
+    result["max"] = values[-1]
+    return result
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+def run_config(config, results):
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+    from src.camera import push_thread_func, IngestStats
+    from src.sources import make_source
+    from src.tracing import FrameTracer, stage_latencies
+
+    Gst.init(None)
+    source = make_source(config["video"], realtime=config["live"], max_frames=config["frames"])
+    # No event ever fires: sending labels is measured by bench_ipc, here the
+    # pipeline has to keep running at full rate.
+    pipeline, handler = standin_pipeline(app_pipeline_string([source], config["inference_ms"]), config["detections"])
+
+    tracer = FrameTracer(sample_every=1, max_frames=1024)
+    tracer.attach(pipeline, [
+        ("source", "app_source"),
+        ("inference", "inference_wrapper_agg"),
+        ("callback", "identity_callback"),
+    ])
+    handler.tracer = tracer
+    handler.start()
+
+    stats = IngestStats()
+    pipeline.set_state(Gst.State.PLAYING)
+    start = time.monotonic()
+    push_thread = threading.Thread(
+        target=push_thread_func,
+        args=(pipeline, source, config["ingest"], None, stats, tracer),
+        daemon=True
+    )
+    push_thread.start()
+
+    # Wait for the end of stream, sampling RSS once the pipeline has warmed up:
+    bus = pipeline.get_bus()
+    warm_rss = None
+    while True:
+        message = bus.timed_pop_filtered(100 * Gst.MSECOND, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+        if warm_rss is None and time.monotonic() - start > 1.0:
+            warm_rss = rss_mb()
+        if message is None:
+            continue
+        if message.type == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            results.put({"error": f"{err}: {debug}"})
+            pipeline.set_state(Gst.State.NULL)
+            return
+        break
+    elapsed = time.monotonic() - start
+    time.sleep(0.2)  # let the event thread drain the ring
+    handler.stop()
+    push_thread.join(timeout=1)
+    pipeline.set_state(Gst.State.NULL)
+
+    latencies = stage_latencies(tracer, ["callback", "event_logic"])
+    end_rss = rss_mb()
+    results.put({
+        "frames": handler.fcount,
+        "fps": handler.fcount / elapsed if elapsed else None,
+        "probe_us": handler.probe_timer.percentiles(),
+        "latency_ms": {stage: percentiles(values) for stage, values in latencies.items()},
+        "ingest": vars(stats),
+        "event_queue": handler.events.stats(),
+        "rss_mb": {
+            "peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "growth": end_rss - warm_rss if warm_rss is not None else None
+        }
+    })
+
+def config_name(config):
+    mode = "live" if config["live"] else "fast"
+    return f'{config["video"]}/{config["ingest"]}/{mode}/{config["detections"]}det'
+
+def run_isolated(config, target=run_config):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=target, args=(config, results))
+    process.start()
+    deadline = time.monotonic() + config["timeout"]
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=0.5)
+        except queue.Empty:
+            if not process.is_alive():
+                result = {"error": f"benchmark process exited with code {process.exitcode}"}
+            elif time.monotonic() > deadline:
+                result = {"error": "timed out"}
+    process.join(timeout=5)
+    if process.is_alive():
+        process.kill()
+    return result
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {run["name"]: run for run in json.load(f)["runs"]}
+    print(f"\nCompared with {baseline_path}:")
+    for run in results:
+        old = baseline.get(run["name"])
+        if old is None or "error" in old or "error" in run:
+            continue
+        def change(new_value, old_value):
+            if not new_value or not old_value:
+                return "   n/a"
+            return f"{(new_value - old_value) / old_value * 100:+6.1f}%"
+        print(
+            f'{run["name"]:>40}: fps {change(run["fps"], old["fps"])}, '
+            f'callback p50 {change(run["latency_ms"]["callback"].get("p50"), old["latency_ms"]["callback"].get("p50"))}, '
+            f'probe p50 {change(run["probe_us"].get("p50_us"), old["probe_us"].get("p50_us"))}, '
+            f'peak rss {change(run["rss_mb"]["peak"], old["rss_mb"]["peak"])}'
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline with stand-in Hailo elements.")
+    parser.add_argument("--videos", nargs="+", default=DEFAULT_VIDEOS, help="video files (looked up in resources/) or 'synthetic'")
+    parser.add_argument("--ingest", nargs="+", default=["pooled", "legacy"], choices=["pooled", "legacy"])
+    parser.add_argument("--modes", nargs="+", default=["fast", "live"], choices=["fast", "live"],
+                        help="fast: push frames as fast as possible, live: pace them at the video's fps")
+    parser.add_argument("--detections", type=int, nargs="+", default=[5], help="synthetic detections per frame")
+    parser.add_argument("--inference-ms", type=float, default=12.0, help="time the stand-in NPU holds each frame")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-configuration timeout in seconds")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/pipeline-<commit>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    runs = []
+    for video in args.videos:
+        for ingest in args.ingest:
+            for mode in args.modes:
+                for detections in args.detections:
+                    config = {
+                        "video": video,
+                        "ingest": ingest,
+                        "live": mode == "live",
+                        "detections": detections,
+                        "inference_ms": args.inference_ms,
+                        "frames": args.frames,
+                        "timeout": args.timeout
+                    }
+                    name = config_name(config)
+                    result = run_isolated(config)
+                    runs.append({"name": name, "config": config, **result})
+                    if "error" in result:
+                        print(f"{name:>40}: {result['error']}")
+                        continue
+                    print(
+                        f"{name:>40}: {result['fps']:6.1f} fps, "
+                        f"probe p50 {result['probe_us'].get('p50_us', 0):6.1f} us, "
+                        f"latency p50/p99 {result['latency_ms']['callback'].get('p50', 0):6.1f}/"
+                        f"{result['latency_ms']['callback'].get('p99', 0):6.1f} ms, "
+                        f"peak rss {result['rss_mb']['peak']:6.1f} MB"
+                    )
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "inference_ms": args.inference_ms,
+            "runs": runs
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        compare(runs, args.baseline)
@@ -0,0 +1,123 @@
+# Preview overhead benchmark:
+# Runs the app's pipeline with the stand-in Hailo elements of bench_pipeline
+# three ways and reports frames/s at the callback and process CPU per frame:
+# - none:   preview_port=None, the app leaves the preview branch out
+# - idle:   preview branch teed off after the callback, valve closed, no client
+# - client: one HTTP client reading /stream.mjpg, so the branch decimates,
+#           draws (an identity stands in for hailooverlay if it is not
+#           installed) and encodes
+# 'idle' should match 'none' within the noise: that is the cost of the preview
+# while nobody watches.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_preview --frames 600 --repeat 3
+import argparse
+import os
+import threading
+import time
+import urllib.request
+
+from benchmarks.bench_pipeline import app_pipeline_string, standin_pipeline, run_isolated
+
+MODES = ["none", "idle", "client"]
+
+def run_preview(config, results):
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+    from src.camera import push_thread_func, IngestStats
+    from src.preview import PreviewServer
+    from src.sources import make_source
+
+    Gst.init(None)
+    source = make_source(config["video"], realtime=config["live"], max_frames=config["frames"])
+    if config["mode"] == "none":
+        pipeline_string = app_pipeline_string([source], config["inference_ms"], preview_port=None, clip_dir=None)
+    else:
+        pipeline_string = app_pipeline_string(
+            [source], config["inference_ms"], preview_port=config["port"], preview_fps=config["preview_fps"], clip_dir=None
+        )
+    pipeline, handler = standin_pipeline(pipeline_string)
+    handler.start()
+
+    server = None
+    client_frames = [0]
+    if config["mode"] != "none":
+        server = PreviewServer(config["port"])
+        server.attach(pipeline)
+        server.start()
+    if config["mode"] == "client":
+        def client():
+            with urllib.request.urlopen(f"http://127.0.0.1:{config['port']}/stream.mjpg") as stream:
+                while True:
+                    line = stream.readline()
+                    if not line:
+                        return
+                    if line.startswith(b"Content-Length:"):
+                        client_frames[0] += 1
+        threading.Thread(target=client, daemon=True).start()
+        while server.hub.clients == 0:
+            time.sleep(0.01)
+
+    pipeline.set_state(Gst.State.PLAYING)
+    cpu_start = os.times()
+    start = time.monotonic()
+    push_thread = threading.Thread(
+        target=push_thread_func, args=(pipeline, source, "pooled", None, IngestStats()), daemon=True
+    )
+    push_thread.start()
+    message = pipeline.get_bus().timed_pop_filtered(
+        int(config["timeout"] * Gst.SECOND), Gst.MessageType.EOS | Gst.MessageType.ERROR
+    )
+    elapsed = time.monotonic() - start
+    cpu_end = os.times()
+    handler.stop()
+    pipeline.set_state(Gst.State.NULL)
+    if server is not None:
+        server.stop()
+    if message is None or message.type == Gst.MessageType.ERROR:
+        results.put({"error": message.parse_error()[0].message if message is not None else "no end of stream"})
+        return
+    cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    results.put({
+        "fps": handler.fcount / elapsed,
+        "cpu_ms_per_frame": cpu * 1000 / max(handler.fcount, 1),
+        "preview_frames": client_frames[0]
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cost of the MJPEG preview branch with and without clients.")
+    parser.add_argument("--video", default="example.mp4", help="video file (looked up in resources/) or 'synthetic'")
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--live", action="store_true", help="pace frames at the video's fps instead of pushing them as fast as possible")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--inference-ms", type=float, default=0.0, help="time the stand-in NPU holds each frame")
+    parser.add_argument("--preview-fps", type=int, default=5)
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode; the best is reported")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        runs = []
+        for _ in range(args.repeat):
+            config = {
+                "mode": mode,
+                "video": args.video,
+                "live": args.live,
+                "frames": args.frames,
+                "inference_ms": args.inference_ms,
+                "preview_fps": args.preview_fps,
+                "port": args.port,
+                "timeout": args.timeout
+            }
+            runs.append(run_isolated(config, target=run_preview))
+        errors = [run["error"] for run in runs if "error" in run]
+        if errors:
+            print(f"{mode:>7}: {errors[0]}")
+            continue
+        best = max(runs, key=lambda run: run["fps"])
+        print(
+            f"{mode:>7}: {best['fps']:7.1f} fps, {min(run['cpu_ms_per_frame'] for run in runs):6.3f} ms CPU/frame, "
+            f"{best['preview_frames']} preview frames sent"
+        )
@@ -0,0 +1,85 @@
+# Process-split benchmark:
+# Compares capture + colour conversion in the detector process (one thread per
+# stream, as push_thread_func does today) with ProcessFrameSource, where each
+# stream is captured by its own process into a shared-memory ring. Per frame,
+# the consumer copies the frame into a preallocated buffer (what
+# FramePool.fill does) and then spends --python-us of pure Python work holding
+# the GIL, standing in for the pad probes and event logic of the pipeline.
+#
+# Reports aggregate frames/s and CPU use (cores) of the detector process and
+# of the capture processes, for 1..N streams of replayed video.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_process_split --streams 1 2 4 --frames 600
+import argparse
+import resource
+import threading
+import time
+import cv2
+import numpy as np
+
+from src.shared_frames import ProcessFrameSource
+from src.sources import make_source
+
+def python_work(microseconds):
+    deadline = time.perf_counter() + microseconds / 1e6
+    count = 0
+    while time.perf_counter() < deadline:
+        count += 1
+    return count
+
+def consume(source, frames, python_us, counts, index):
+    destination = np.empty((source.height, source.width, 3), dtype=np.uint8)
+    with source:
+        while counts[index] < frames:
+            frame = source.read()
+            if frame is None:
+                break
+            if source.bgr:
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=destination)
+            else:
+                np.copyto(destination, frame)
+            python_work(python_us)
+            counts[index] += 1
+
+def cpu_seconds(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+def run(mode, streams, video, frames, python_us):
+    sources = []
+    for _ in range(streams):
+        source = make_source(video, realtime=False, loop=True, max_frames=frames)
+        sources.append(ProcessFrameSource(source) if mode == "split" else source)
+
+    counts = [0] * streams
+    threads = [
+        threading.Thread(target=consume, args=(source, frames, python_us, counts, i))
+        for i, source in enumerate(sources)
+    ]
+    self_start = cpu_seconds(resource.RUSAGE_SELF)
+    children_start = cpu_seconds(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    self_cpu = (cpu_seconds(resource.RUSAGE_SELF) - self_start) / elapsed
+    children_cpu = (cpu_seconds(resource.RUSAGE_CHILDREN) - children_start) / elapsed
+    print(
+        f"{mode:>8} x{streams}: {sum(counts) / elapsed:7.1f} frames/s, "
+        f"detector process {self_cpu:4.2f} cores, capture processes {children_cpu:4.2f} cores"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark in-process capture against the shared-memory process split.")
+    parser.add_argument("--video", default="example.mp4", help="video file (looked up in resources/) or 'synthetic'")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--frames", type=int, default=600, help="frames per stream")
+    parser.add_argument("--python-us", type=float, default=2000, help="GIL-holding Python work per frame")
+    args = parser.parse_args()
+
+    for streams in args.streams:
+        for mode in ("inproc", "split"):
+            run(mode, streams, args.video, args.frames, args.python_us)
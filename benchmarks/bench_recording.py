@@ -0,0 +1,97 @@
+# Detection recording benchmark:
+# Feeds synthetic tracked detections (benchmarks/fake_hailo.py) through the
+# DetectionRecorder's probe body and compares its cost per frame with the
+# extraction the DetectionEventHandler probe already does. Then reads the file
+# back through the memory-mapped reader and replays it into a TrackTable as
+# fast as possible.
+# Last, a smoke check of 'python -m src.recording replay': the loopback must
+# take every argument the handler passes to LabelChannel.send_label, and the
+# recording is replayed through the handler's event logic (DetectionEvents,
+# which needs neither hailo nor GStreamer).
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_recording --frames 9000 --detections 5
+import argparse
+import inspect
+import os
+import tempfile
+import time
+
+from benchmarks import fake_hailo
+fake_hailo.install()
+import hailo
+
+from src.event_queue import ProbeTimer
+from src.ipc import LabelChannel
+from src.recording import DetectionRecorder, DetectionRecording, ReplayLoopback, replay_recording, replay_into_handler
+from src.tracking import TrackTable
+
+class Buffer:
+    __slots__ = ("pts",)
+
+    def __init__(self, pts):
+        self.pts = pts
+
+# What DetectionEventHandler.__call__ does per frame, for reference:
+def handler_extract(buffer):
+    roi = hailo.get_roi_from_buffer(buffer)
+    return tuple(
+        (detection.get_label(), detection.get_confidence(), detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)[0].get_id())
+        for detection in roi.get_objects_typed(hailo.HAILO_DETECTION)
+    )
+
+def time_probe(name, frames, fps, detector, probe):
+    timer = ProbeTimer(window=frames)
+    for i in range(frames):
+        buffer = Buffer(i * 1_000_000_000 // fps)
+        fake_hailo.attach(buffer.pts, detector.detect())
+        start = time.perf_counter()
+        probe(buffer)
+        timer.record(time.perf_counter() - start)
+    result = timer.percentiles()
+    print(f"{name:>18}: p50 {result['p50_us']:6.1f} us, p99 {result['p99_us']:6.1f} us per frame")
+
+def check_replay(path):
+    channel = list(inspect.signature(LabelChannel.send_label).parameters)
+    loopback = list(inspect.signature(ReplayLoopback.send_label).parameters)
+    if channel != loopback:
+        raise SystemExit(f"ReplayLoopback.send_label{tuple(loopback)} does not match LabelChannel.send_label{tuple(channel)}")
+    sent = replay_into_handler(path)
+    print(f"Handler replay: {len(sent)} events sent through the loopback")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark detection recording and replay.")
+    parser.add_argument("--frames", type=int, default=9000, help="frames to record (9000 = 5 minutes at 30 fps)")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--detections", type=int, default=5, help="synthetic detections per frame")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.ddrec")
+    time_probe("handler extract", args.frames, args.fps, fake_hailo.StandInDetector(args.detections), handler_extract)
+    # The probe loop runs far faster than real time, so let every frame wait for the writer:
+    recorder = DetectionRecorder(path, flush_interval=0.5, max_pending=args.frames)
+    time_probe("recorder probe", args.frames, args.fps, fake_hailo.StandInDetector(args.detections), recorder.record)
+    recorder.close()
+
+    size = os.path.getsize(path)
+    start = time.perf_counter()
+    recording = DetectionRecording(path)
+    open_time = time.perf_counter() - start
+    print(
+        f"File: {size / 1e6:.2f} MB, {size / args.frames:.0f} bytes/frame, "
+        f"{size / max(len(recording.detections['label_id']), 1):.1f} bytes/detection, opened in {open_time * 1000:.1f} ms"
+    )
+
+    # Recorded probe times are when the benchmark ran; space them out at the
+    # nominal frame rate so "real time" means the recorded video's duration:
+    recording.frames["probe_time"] = recording.frames["frame_index"] / args.fps
+    table = TrackTable()
+    events = []
+    elapsed = replay_recording(recording, lambda record: events.extend(table.update(record[2], record[3])))
+    duration = recording.duration()
+    print(
+        f"Replay: {len(recording)} frames in {elapsed:.2f} s, {duration / elapsed:.0f}x real time, "
+        f"{len(events)} events, {table.stats()}"
+    )
+    check_replay(path)
+    os.remove(path)
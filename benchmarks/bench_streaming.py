@@ -0,0 +1,48 @@
+# Streaming benchmark:
+# Time until the first sentence reaches the output stage, and until the whole
+# fact is delivered, with and without streaming, against the fake Ollama
+# server streaming one token every --chunk-delay seconds.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_streaming --delay 0.3 --chunk-delay 0.05
+import argparse
+import time
+
+from benchmarks.fake_ollama import start_fake_ollama
+from src.info_server import LabelProcessingServer
+
+class TimedServer(LabelProcessingServer):
+    def speak(self, sentence):
+        self.spoken.append((time.perf_counter() - self.start, sentence))
+
+def measure(url, streaming, rounds):
+    server = TimedServer(use_cache=False)
+    server.ollama_url = url
+    first, total = [], []
+    for _ in range(rounds):
+        server.spoken = []
+        server.start = time.perf_counter()
+        server.query_ollama("cat", server.speak if streaming else None)
+        if not streaming:
+            # The non-streaming path hands the whole fact over at once:
+            server.spoken.append((time.perf_counter() - server.start, None))
+        first.append(server.spoken[0][0])
+        total.append(server.spoken[-1][0])
+    name = "stream" if streaming else "blocking"
+    print(
+        f"{name:>8}: first output {sum(first) / rounds * 1000:7.1f} ms, "
+        f"complete {sum(total) / rounds * 1000:7.1f} ms, "
+        f"{len(server.spoken)} deliveries"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time-to-first-sentence of the SLM/TTS server.")
+    parser.add_argument("--delay", type=float, default=0.3, help="fake time to the first token")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="fake time between tokens")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--port", type=int, default=11501)
+    args = parser.parse_args()
+
+    fake_ollama, url = start_fake_ollama(args.port, args.delay, args.chunk_delay)
+    measure(url, False, args.rounds)
+    measure(url, True, args.rounds)
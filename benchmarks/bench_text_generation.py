@@ -0,0 +1,36 @@
+# TextGenerator batching benchmark:
+# Requests a fixed set of COCO labels at once and reports labels/s for each
+# maximum batch size. Needs transformers and torch (and the model download).
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_text_generation --batch-sizes 1 2 4 8 16
+import argparse
+import time
+
+from src.text_generation import TextGenerator
+
+LABELS = [
+    "person", "bicycle", "car", "dog", "cat", "bird", "cup", "chair",
+    "bottle", "laptop", "book", "clock", "umbrella", "banana", "apple", "teddy bear"
+]
+
+def run(generator, batch_size):
+    generator.max_batch_size = batch_size
+    generator.clear_cache()
+    start = time.perf_counter()
+    futures = [generator.request(label) for label in LABELS]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - start
+    print(f"batch size {batch_size:>3}: {len(LABELS) / elapsed:6.2f} labels/s ({elapsed:6.2f} s for {len(LABELS)} labels)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TextGenerator throughput against batch size.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    generator = TextGenerator()
+    # Warm-up, so the first measurement does not pay for lazy initialisation:
+    generator.request("warm up").result()
+    for batch_size in args.batch_sizes:
+        run(generator, batch_size)
@@ -0,0 +1,113 @@
+# TextGenerator inference profile benchmark:
+# Loads each profile from INFERENCE_PROFILES in a fresh process, generates a
+# fixed set of labels one at a time and reports per-label latency, peak RSS
+# (set while loading) and the RSS held once the labels are done.
+# Needs transformers and torch (and the model download).
+# Without access to the model hub, --random-init builds flan-t5-small's
+# architecture with random weights and a stand-in word-level tokenizer of the
+# same vocabulary size. Random weights practically never emit the end token, so
+# every label runs to its profile's max_new_tokens: the latencies are then the
+# cost of each profile at its cap (beams, int8, threads), not of real answers,
+# and the sample texts are meaningless.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_text_profiles
+#   python -m benchmarks.bench_text_profiles --profiles quality fast
+#   python -m benchmarks.bench_text_profiles --random-init
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+LABELS = ["person", "dog", "cat", "car", "bicycle", "cup", "chair", "book"]
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+# Runs in the child process, so the RSS of one profile does not leak into the next.
+def measure(profile, model_name):
+    from src.text_generation import TextGenerator
+
+    start = time.perf_counter()
+    generator = TextGenerator(model_name=model_name, profile=profile, max_batch_size=1)
+    load_time = time.perf_counter() - start
+    generator.request("warm up").result()
+
+    latencies = []
+    texts = {}
+    for label in LABELS:
+        start = time.perf_counter()
+        texts[label] = generator.request(label).result()
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        "profile": profile,
+        "load_s": load_time,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "rss_mb": rss_mb(),
+        "sample": texts[LABELS[0]]
+    }
+
+# Saves a randomly initialised model with flan-t5-small's dimensions, and a
+# tokenizer covering its vocabulary, to 'directory' for from_pretrained().
+def save_random_model(directory):
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import T5Config, T5ForConditionalGeneration, PreTrainedTokenizerFast
+
+    config = T5Config(
+        vocab_size=32128, d_model=512, d_kv=64, d_ff=1024, num_layers=8, num_decoder_layers=8, num_heads=6,
+        feed_forward_proj="gated-gelu", tie_word_embeddings=False,
+        pad_token_id=0, eos_token_id=1, decoder_start_token_id=0
+    )
+    T5ForConditionalGeneration(config).save_pretrained(directory)
+    vocab = {"<pad>": 0, "</s>": 1, "<unk>": 2}
+    vocab.update({f"w{i}": i for i in range(len(vocab), config.vocab_size)})
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, pad_token="<pad>", eos_token="</s>", unk_token="<unk>"
+    ).save_pretrained(directory)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TextGenerator inference profiles.")
+    parser.add_argument("--profiles", nargs="+", default=None)
+    parser.add_argument("--model", default="google/flan-t5-small")
+    parser.add_argument("--random-init", action="store_true", help="random weights of the same architecture, no download")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.model)))
+        sys.exit(0)
+
+    model = args.model
+    if args.random_init:
+        model = tempfile.mkdtemp(prefix="random-t5-")
+        save_random_model(model)
+        print(f"Random-weight {args.model} architecture in {model}: latencies are at each profile's token cap")
+
+    from src.text_generation import INFERENCE_PROFILES
+    for profile in args.profiles or list(INFERENCE_PROFILES):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_text_profiles", "--child", profile, "--model", model],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{result['profile']:>9}: p50 {result['p50_ms']:7.1f} ms, max {result['max_ms']:7.1f} ms, "
+            f"peak RSS {result['peak_rss_mb']:6.1f} MB, RSS {result['rss_mb']:6.1f} MB, load {result['load_s']:5.1f} s | {result['sample']}"
+        )
+    if args.random_init:
+        shutil.rmtree(model)
@@ -0,0 +1,54 @@
+# Track-aware triggering benchmark:
+# Replays a synthetic detection stream through the old "best detection of the
+# frame" trigger and through TrackTable, with the detection gate closed for
+# --busy seconds after every event, and compares how many SLM round trips each
+# one causes. Scenario at 30 fps:
+# - a person (track 1) stands in front of the device the whole time
+# - a dog (track 2) walks through for 5 s, twice
+# - a cup (track 3) flickers in and out at low confidence
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_tracking --duration 300 --busy 8
+import argparse
+import time
+
+from src.tracking import TrackTable
+
+def scene(duration, fps=30):
+    for i in range(int(duration * fps)):
+        now = i / fps
+        detections = [("person", 0.9, 1)]
+        if 60 <= now < 65 or 180 <= now < 185:
+            detections.append(("dog", 0.8, 2))
+        if i % 7 == 0:
+            detections.append(("cup", 0.35, 3))
+        yield now, tuple(detections)
+
+# Frames are dropped while the gate is closed, like the valve does in the app.
+def run(trigger, duration, busy):
+    events = 0
+    gate_open_at = 0.0
+    for now, detections in scene(duration):
+        if now < gate_open_at:
+            continue
+        if trigger(now, detections):
+            events += 1
+            gate_open_at = now + busy
+    return events
+
+def best_detection_trigger(now, detections):
+    return len(detections) > 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare event triggering with and without track state.")
+    parser.add_argument("--duration", type=float, default=300, help="scene length in seconds")
+    parser.add_argument("--busy", type=float, default=8, help="seconds the SLM/TTS stage is busy per event")
+    args = parser.parse_args()
+
+    print(f"best detection: {run(best_detection_trigger, args.duration, args.busy):5d} events")
+
+    table = TrackTable()
+    start = time.perf_counter()
+    events = run(table.update, args.duration, args.busy)
+    elapsed = time.perf_counter() - start
+    print(f"   track table: {events:5d} events, {table.stats()}, {elapsed * 1e6 / (args.duration * 30):.1f} us/frame")
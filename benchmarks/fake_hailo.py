@@ -0,0 +1,224 @@
+# Stand-in 'hailo' module:
+# The parts of the Hailo Python API the detection callbacks use, so they can run
+# without the TAPPAS runtime. Instead of reading metadata off the Gst buffer,
+# detections are attached by PTS (see StandInDetector) and looked up again by
+# get_roi_from_buffer().
+#
+# Install it before anything imports src.callbacks:
+#   from benchmarks import fake_hailo
+#   fake_hailo.install()
+# install_helpers() does the same for hailo_apps_infra's pipeline helpers, see
+# the end of this file.
+import sys
+import types
+from collections import OrderedDict
+
+HAILO_DETECTION = "detection"
+HAILO_UNIQUE_ID = "unique_id"
+
+LABELS = ["person", "bicycle", "car", "dog", "cat", "bottle", "chair", "cup"]
+
+class HailoBBox:
+    __slots__ = ("_xmin", "_ymin", "_width", "_height")
+
+    def __init__(self, xmin, ymin, width, height):
+        self._xmin = xmin
+        self._ymin = ymin
+        self._width = width
+        self._height = height
+
+    def xmin(self):
+        return self._xmin
+
+    def ymin(self):
+        return self._ymin
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def xmax(self):
+        return self._xmin + self._width
+
+    def ymax(self):
+        return self._ymin + self._height
+
+class HailoUniqueID:
+    __slots__ = ("_id",)
+
+    def __init__(self, unique_id):
+        self._id = unique_id
+
+    def get_id(self):
+        return self._id
+
+class HailoDetection:
+    __slots__ = ("_bbox", "_label", "_class_id", "_confidence", "_unique_ids")
+
+    def __init__(self, bbox, label, class_id, confidence, track_id=None):
+        self._bbox = bbox
+        self._label = label
+        self._class_id = class_id
+        self._confidence = confidence
+        self._unique_ids = [HailoUniqueID(track_id)] if track_id is not None else []
+
+    def get_bbox(self):
+        return self._bbox
+
+    def get_label(self):
+        return self._label
+
+    def get_class_id(self):
+        return self._class_id
+
+    def get_confidence(self):
+        return self._confidence
+
+    def get_objects_typed(self, object_type):
+        if object_type == HAILO_UNIQUE_ID:
+            return list(self._unique_ids)
+        return []
+
+class HailoROI:
+    __slots__ = ("objects",)
+
+    def __init__(self, objects=()):
+        self.objects = list(objects)
+
+    def get_objects_typed(self, object_type):
+        if object_type == HAILO_DETECTION:
+            return list(self.objects)
+        return []
+
+# PTS -> HailoROI for the frames in flight:
+_rois = OrderedDict()
+MAX_ROIS = 512
+
+def attach(pts, detections):
+    _rois[pts] = HailoROI(detections)
+    while len(_rois) > MAX_ROIS:
+        _rois.popitem(last=False)
+
+def get_roi_from_buffer(buffer):
+    roi = _rois.get(buffer.pts)
+    return roi if roi is not None else HailoROI()
+
+def install():
+    sys.modules["hailo"] = sys.modules[__name__]
+
+# Stand-in detector:
+# Produces 'count' detections per frame whose boxes drift slowly and keep their
+# track IDs, roughly what hailonet + hailotracker hand to the callback. Every
+# 'churn' frames one of the objects is replaced by a new track.
+class StandInDetector:
+    def __init__(self, count=5, churn=90):
+        self.count = count
+        self.churn = churn
+        self.frame = 0
+        self.next_track_id = count
+
+    def detect(self):
+        frame = self.frame
+        self.frame += 1
+        if self.churn and frame and frame % self.churn == 0:
+            self.next_track_id += 1
+        detections = []
+        for i in range(self.count):
+            track_id = self.next_track_id - self.count + i
+            class_id = track_id % len(LABELS)
+            x = ((track_id * 0.137 + frame * 0.002) % 0.8)
+            y = ((track_id * 0.291) % 0.8)
+            detections.append(HailoDetection(
+                HailoBBox(x, y, 0.05 + 0.02 * (track_id % 5), 0.1 + 0.02 * (track_id % 3)),
+                LABELS[class_id],
+                class_id + 1,
+                0.4 + 0.5 * ((track_id * 7919) % 100) / 100,
+                track_id
+            ))
+        return detections
+
+# Stand-in hailo_apps_infra.gstreamer_helper_pipelines:
+# The helpers GstDetectionApp.get_pipeline_string() builds its pipeline from,
+# with the same signatures and element names as the real ones, so the app's
+# own string can be parsed without TAPPAS:
+# - hailonet/hailofilter: identities; hailonet holds each frame for
+#   'inference_ms' (the NPU time)
+# - hailocropper/hailoaggregator, hailotracker: identities with their names,
+#   so the queues, probes and trace stages sit where they do in the app
+# - the display's hailooverlay and fpsdisplaysink: a fakesink
+# The source keeps the real one's caps right behind appsrc, so a frame source
+# of another size than the branch's fails caps negotiation here too.
+def queue_string(name, max_size_buffers=3, leaky="no"):
+    return f"queue name={name} leaky={leaky} max-size-buffers={max_size_buffers} max-size-bytes=0 max-size-time=0"
+
+def standin_helpers(inference_ms=0.0):
+    def SOURCE_PIPELINE(video_source, video_width=640, video_height=640, video_format="RGB", name="source",
+                        no_webcam_compression=False):
+        return (
+            "appsrc name=app_source is-live=true leaky-type=downstream max-buffers=3 format=time ! "
+            "videoflip name=videoflip video-direction=horiz ! "
+            f"video/x-raw, format={video_format}, width={video_width}, height={video_height} ! "
+            f"{queue_string(f'{name}_scale_q')} ! "
+            f"videoscale name={name}_videoscale n-threads=2 ! "
+            f"{queue_string(f'{name}_convert_q')} ! "
+            f"videoconvert n-threads=3 name={name}_convert qos=false ! "
+            f"video/x-raw, pixel-aspect-ratio=1/1, format={video_format}, width={video_width}, height={video_height}"
+        )
+
+    def INFERENCE_PIPELINE(hef_path, post_process_so=None, batch_size=1, config_json=None, post_function_name=None,
+                           additional_params="", name="inference", **kwargs):
+        return (
+            f"identity name={name}_hailonet sleep-time={int(inference_ms * 1000)} ! "
+            f"identity name={name}_hailofilter"
+        )
+
+    def INFERENCE_PIPELINE_WRAPPER(inner_pipeline, bypass_max_size_buffers=20, name="inference_wrapper"):
+        return (
+            f"{queue_string(f'{name}_input_q')} ! "
+            f"identity name={name}_crop ! "
+            f"{inner_pipeline} ! "
+            f"identity name={name}_agg ! "
+            f"{queue_string(f'{name}_output_q')}"
+        )
+
+    def TRACKER_PIPELINE(class_id, name="hailo_tracker", **kwargs):
+        return f"identity name={name} ! {queue_string(f'{name}_q')}"
+
+    def USER_CALLBACK_PIPELINE(name="identity_callback"):
+        return f"{queue_string(f'{name}_q')} ! identity name={name}"
+
+    def DISPLAY_PIPELINE(video_sink="autovideosink", sync="true", show_fps="false", name="hailo_display"):
+        return f"{queue_string(f'{name}_q')} ! fakesink name={name} sync=false"
+
+    return {
+        "SOURCE_PIPELINE": SOURCE_PIPELINE,
+        "INFERENCE_PIPELINE": INFERENCE_PIPELINE,
+        "INFERENCE_PIPELINE_WRAPPER": INFERENCE_PIPELINE_WRAPPER,
+        "TRACKER_PIPELINE": TRACKER_PIPELINE,
+        "USER_CALLBACK_PIPELINE": USER_CALLBACK_PIPELINE,
+        "DISPLAY_PIPELINE": DISPLAY_PIPELINE,
+    }
+
+def install_helpers(inference_ms=0.0):
+    package = sys.modules.setdefault("hailo_apps_infra", types.ModuleType("hailo_apps_infra"))
+    helpers = types.ModuleType("hailo_apps_infra.gstreamer_helper_pipelines")
+    helpers.__dict__.update(standin_helpers(inference_ms))
+    package.gstreamer_helper_pipelines = helpers
+    sys.modules[helpers.__name__] = helpers
+
+# Hailo GStreamer plugins the app names directly (outside the helpers), and
+# what stands in for them where TAPPAS is not installed: (factory, as written
+# by the app, stand-in).
+STANDIN_ELEMENTS = [
+    ("hailoroundrobin", "hailoroundrobin mode=0 ", "funnel "),
+    ("hailooverlay", "hailooverlay ", "identity "),
+]
+
+def replace_missing_elements(pipeline_string):
+    from gi.repository import Gst
+    for factory, element, standin in STANDIN_ELEMENTS:
+        if Gst.ElementFactory.find(factory) is None:
+            pipeline_string = pipeline_string.replace(element, standin)
+    return pipeline_string
@@ -0,0 +1,87 @@
+# Fake Ollama server:
+# A local stand-in for the /api/generate endpoint of Ollama, so the SLM/TTS
+# side can be benchmarked without a model. Non-streaming requests are answered
+# after 'delay' + one 'chunk_delay' per token; streaming requests get the first
+# NDJSON chunk after 'delay' and one more every 'chunk_delay' seconds.
+#
+# Usage (standalone, from the repository root):
+#   python -m benchmarks.fake_ollama --port 11500 --delay 0.5 --chunk-delay 0.05
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_RESPONSE = "Cats sleep for most of the day. They can jump many times their own height."
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests += 1
+        tokens = FAKE_RESPONSE.split(" ")
+        tokens = [token + " " for token in tokens[:-1]] + tokens[-1:]
+
+        time.sleep(self.server.delay)
+        if request.get("stream", True):
+            self.stream_reply(request, tokens)
+            return
+
+        time.sleep(self.server.chunk_delay * len(tokens))
+        body = json.dumps({
+            "model": request.get("model"),
+            "response": FAKE_RESPONSE,
+            "done": True
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reply(self, request, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.server.chunk_delay)
+            self.write_chunk({"model": request.get("model"), "response": token, "done": False})
+        self.write_chunk({"model": request.get("model"), "response": "", "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, chunk):
+        line = json.dumps(chunk).encode() + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    # Clients dropping idle keep-alive connections is expected, not an error:
+    def handle_error(self, request, client_address):
+        pass
+
+def start_fake_ollama(port=11500, delay=0.5, chunk_delay=0.0):
+    server = FakeOllamaServer(("127.0.0.1", port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.chunk_delay = chunk_delay
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{port}/api/generate"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama /api/generate endpoint.")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, url = start_fake_ollama(args.port, args.delay, args.chunk_delay)
+    print(f"Fake Ollama listening on {url}")
+    threading.Event().wait()
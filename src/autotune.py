@@ -0,0 +1,202 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+from .config import DEFAULT_PROFILE, DEFAULT_PROFILE_PATH, save_profile
+
+AUTOTUNE_LOG_FORMAT = "\033[1;33m[autotune] \033[0m \t"
+
+# Auto-tuner:
+# Runs the real detection pipeline on a replayed video for every combination of
+# the swept profile parameters and writes the best one as the app's profile.
+# Each run happens in a fresh process (the NPU is opened per process), with the
+# video preloaded at the candidate resolution and replayed in real time:
+# - fps:        frames/s reaching the callback probe
+# - latency_ms: capture -> callback probe, p50/p95 over traced frames
+# - cpu:        CPU time of the process / wall time (1.0 = one core busy)
+#
+# Candidates that no other candidate beats on all three (the Pareto front) are
+# kept; among those that sustain 'min_fps_ratio' of the video's frame rate, the
+# lowest p95 latency wins, then the lowest CPU. If none does, the fastest wins.
+# The NMS thresholds change what is detected, not only how fast, so they are
+# only swept when asked for.
+#
+# Usage (from the repository root, on the device):
+#   python -m src.autotune --source example.mp4 --batch-size 1 2 4 --resolution 1280x720 640x360
+def measure(profile, source_spec, seconds, preload, results):
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+    from .callbacks import quiet_handler
+    from .clips import CLIP_DIR_ENV
+    from .gst_v2_detection_app import GstDetectionApp
+    from .preview import PREVIEW_PORT_ENV
+    from .sources import make_source, MemorySource
+    from .tracing import FrameTracer, stage_latencies
+
+    Gst.init(None)
+    size = (profile["video_width"], profile["video_height"])
+    source = make_source(source_spec, realtime=False)
+    fps = source.fps
+    frame_source = MemorySource.from_source(
+        source, max_frames=preload, size=size, realtime=True, num_frames=int(seconds * fps)
+    )
+
+    # The optional branches are chosen when the pipeline string is built (in
+    # the app's __init__), so they are switched off before; the candidates are
+    # measured on the default pipeline:
+    os.environ.pop(PREVIEW_PORT_ENV, None)
+    os.environ.pop(CLIP_DIR_ENV, None)
+
+    # Events would close the detection gate; keep every frame flowing:
+    handler = quiet_handler()
+    profile = dict(profile, video_fps=fps)
+    app = GstDetectionApp(handler.__call__, handler, frame_source=frame_source, profile=profile)
+    app.metrics_port = None
+    app.attach_probes()
+    tracer = FrameTracer(sample_every=5, max_frames=1024)
+    tracer.attach(app.pipeline, [("source", "app_source"), ("callback", "identity_callback")])
+    app.tracer = tracer
+    handler.tracer = tracer
+    handler.start()
+
+    cpu_start = os.times()
+    start = time.monotonic()
+    app.start_frame_source()
+    app.start_pipeline()
+    bus = app.pipeline.get_bus()
+    message = bus.timed_pop_filtered(
+        int((seconds + 30) * Gst.SECOND), Gst.MessageType.EOS | Gst.MessageType.ERROR
+    )
+    elapsed = time.monotonic() - start
+    cpu_end = os.times()
+    handler.stop()
+    app.pipeline.set_state(Gst.State.NULL)
+
+    if message is None or message.type == Gst.MessageType.ERROR:
+        error = message.parse_error()[0].message if message is not None else "no end of stream"
+        results.put({"error": error})
+        return
+    latencies = sorted(stage_latencies(tracer, ["callback"])["callback"])
+    def percentile(p):
+        return latencies[min(len(latencies) * p // 100, len(latencies) - 1)] if latencies else None
+    cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    results.put({
+        "fps": handler.fcount / elapsed,
+        "source_fps": fps,
+        "latency_ms": {"p50": percentile(50), "p95": percentile(95)},
+        "cpu": cpu / elapsed,
+        "detection_frames": handler.detection_frames,
+        "frames": handler.fcount
+    })
+
+def run_isolated(profile, source_spec, seconds, preload):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=measure, args=(profile, source_spec, seconds, preload, results))
+    process.start()
+    deadline = time.monotonic() + seconds + 120
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=0.5)
+        except queue.Empty:
+            if not process.is_alive():
+                result = {"error": f"measurement process exited with code {process.exitcode}"}
+            elif time.monotonic() > deadline:
+                result = {"error": "timed out"}
+    process.join(timeout=5)
+    if process.is_alive():
+        process.kill()
+    return result
+
+def dominates(a, b):
+    better_or_equal = (
+        a["fps"] >= b["fps"]
+        and a["latency_ms"]["p95"] <= b["latency_ms"]["p95"]
+        and a["cpu"] <= b["cpu"]
+    )
+    strictly_better = (
+        a["fps"] > b["fps"]
+        or a["latency_ms"]["p95"] < b["latency_ms"]["p95"]
+        or a["cpu"] < b["cpu"]
+    )
+    return better_or_equal and strictly_better
+
+def pareto_front(runs):
+    valid = [run for run in runs if "error" not in run and run["latency_ms"]["p95"] is not None]
+    return [run for run in valid if not any(dominates(other, run) for other in valid)]
+
+def choose(front, min_fps_ratio):
+    sustained = [run for run in front if run["fps"] >= min_fps_ratio * run["source_fps"]]
+    if sustained:
+        return min(sustained, key=lambda run: (run["latency_ms"]["p95"], run["cpu"]))
+    return max(front, key=lambda run: run["fps"])
+
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep pipeline parameters and write the best profile.")
+    parser.add_argument("--source", default="example.mp4", help="video file (looked up in resources/) or 'synthetic'")
+    parser.add_argument("--seconds", type=float, default=15, help="replay length per combination")
+    parser.add_argument("--preload", type=int, default=150, help="frames held in memory and cycled")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--resolution", type=parse_resolution, nargs="+", default=[(1280, 720), (640, 360)])
+    parser.add_argument("--latency", type=int, nargs="+", default=[100, 300], help="pipeline latency in ms")
+    parser.add_argument("--nms-score", type=float, nargs="+", default=[DEFAULT_PROFILE["nms_score_threshold"]])
+    parser.add_argument("--nms-iou", type=float, nargs="+", default=[DEFAULT_PROFILE["nms_iou_threshold"]])
+    parser.add_argument("--min-fps-ratio", type=float, default=0.95, help="share of the video fps a profile must sustain")
+    parser.add_argument("--output", default=DEFAULT_PROFILE_PATH, help="profile file the app loads at startup")
+    parser.add_argument("--report", help="also write every measurement to this JSON file")
+    args = parser.parse_args()
+
+    runs = []
+    combinations = list(itertools.product(args.batch_size, args.resolution, args.latency, args.nms_score, args.nms_iou))
+    for i, (batch_size, (width, height), latency, nms_score, nms_iou) in enumerate(combinations, 1):
+        profile = dict(
+            DEFAULT_PROFILE,
+            batch_size=batch_size,
+            video_width=width,
+            video_height=height,
+            pipeline_latency=latency,
+            nms_score_threshold=nms_score,
+            nms_iou_threshold=nms_iou
+        )
+        result = run_isolated(profile, args.source, args.seconds, args.preload)
+        run = {"profile": profile, **result}
+        runs.append(run)
+        name = f"batch {batch_size}, {width}x{height}, latency {latency} ms, nms {nms_score}/{nms_iou}"
+        if "error" in result:
+            print(f"{AUTOTUNE_LOG_FORMAT}[{i}/{len(combinations)}] {name}: {result['error']}")
+        else:
+            print(
+                f"{AUTOTUNE_LOG_FORMAT}[{i}/{len(combinations)}] {name}: {result['fps']:.1f} fps, "
+                f"latency p50/p95 {result['latency_ms']['p50']:.1f}/{result['latency_ms']['p95']:.1f} ms, "
+                f"cpu {result['cpu']:.2f}"
+            )
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(runs, f, indent=2)
+
+    front = pareto_front(runs)
+    if not front:
+        print(f"{AUTOTUNE_LOG_FORMAT}No combination completed, the profile was not written.")
+        raise SystemExit(1)
+    best = choose(front, args.min_fps_ratio)
+    print(f"{AUTOTUNE_LOG_FORMAT}Pareto front: {len(front)} of {len(runs)} combinations, chose {best['profile']}")
+    profile = dict(best["profile"])
+    profile["video_fps"] = DEFAULT_PROFILE["video_fps"]
+    save_profile(
+        profile,
+        args.output,
+        tuned_on=args.source,
+        measured={key: best[key] for key in ("fps", "latency_ms", "cpu")},
+        pareto_front=[run["profile"] for run in front]
+    )
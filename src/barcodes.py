@@ -0,0 +1,290 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+BARCODES_LOG_FORMAT = "\033[1;36m[barcodes] \033[0m \t"
+
+# Per-thread OpenCV detectors: detectAndDecode keeps scratch state in the
+# detector object, so the worker threads do not share one.
+_detectors = threading.local()
+
+def detectors():
+    if not hasattr(_detectors, "barcode"):
+        _detectors.barcode = cv2.barcode.BarcodeDetector()
+        _detectors.qr = cv2.QRCodeDetector()
+    return _detectors.barcode, _detectors.qr
+
+# Crop around a detection: pixel corners (x0, y0, x1, y1), grown by 'margin'
+# of the box size on every side (codes are often printed up to the edge of a
+# label), clipped to the frame and converted to grayscale. The conversion
+# writes a new array, so the crop stays valid after the frame is unmapped.
+def crop_gray(frame, box, margin=0.1):
+    height, width = frame.shape[:2]
+    x0, y0, x1, y1 = (int(value) for value in box)
+    grow_x = int((x1 - x0) * margin)
+    grow_y = int((y1 - y0) * margin)
+    x0, y0 = max(x0 - grow_x, 0), max(y0 - grow_y, 0)
+    x1, y1 = min(x1 + grow_x, width), min(y1 + grow_y, height)
+    if x1 - x0 < 8 or y1 - y0 < 8:
+        return None
+    return cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_RGB2GRAY)
+
+# Decodes the 1D barcodes and QR codes in a grayscale image, as a list of
+# {"type", "data"} dicts. Crops whose shorter side is under 'min_size' pixels
+# are scaled up first (at most 4x): the detectors need a few pixels per bar,
+# and a label filling a small box at inference resolution has less.
+def decode_codes(image, min_size=200):
+    short_side = min(image.shape[:2])
+    if short_side < min_size:
+        scale = min(min_size / short_side, 4.0)
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    barcode, qr = detectors()
+    codes = []
+    ok, data, types, _ = barcode.detectAndDecodeWithType(image)
+    if ok:
+        codes += [{"type": code_type, "data": text} for text, code_type in zip(data, types) if text]
+    ok, data, _, _ = qr.detectAndDecodeMulti(image)
+    if ok:
+        codes += [{"type": "QR", "data": text} for text in data if text]
+    return codes
+
+# Code result of one track:
+class ScanResult:
+    __slots__ = ("codes", "scanned_at", "attempts")
+
+    def __init__(self, codes, scanned_at, attempts):
+        self.codes = codes
+        self.scanned_at = scanned_at
+        self.attempts = attempts
+
+# Barcode scanner:
+# Decodes barcodes and QR codes on the crops of detections instead of whole
+# frames, in a pool of 'workers' threads (OpenCV releases the GIL while it
+# detects and decodes). Results are cached per (stream ID, key):
+# - a tracked detection's key is its track ID
+# - the app's tracker only gives persons an ID (TRACKER_PIPELINE(class_id=1)),
+#   and is left out with several streams, so bottles, boxes and the like (or
+#   everything, with several streams) come untracked; their key is the label and
+#   the cell of a 'box_grid' pixel grid the box centre falls in. A still object
+#   keeps its key, one that moves is decoded again in every cell it enters.
+# - a key with codes is not scanned again while it stays in the cache
+# - a key without codes is retried after 'retry_after' seconds, as the label
+#   may turn towards the camera later
+# - at most 'cache_size' keys are kept, least recently seen evicted first
+# At most 'max_pending' crops are queued or decoding at once; a crop that finds
+# the pool full is skipped and counted (its track is tried again on a later
+# frame), so the streaming thread never waits for a decoder. Only detections
+# whose label is in 'labels' are scanned (None scans all).
+class BarcodeScanner:
+    def __init__(self, workers=2, max_pending=4, labels=None, margin=0.1, min_size=200,
+                 retry_after=1.0, cache_size=256, box_grid=64, label_codes_age=5.0):
+        self.labels = set(labels) if labels is not None else None
+        self.margin = margin
+        self.min_size = min_size
+        self.retry_after = retry_after
+        self.cache_size = cache_size
+        self.box_grid = box_grid
+        self.label_codes_age = label_codes_age
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="barcode")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.condition = threading.Condition()
+        self.results = OrderedDict()    # (stream_id, key) -> ScanResult, least recently seen first
+        self.in_flight = set()
+        # Codes last decoded on an untracked detection: (stream_id, label) -> ScanResult
+        self.label_codes = {}
+
+        self.extractor = None   # DetectionExtractor with boxes, made by attach() with the Hailo API
+        self.stream_of = None
+        self.width = None
+        self.height = None
+
+        self.crops_submitted = 0
+        self.crops_skipped = 0
+        self.cache_hits = 0
+        self.tracks_with_codes = 0
+        self.decode_times = deque(maxlen=1024)
+        self.decode_time = 0.0
+
+    # Adds the scanner's probe on the callback pad, next to the event handler's.
+    # 'width' and 'height' are the frame size there (the inference wrapper hands
+    # the frames on at the source's size).
+    def attach(self, pipeline, width, height, element_name="identity_callback"):
+        import hailo
+        from gi.repository import Gst, GstVideo
+        from .streams import stream_of
+        from .detections import DetectionExtractor, bbox_to_pixels
+        self.hailo = hailo
+        self.Gst = Gst
+        self.stream_of = stream_of
+        self.bbox_to_pixels = bbox_to_pixels
+        self.extractor = DetectionExtractor(with_boxes=True)
+        self.width = width
+        self.height = height
+        info = GstVideo.VideoInfo()
+        info.set_format(GstVideo.VideoFormat.RGB, width, height)
+        self.stride = info.stride[0]
+        pipeline.get_by_name(element_name).get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._probe)
+        print(f"{BARCODES_LOG_FORMAT}Decoding barcodes on detection crops "
+              f"({self.workers} workers, labels: {sorted(self.labels) if self.labels else 'all'})")
+
+    # Streaming thread: the frame is only mapped when a detection needs a crop,
+    # which after the first frames of a track is rare.
+    def _probe(self, pad, info):
+        Gst = self.Gst
+        buffer = info.get_buffer()
+        if buffer is None:
+            return Gst.PadProbeReturn.OK
+        batch = self.extractor.extract(self.hailo.get_roi_from_buffer(buffer))
+        if not len(batch):
+            return Gst.PadProbeReturn.OK
+        boxes = self.bbox_to_pixels(batch["bbox"], self.width, self.height)
+        detections = [
+            (self.extractor.label(class_id), track_id if track_id >= 0 else None, box)
+            for class_id, track_id, box in zip(batch["class_id"].tolist(), batch["track_id"].tolist(), boxes.tolist())
+        ]
+        stream_id = self.stream_of(buffer.pts)
+        wanted = self.wanted(stream_id, detections)
+        if not wanted:
+            return Gst.PadProbeReturn.OK
+        ok, map_info = buffer.map(Gst.MapFlags.READ)
+        if not ok:
+            return Gst.PadProbeReturn.OK
+        try:
+            frame = np.ndarray(
+                (self.height, self.width, 3), dtype=np.uint8, buffer=map_info.data,
+                strides=(self.stride, 3, 1)
+            )
+            self.scan(frame, wanted)
+        finally:
+            buffer.unmap(map_info)
+        return Gst.PadProbeReturn.OK
+
+    # Cache key of a detection, see above; box is (x0, y0, x1, y1) in pixels.
+    def key(self, stream_id, label, track_id, box):
+        if track_id is not None:
+            return (stream_id, track_id)
+        x0, y0, x1, y1 = box
+        grid = self.box_grid
+        return (stream_id, (label, int(x0 + x1) // 2 // grid, int(y0 + y1) // 2 // grid))
+
+    # Of the (label, track_id, box) detections (track_id None if untracked),
+    # the ones that need a decode - not cached (or due for a retry), not being
+    # decoded already - as (key, label, box).
+    def wanted(self, stream_id, detections, now=None):
+        now = time.monotonic() if now is None else now
+        wanted = []
+        seen = set()
+        with self.condition:
+            for label, track_id, box in detections:
+                if self.labels is not None and label not in self.labels:
+                    continue
+                key = self.key(stream_id, label, track_id, box)
+                result = self.results.get(key)
+                if result is not None:
+                    self.results.move_to_end(key)
+                    if result.codes or now - result.scanned_at < self.retry_after:
+                        self.cache_hits += 1
+                        continue
+                # The same key twice in a frame (two untracked boxes in one cell) is cropped once:
+                if key not in self.in_flight and key not in seen:
+                    seen.add(key)
+                    wanted.append((key, label, box))
+        return wanted
+
+    # Crops the wanted detections out of the frame and hands them to the pool.
+    def scan(self, frame, wanted):
+        for key, label, box in wanted:
+            if not self.slots.acquire(blocking=False):
+                self.crops_skipped += 1
+                continue
+            crop = crop_gray(frame, box, self.margin)
+            if crop is None:
+                self.slots.release()
+                continue
+            with self.condition:
+                self.in_flight.add(key)
+            self.crops_submitted += 1
+            self.executor.submit(self._decode, key, label, crop)
+
+    def _decode(self, key, label, crop):
+        start = time.perf_counter()
+        try:
+            codes = decode_codes(crop, self.min_size)
+        except cv2.error as e:
+            print(f"{BARCODES_LOG_FORMAT}Decoding failed: {e}")
+            codes = []
+        elapsed = time.perf_counter() - start
+        with self.condition:
+            self.decode_times.append(elapsed)
+            self.decode_time += elapsed
+            previous = self.results.pop(key, None)
+            attempts = previous.attempts + 1 if previous is not None else 1
+            result = self.results[key] = ScanResult(codes, time.monotonic(), attempts)
+            if codes:
+                self.tracks_with_codes += 1
+                if isinstance(key[1], tuple):
+                    self.label_codes[(key[0], label)] = result
+            while len(self.results) > self.cache_size:
+                self.results.popitem(last=False)
+            self.in_flight.discard(key)
+            self.condition.notify_all()
+        self.slots.release()
+        if codes:
+            print(f"{BARCODES_LOG_FORMAT}{label} {key[1]} (stream {key[0]}): {', '.join(code['data'] for code in codes)}")
+
+    # Event thread: the codes decoded for a track, waiting up to 'wait' seconds
+    # for a decode still in flight. Empty if none were found (yet).
+    # An untracked event (track_id None) has no box to look its key up by, so
+    # it gets the codes decoded last on any untracked detection with its label
+    # in the stream, if that was within 'label_codes_age' seconds. With several
+    # such objects in view they may be another one's codes.
+    def codes_for(self, stream_id, track_id, label=None, wait=0.0):
+        if track_id is not None:
+            key = (stream_id, track_id)
+            pending = lambda: key in self.in_flight
+        else:
+            pending = lambda: any(
+                key[0] == stream_id and isinstance(key[1], tuple) and key[1][0] == label
+                for key in self.in_flight
+            )
+        with self.condition:
+            if wait > 0:
+                self.condition.wait_for(lambda: not pending(), wait)
+            if track_id is not None:
+                result = self.results.get(key)
+            else:
+                result = self.label_codes.get((stream_id, label))
+                if result is not None and time.monotonic() - result.scanned_at > self.label_codes_age:
+                    result = None
+            return list(result.codes) if result is not None else []
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        print(f"{BARCODES_LOG_FORMAT}Barcode scanner stopped: {self.stats()}")
+
+    def stats(self):
+        with self.condition:
+            times = sorted(self.decode_times)
+            tracks = len(self.results)
+        decodes = len(times)
+        return {
+            "crops_submitted": self.crops_submitted,
+            "crops_skipped": self.crops_skipped,
+            "cache_hits": self.cache_hits,
+            "keys_cached": tracks,
+            "tracks_with_codes": self.tracks_with_codes,
+            "decode_p50_ms": times[decodes // 2] * 1000 if decodes else None,
+            "decode_p99_ms": times[min(int(decodes * 0.99), decodes - 1)] * 1000 if decodes else None
+        }
+
+    # Metrics collector, see metrics.py
+    def collect_metrics(self):
+        yield ("barcode_crops_total", "counter", "Detection crops handed to the decoders", None, self.crops_submitted)
+        yield ("barcode_crops_skipped_total", "counter", "Crops skipped, decoder pool full", None, self.crops_skipped)
+        yield ("barcode_cache_hits_total", "counter", "Detections answered from the per-track cache", None, self.cache_hits)
+        yield ("barcode_tracks_with_codes_total", "counter", "Tracks or untracked boxes a code was decoded for", None, self.tracks_with_codes)
+        yield ("barcode_decode_seconds_total", "counter", "Time spent decoding crops", None, self.decode_time)
@@ -5,69 +5,179 @@ from gi.repository import Gst
 from gi.repository import GLib
 import threading
 import socket
+import time
+from collections import deque
+
+from .ipc import MSG_RESUME
+from .tracking import TrackTable
+from .detections import DetectionExtractor
+from .events import DetectionEvents, EVENT_HANDLER_LOG_FORMAT, REACTION_GATE
+
+# Detection gate:
+# Wraps the 'detection_gate' valve. Closing and opening it is a property change,
+# not a state change, so there is no preroll, flush or camera restart involved.
+# The gate reopens by itself after 'resume_timeout' seconds if no resume signal
+# arrives, and records how long closing and reopening take:
+# - close latency: detection seen by the probe -> valve dropping frames
+# - open latency:  open requested -> first frame back at the probe
+class DetectionGate:
+	def __init__(self, pipeline, name="detection_gate", resume_timeout=30.0, on_open=None):
+		self.valve = pipeline.get_by_name(name)
+		self.resume_timeout = resume_timeout
+		self.on_open = on_open
+		self.closed = False
+		self.lock = threading.Lock()
+		self.deadline = None
+		self.open_requested_at = None
+		self.close_latencies = deque(maxlen=100)
+		self.open_latencies = deque(maxlen=100)
+		self.timeouts = 0
+
+	def close(self, detected_at):
+		with self.lock:
+			if self.closed:
+				return
+			self.valve.set_property("drop", True)
+			self.closed = True
+			latency = time.monotonic() - detected_at
+			self.close_latencies.append(latency)
+
+			self.deadline = threading.Timer(self.resume_timeout, self.open, args=("deadline",))
+			self.deadline.daemon = True
+			self.deadline.start()
+		print(f"{EVENT_HANDLER_LOG_FORMAT}Detection gate closed in {latency * 1000:.2f} ms.")
+
+	def open(self, reason="resume"):
+		with self.lock:
+			if not self.closed:
+				return
+			if self.deadline is not None:
+				self.deadline.cancel()
+				self.deadline = None
+			if reason == "deadline":
+				self.timeouts += 1
+			self.open_requested_at = time.monotonic()
+			self.valve.set_property("drop", False)
+			self.closed = False
+		print(f"{EVENT_HANDLER_LOG_FORMAT}Detection gate opened ({reason}).")
+		if self.on_open is not None:
+			self.on_open()
+
+	# Called for every frame with the time the probe saw it; only does work on
+	# the first frame seen after a reopen.
+	def frame_passed(self, seen_at):
+		if self.open_requested_at is None or seen_at < self.open_requested_at:
+			return
+		latency = seen_at - self.open_requested_at
+		self.open_requested_at = None
+		self.open_latencies.append(latency)
+		print(f"{EVENT_HANDLER_LOG_FORMAT}First frame after reopening the gate: {latency * 1000:.2f} ms.")
+
+	def stats(self):
+		def summary(values):
+			values = list(values)
+			if not values:
+				return None
+			return {
+				"min_ms": min(values) * 1000,
+				"avg_ms": sum(values) / len(values) * 1000,
+				"max_ms": max(values) * 1000
+			}
+		return {
+			"close": summary(self.close_latencies),
+			"open": summary(self.open_latencies),
+			"timeouts": self.timeouts
+		}
+
+# Detection event handler:
+# The pad probe (__call__) runs on the GStreamer streaming thread, so it only
+# extracts the frame's detections into a compact record and pushes it into a
+# bounded ring (see event_queue.py). The event logic (handle_record, see
+# events.py) runs on a separate consumer thread started with start().
+class DetectionEventHandler(DetectionEvents):
+	def __init__(self, reaction_mode=REACTION_GATE, queue_size=64):
+		super().__init__(reaction_mode, queue_size)
+		# Per-frame detection filtering, see detections.py:
+		self.extractor = DetectionExtractor()
 
-EVENT_HANDLER_LOG_FORMAT = "\033[1;35m[event_handler]\033[0m \t"
-class DetectionEventHandler:
-	def __init__(self):
-		self.fcount = 0
-		self.pipeline = None
-		self.paused = False
-
-	def increment(self):
-		self.fcount += 1
-	
-	def get_count(self):
-		return self.fcount
-	
 	def __call__(self, pad, info, user_data):
 		buffer = info.get_buffer()
 
 		if buffer is None:
 			return Gst.PadProbeReturn.OK
 
+		probe_time = time.monotonic()
 		user_data.increment()
-		cnt = user_data.get_count()
-		if cnt % 60 == 0:
-			print(f"Frame count: {cnt}")
 
 		roi = hailo.get_roi_from_buffer(buffer)
-		detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
-
-		# Customize as fit for intended purposes (TBD)
+		detections = self.extractor.tuples(roi)
+		self.events.push((user_data.fcount, buffer.pts, probe_time, detections))
 
-		best_detection = None
-		best_score = 0.0	
-		for detection in detections:
-			if detection.get_confidence() > best_score:
-				best_score = detection.get_confidence()
-				best_detection = detection	
-
-		if not best_detection:
-			return Gst.PadProbeReturn.OK
-		
-		label = best_detection.get_label()
-		print(f"{EVENT_HANDLER_LOG_FORMAT}Object detected: {label}")
-		if not self.paused:
-			self.paused = True
-			self.pipeline.set_state(Gst.State.PAUSED)
-			GLib.usleep(100000)
-			print(f"{EVENT_HANDLER_LOG_FORMAT}Pipeline Paused.")
-			# Send label to SLM/TTS  helper thread
-			# Helper thread will send a signal to the SLM/TTL to start processing the label
-			# Once processed, receives "done" signal and resumes the pipeline
-			threading.Thread(
-				target=send_label_thread,
-				args=(label,),
-				daemon=True
-			).start()
+		self.probe_timer.record(time.monotonic() - probe_time)
 		return Gst.PadProbeReturn.OK
 
-def send_label_thread(label, host='localhost', slm_port=5001):
-	# Needs to be in a try - catch block in the future for unexpected exceptions...
-	with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-		s.connect((host, slm_port))
-		s.sendall(label.encode())
-		print(f"{EVENT_HANDLER_LOG_FORMAT}Sent object {label} to SLM/TTS server.")
+	def pause_pipeline(self):
+		self.pipeline.set_state(Gst.State.PAUSED)
+		GLib.usleep(100000)
+		print(f"{EVENT_HANDLER_LOG_FORMAT}Pipeline Paused.")
+		deadline = threading.Timer(
+			self.resume_timeout, handle_resume, args=(self.pipeline, self), kwargs={"reason": "deadline"}
+		)
+		deadline.daemon = True
+		with self.resume_lock:
+			self.deadline = deadline
+		deadline.start()
+
+# Quiet event handler:
+# Its track tables confirm no track (no confidence reaches 2.0), so no event
+# ever stops the frames. Used to measure the pipeline at full rate (autotune,
+# benchmarks/bench_pipeline.py).
+def quiet_handler(**kwargs):
+	handler = DetectionEventHandler(**kwargs)
+	handler.track_factory = lambda: TrackTable(min_confidence=2.0)
+	handler.tracks = handler.track_factory()
+	return handler
+
+# Resume handling: shared by the legacy resume socket, the persistent channel
+# and the pause mode deadline ('reason'). A paused pipeline is resumed once per
+# pause, by whichever of the resume signal and the deadline comes first.
+def handle_resume(pipeline, handler, reason="resume"):
+	if handler.gate is not None:
+		handler.slm_replied()
+		print(f"{EVENT_HANDLER_LOG_FORMAT}Received resume signal, reopening the detection gate...")
+		handler.gate.open("resume")
+		return
+
+	with handler.resume_lock:
+		deadline, handler.deadline = handler.deadline, None
+	if deadline is None:
+		return
+	deadline.cancel()
+	if reason == "deadline":
+		handler.timeouts += 1
+		print(f"{EVENT_HANDLER_LOG_FORMAT}No resume signal within {handler.resume_timeout} s, flushing old data from pipeline...")
+	else:
+		handler.slm_replied()
+		print(f"{EVENT_HANDLER_LOG_FORMAT}Received resume signal, flushing old data from pipeline...")
+	pipeline.send_event(Gst.Event.new_flush_start())
+	pipeline.send_event(Gst.Event.new_flush_stop(False))
+	print(f"{EVENT_HANDLER_LOG_FORMAT}Pipeline flushed. Setting state to PLAYING...")
+	pipeline.set_state(Gst.State.PLAYING)
+	GLib.usleep(100000)
+	print(f"{EVENT_HANDLER_LOG_FORMAT}Pipeline resumed!")
+	handler.resume()
+
+# Channel message handler: called from the LabelChannel reader thread.
+# Resumes for any other label than the last one sent are stale and ignored.
+def on_channel_message(pipeline, handler, message):
+	if message.get("type") != MSG_RESUME:
+		return
+	with handler.resume_lock:
+		expected = handler.label_id
+	if message.get("id") != expected:
+		print(f"{EVENT_HANDLER_LOG_FORMAT}Ignoring resume for label {message.get('id')}, waiting for {expected}.")
+		return
+	handle_resume(pipeline, handler)
 
 def resume_pipeline_thread(pipeline, handler, resume_port=5002, host='localhost'):
 	with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
@@ -80,18 +190,12 @@ def resume_pipeline_thread(pipeline, handler, resume_port=5002, host='localhost'
 			data = conn.recv(1024).decode()
 
 			if data.strip() == "resume":
-				print(f"{EVENT_HANDLER_LOG_FORMAT}Received resume signal, flushing old data from pipeline...")
-				pipeline.send_event(Gst.Event.new_flush_start())
-				pipeline.send_event(Gst.Event.new_flush_stop(False))
-				print(f"{EVENT_HANDLER_LOG_FORMAT}Pipeline flushed. Setting state to PLAYING...")
-				pipeline.set_state(Gst.State.PLAYING)
-				GLib.usleep(100000)
-				print(f"{EVENT_HANDLER_LOG_FORMAT}Pipeline resumed!")
-				handler.paused = False
+				handle_resume(pipeline, handler)
 
 
 
 # Fallback default function if event handler proves to not work:        
+CALLBACK_EXTRACTOR = DetectionExtractor()
 def callback_func(pad, info, user_data):
 	buffer = info.get_buffer()
 
@@ -104,21 +208,14 @@ def callback_func(pad, info, user_data):
 		print(f"Frame count: {cnt}")
 
 	roi = hailo.get_roi_from_buffer(buffer)
-	detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
 
 	# Customize as fit for intended purposes (TBD)
 
-	best_detection = None
-	best_score = 0.0	
-	for detection in detections:
-		if detection.get_score() > best_score:
-			best_score = detection.get_score()
-			best_detection = detection
-
-	if not best_detection:
+	detections = CALLBACK_EXTRACTOR.tuples(roi)
+	if not detections:
 		return Gst.PadProbeReturn.OK
 	
-	label = best_detection.get_label()
+	label, best_score, track_id = max(detections, key=lambda detection: detection[1])
 
 	print(f"{label} was detected!")
 
@@ -1,75 +1,204 @@
 import gi
 import cv2
 import numpy as np
+import time
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst
-from picamera2 import Picamera2 
+
+from .sources import PicameraSource, DualStreamCameraSource, FramePacer
+from .streams import tag_stream
 
 CAM_LOG_FORMAT = "\033[1;36m[camera_thread] \033[0m \t"
-# PiCamera thread function:
-# This function runs in a separate thread and captures frames from the PiCamera,
-# processes them, and pushes them to the GStreamer pipeline.
-def cam_thread_func(pipeline, v_width, v_height, v_fps):
-    # Setting up properties for the element in the pipeline 
-	# corresponding to the input (in this case, Pi Camera - rpi):
-    input_src = pipeline.get_by_name("app_source")
-    input_src.set_property("is-live", True)
-    input_src.set_property("format", Gst.Format.TIME)
-    with Picamera2() as cam: 
-        # Creating main configuration:
-        main_conf = {
-            'size': (v_width, v_height),
-            'format': 'RGB888'
-        }
-        controls = {'FrameRate': v_fps}
-    
-        config = cam.create_preview_configuration(
-            main=main_conf, 
-            controls=controls
-        )
 
-        # Apply the configuration to the camera:
-        cam.configure(config)
+# Ingest modes:
+# - legacy: RGB888 capture, cvtColor, tobytes and a freshly wrapped Gst.Buffer per frame
+# - pooled: the camera is asked for RGB byte order directly (Picamera2 calls it BGR888)
+#   and each frame is copied once into a recycled buffer from a Gst.BufferPool
+INGEST_LEGACY = "legacy"
+INGEST_POOLED = "pooled"
+
+# Frame pool:
+# Preallocated Gst buffers that return to the pool once downstream elements
+# release them, so the steady state does not allocate any frame memory.
+class FramePool:
+    def __init__(self, caps, width, height, channels=3, min_buffers=4, max_buffers=8):
+        self.shape = (height, width, channels)
+        self.frame_size = width * height * channels
+        self.bytes_copied = 0
+
+        self.pool = Gst.BufferPool.new()
+        config = self.pool.get_config()
+        Gst.BufferPool.config_set_params(config, caps, self.frame_size, min_buffers, max_buffers)
+        self.pool.set_config(config)
+        self.pool.set_active(True)
+
+    # Copies (and optionally swaps R/B of) a frame into a pooled buffer.
+    # The swap is fused with the copy, so the frame is only ever written once.
+    def fill(self, frame, swap_rb=False):
+        ret, gst_buffer = self.pool.acquire_buffer(None)
+        if ret != Gst.FlowReturn.OK:
+            return None
+
+        ok, map_info = gst_buffer.map(Gst.MapFlags.WRITE)
+        if not ok:
+            return None
+        try:
+            dst = np.frombuffer(map_info.data, dtype=np.uint8, count=self.frame_size).reshape(self.shape)
+            if swap_rb:
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+            else:
+                np.copyto(dst, frame)
+        finally:
+            gst_buffer.unmap(map_info)
+
+        self.bytes_copied += self.frame_size
+        return gst_buffer
+
+    def close(self):
+        self.pool.set_active(False)
+
+# Ingest statistics:
+# Plain counters updated by the push thread and read by the metrics endpoint.
+# cpu_time is the push thread's own CPU time (time.thread_time), from reading
+# a frame to pushing it; time spent blocked waiting for the camera is not in it.
+class IngestStats:
+    def __init__(self):
+        self.frames_read = 0
+        self.frames_pushed = 0
+        self.frames_skipped = 0
+        self.push_failures = 0
+        self.cpu_time = 0.0
+
+    def cpu_ms_per_frame(self):
+        return self.cpu_time * 1000 / self.frames_read if self.frames_read else 0.0
 
-        width, height = config['main']['size']
-        fps = config['controls']['FrameRate']
-        input_src.set_property(
-            "caps", Gst.Caps.from_string(
-                f"video/x-raw, format=RGB, width={width}, height={height}, "
-                f"framerate={fps}/1, pixel-aspect-ratio=1/1"
-            )
+# Name of the appsrc element of each stream (the first keeps the single-stream name):
+def stream_source_name(stream_id):
+    return "app_source" if stream_id == 0 else f"app_source_{stream_id}"
+
+# Legacy frame conversion:
+# Kept for comparison with the pooled path. Copies the frame three times:
+# cvtColor output, tobytes() and the copy made by Gst.Buffer.new_wrapped.
+def legacy_frame_to_buffer(frame, swap_rb=True):
+    if swap_rb:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    frame = np.asarray(frame)
+    return Gst.Buffer.new_wrapped(frame.tobytes())
+
+LEGACY_COPIES_PER_FRAME = 3
+
+# Push thread function:
+# Runs in a separate thread, reads frames from a frame source (see sources.py),
+# converts them and pushes them to the 'app_source' element of the pipeline.
+# An optional MotionGate (see motion.py) drops or decimates frames of a static scene.
+def push_thread_func(pipeline, source, ingest_mode=INGEST_LEGACY, motion_gate=None, stats=None, tracer=None,
+                     stream_id=0, element_name="app_source"):
+    if stats is None:
+        stats = IngestStats()
+
+    # Setting up properties for the element in the pipeline
+    # corresponding to the input. Replays that run as fast as possible must
+    # not lose frames, so appsrc blocks instead of leaking for them:
+    input_src = pipeline.get_by_name(element_name)
+    input_src.set_property("is-live", source.realtime)
+    input_src.set_property("format", Gst.Format.TIME)
+    if not source.realtime:
+        input_src.set_property("block", True)
+        input_src.set_property("leaky-type", 0)
+
+    with source:
+        width, height, fps = source.width, source.height, source.fps
+        caps = Gst.Caps.from_string(
+            f"video/x-raw, format=RGB, width={width}, height={height}, "
+            f"framerate={fps}/1, pixel-aspect-ratio=1/1"
         )
+        input_src.set_property("caps", caps)
+
+        frame_pool = None
+        if ingest_mode == INGEST_POOLED:
+            frame_pool = FramePool(caps, width, height)
 
-        # Starting the camera: preprocessing before feeding frames to the pipeline
-        cam.start()
+        pacer = FramePacer(fps, enabled=source.realtime and not source.self_paced)
         frame_count = 0
+        gst_buffer_duration = Gst.util_uint64_scale_int(1, Gst.SECOND, int(round(fps)))
+        start_time = None
         while True:
 
-            # Reading frames from the camera:
-            frame_data = cam.capture_array('main')
+            # Reading frames from the source:
+            pacer.wait()
+            cpu_start = time.thread_time()
+            frame_data = source.read()
             if frame_data is None:
-                print("No data received from camera...")
+                print(f"{CAM_LOG_FORMAT}No more data received from the frame source.")
+                input_src.emit("end-of-stream")
                 break
+            capture_time = source.capture_time or time.monotonic()
+            if start_time is None:
+                start_time = capture_time
+            stats.frames_read += 1
 
-            # Converting to RGB formmat:
-			# OpenCV uses BGR format by default, so we need to convert it to RGB
-			# before pushing it to the GStreamer pipelinem which expects RGB
-            frame = cv2.cvtColor(frame_data, cv2.COLOR_BGR2RGB)
-            frame = np.asarray(frame)
+            # Skipped frames still advance the frame count, so replay PTS keeps following time:
+            if motion_gate is not None and not motion_gate.admit(frame_data):
+                stats.frames_skipped += 1
+                stats.cpu_time += time.thread_time() - cpu_start
+                frame_count += 1
+                if frame_count % 300 == 0:
+                    print(f"{CAM_LOG_FORMAT}Motion gate: {motion_gate.stats()}")
+                continue
 
             # Preparing the Gst_Buffer to be pushed to the pipeline:
-            gst_buffer = Gst.Buffer.new_wrapped(frame.tobytes())
-            gst_buffer_duration = Gst.util_uint64_scale_int(1, Gst.SECOND, 30)
-            gst_buffer.pts = frame_count * gst_buffer_duration
+            if frame_pool is not None:
+                gst_buffer = frame_pool.fill(frame_data, swap_rb=source.bgr)
+                if gst_buffer is None:
+                    print(f"{CAM_LOG_FORMAT}Could not acquire a buffer from the frame pool.")
+                    break
+            else:
+                # Converting to RGB formmat:
+                # OpenCV uses BGR format by default, so we need to convert it to RGB
+                # before pushing it to the GStreamer pipelinem which expects RGB
+                gst_buffer = legacy_frame_to_buffer(frame_data, swap_rb=source.bgr)
+            # Live sources are stamped with their capture time, so the PTS stays true
+            # when frames are late or skipped; replays keep a frame-count clock:
+            if source.realtime:
+                gst_buffer.pts = int((capture_time - start_time) * Gst.SECOND)
+            else:
+                gst_buffer.pts = frame_count * gst_buffer_duration
+            gst_buffer.pts = tag_stream(gst_buffer.pts, stream_id)
             gst_buffer.duration = gst_buffer_duration
+            if tracer is not None and tracer.sampled(frame_count):
+                tracer.stamp(gst_buffer.pts, capture_time)
 
             # Pushing buffer to pipeline:
             ret = input_src.emit("push-buffer", gst_buffer)
+            stats.cpu_time += time.thread_time() - cpu_start
             if ret != Gst.FlowReturn.OK:
+                stats.push_failures += 1
                 if ret == Gst.FlowReturn.FLUSHING:
                     break
                 else:
                     print(f"{CAM_LOG_FORMAT}Error pushing buffer to pipeline: {ret}")
                     break
+            stats.frames_pushed += 1
             frame_count += 1
-        print(f"{CAM_LOG_FORMAT}Camera thread exited.")
\ No newline at end of file
+
+        if frame_pool is not None:
+            frame_pool.close()
+        print(f"{CAM_LOG_FORMAT}Camera thread exited, {stats.cpu_ms_per_frame():.2f} ms ingest CPU per frame.")
+
+# PiCamera thread function:
+# This function runs in a separate thread and captures frames from the PiCamera,
+# processes them, and pushes them to the GStreamer pipeline.
+def cam_thread_func(pipeline, v_width, v_height, v_fps, ingest_mode=INGEST_LEGACY):
+    source = make_camera_source(v_width, v_height, v_fps, ingest_mode)
+    push_thread_func(pipeline, source, ingest_mode)
+
+# Camera source factory:
+# Picamera2 names formats after the little-endian word, so 'BGR888' yields
+# R, G, B byte order - exactly what the RGB caps expect in pooled mode.
+# With a lores_size, inference gets the camera's low-resolution stream and the
+# main stream is kept at v_width x v_height for display and snapshots.
+def make_camera_source(v_width, v_height, v_fps, ingest_mode=INGEST_LEGACY, lores_size=None):
+    cam_format = 'BGR888' if ingest_mode == INGEST_POOLED else 'RGB888'
+    if lores_size is not None:
+        return DualStreamCameraSource(v_width, v_height, v_fps, *lores_size, format=cam_format)
+    return PicameraSource(v_width, v_height, v_fps, format=cam_format)
@@ -0,0 +1,273 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+import numpy as np
+
+CLIPS_LOG_FORMAT = "\033[1;33m[clips] \033[0m \t"
+
+# Directory for event clips; the clip branch is only built when this
+# environment variable is set.
+CLIP_DIR_ENV = "DETECTION_DEVICE_CLIPS"
+
+def clip_dir():
+    directory = os.environ.get(CLIP_DIR_ENV)
+    return directory or None
+
+# Clip branch of the pipeline, teed off in front of the detection gate (so the
+# clip keeps running while the gate is closed). The leaky queue starts a new
+# thread, so encoding never runs on the detection path; when the encoder falls
+# behind, the queue drops the oldest raw frames (counted through 'overrun').
+def clip_branch(tee_name="clip_tee", quality=70):
+    return (
+        f'{tee_name}. ! queue name=clip_queue leaky=downstream max-size-buffers=4 '
+        'max-size-bytes=0 max-size-time=0 ! '
+        'videoconvert n-threads=2 ! video/x-raw, format=I420 ! '
+        f'jpegenc quality={quality} ! '
+        'appsink name=clip_sink emit-signals=true sync=false async=false max-buffers=4 drop=true'
+    )
+
+# Clip ring:
+# The encoded frames of the last seconds, in one preallocated arena of
+# 'max_bytes', so memory use is fixed no matter the bitrate. Frames are written
+# one after the other and wrap around; whatever a new frame overlaps is evicted.
+# entries holds (offset, size, pts) per frame, oldest first.
+# A frame evicted while still younger than 'seconds' means the arena is too
+# small for the window at the current bitrate, and is counted as lost.
+class ClipRing:
+    def __init__(self, max_bytes=16 << 20, seconds=10.0):
+        self.arena = np.empty(max_bytes, np.uint8)
+        self.max_bytes = max_bytes
+        self.window = int(seconds * 1e9)    # ns, PTS units
+        self.entries = deque()
+        self.write_pos = 0
+        self.lock = threading.Lock()
+
+        self.frames_in = 0
+        self.frames_lost = 0
+        self.frames_too_large = 0
+
+    def append(self, data, pts):
+        size = len(data)
+        if size > self.max_bytes:
+            self.frames_too_large += 1
+            return
+        with self.lock:
+            entries = self.entries
+            if self.write_pos + size > self.max_bytes:
+                # Wrap: everything between here and the end is older than what is at the start
+                while entries and entries[0][0] >= self.write_pos:
+                    self._evict(pts)
+                self.write_pos = 0
+            end = self.write_pos + size
+            while entries and entries[0][0] < end and entries[0][0] + entries[0][1] > self.write_pos:
+                self._evict(pts)
+            self.arena[self.write_pos:end] = np.frombuffer(data, np.uint8)
+            entries.append((self.write_pos, size, pts))
+            self.write_pos = end
+            self.frames_in += 1
+
+    def _evict(self, pts):
+        offset, size, evicted_pts = self.entries.popleft()
+        if pts - evicted_pts < self.window:
+            self.frames_lost += 1
+
+    # Copies out the frames with start_pts <= pts <= end_pts (and keep(pts) if
+    # given), oldest first, as (pts, bytes).
+    def snapshot(self, start_pts, end_pts, keep=None):
+        with self.lock:
+            return [
+                (pts, self.arena[offset:offset + size].tobytes())
+                for offset, size, pts in self.entries
+                if start_pts <= pts <= end_pts and (keep is None or keep(pts))
+            ]
+
+    def newest_pts(self):
+        with self.lock:
+            return self.entries[-1][2] if self.entries else None
+
+    def stats(self):
+        with self.lock:
+            held = sum(size for _, size, _ in self.entries)
+            span = (self.entries[-1][2] - self.entries[0][2]) / 1e9 if len(self.entries) > 1 else 0.0
+            frames = len(self.entries)
+        return {
+            "frames": frames,
+            "bytes": held,
+            "capacity": self.max_bytes,
+            "span_s": span,
+            "frames_in": self.frames_in,
+            "frames_lost": self.frames_lost,
+            "frames_too_large": self.frames_too_large
+        }
+
+# Clip recorder:
+# Keeps the clip ring fed from the clip branch's appsink (on the branch's own
+# thread) and, for every triggered event, writes the frames from 'pre_seconds'
+# before to 'post_seconds' after it on a writer thread:
+# - <time>_<label>.mjpeg: the JPEG frames as they were encoded, back to back
+#   (plays with e.g. 'ffplay -f mjpeg'), nothing is re-encoded
+# - <time>_<label>.json:  the event, and per frame its PTS, offset and size in
+#   the clip and the detections the event handler saw for it
+# trigger() never blocks: with 'max_pending' clips already waiting for the
+# writer the event's clip is dropped and counted.
+class ClipRecorder:
+    def __init__(self, directory, max_bytes=16 << 20, pre_seconds=5.0, post_seconds=2.0,
+                 clip_fps=10, max_pending=4):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.clip_fps = clip_fps
+        self.ring = ClipRing(max_bytes, pre_seconds + post_seconds)
+        self.requests = queue.Queue(max_pending)
+        # Detections per frame, as seen by the event handler: (pts, detections)
+        self.detections = deque(maxlen=int((pre_seconds + post_seconds) * 60))
+
+        self.stream_of = None   # streams.stream_of, set by attach()
+        self.next_pts = {}      # stream ID -> PTS of the next frame to keep
+        self.frames_decimated = 0
+        self.encoder_drops = 0
+        self.clips_written = 0
+        self.clips_dropped = 0
+        self.write_time = 0.0
+
+        self.running = True
+        self.writer = threading.Thread(target=self._write_loop, name="clip_writer", daemon=True)
+        self.writer.start()
+
+    def attach(self, pipeline, queue_name="clip_queue", sink_name="clip_sink"):
+        from gi.repository import Gst
+        from .streams import stream_of
+        self.Gst = Gst
+        self.stream_of = stream_of
+
+        clip_queue = pipeline.get_by_name(queue_name)
+        clip_queue.connect("overrun", self._on_overrun)
+        # Frames over clip_fps are dropped before they are converted and encoded:
+        clip_queue.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._decimate)
+        pipeline.get_by_name(sink_name).connect("new-sample", self._on_sample)
+        print(f"{CLIPS_LOG_FORMAT}Recording event clips to {self.directory} "
+              f"({self.ring.max_bytes >> 20} MB ring, {self.pre_seconds}+{self.post_seconds} s at {self.clip_fps} fps)")
+
+    def _on_overrun(self, clip_queue):
+        self.encoder_drops += 1
+
+    def _decimate(self, pad, info):
+        buffer = info.get_buffer()
+        if buffer is None:
+            return self.Gst.PadProbeReturn.OK
+        stream_id = self.stream_of(buffer.pts)
+        next_pts = self.next_pts.get(stream_id)
+        if next_pts is not None and buffer.pts < next_pts:
+            self.frames_decimated += 1
+            return self.Gst.PadProbeReturn.DROP
+        # A quarter period of slack, so capture jitter does not drop the frame that is due:
+        period = int(1e9 / self.clip_fps)
+        self.next_pts[stream_id] = buffer.pts + period - period // 4
+        return self.Gst.PadProbeReturn.OK
+
+    def _on_sample(self, sink):
+        Gst = self.Gst
+        sample = sink.emit("pull-sample")
+        if sample is None:
+            return Gst.FlowReturn.OK
+        buffer = sample.get_buffer()
+        ok, map_info = buffer.map(Gst.MapFlags.READ)
+        if ok:
+            try:
+                self.ring.append(map_info.data, buffer.pts)
+            finally:
+                buffer.unmap(map_info)
+        return Gst.FlowReturn.OK
+
+    # Event handler side (consumer thread), cheap enough to call for every frame:
+    def note(self, pts, detections):
+        self.detections.append((pts, detections))
+
+    def trigger(self, pts, label, confidence=None, track_id=None, stream_id=0):
+        event = {
+            "pts": pts,
+            "time": time.time(),
+            "label": label,
+            "confidence": confidence,
+            "track_id": track_id,
+            "stream_id": stream_id
+        }
+        try:
+            self.requests.put_nowait(event)
+        except queue.Full:
+            self.clips_dropped += 1
+            print(f"{CLIPS_LOG_FORMAT}Clip writer is behind, dropped the clip of {label}.")
+
+    def _write_loop(self):
+        while self.running:
+            try:
+                event = self.requests.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Wait for the frames after the event, or give up after the post window:
+            end_pts = event["pts"] + int(self.post_seconds * 1e9)
+            deadline = time.monotonic() + self.post_seconds + 1.0
+            while self.running and time.monotonic() < deadline:
+                newest = self.ring.newest_pts()
+                if newest is not None and newest >= end_pts:
+                    break
+                time.sleep(0.1)
+            try:
+                self.write_clip(event, end_pts)
+            except OSError as e:
+                print(f"{CLIPS_LOG_FORMAT}Could not write the clip of {event['label']}: {e}")
+
+    def write_clip(self, event, end_pts):
+        start = time.monotonic()
+        start_pts = event["pts"] - int(self.pre_seconds * 1e9)
+        stream_id = event["stream_id"]
+        keep = None if stream_id is None else (lambda pts: self.stream_of(pts) == stream_id)
+        frames = self.ring.snapshot(start_pts, end_pts, keep)
+        if not frames:
+            print(f"{CLIPS_LOG_FORMAT}No frames buffered for the clip of {event['label']}.")
+            return None
+
+        detections = {pts: frame_detections for pts, frame_detections in list(self.detections)}
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(event["time"]))
+        name = f"{stamp}_{re.sub(r'[^A-Za-z0-9_-]+', '_', event['label'])}"
+        clip_path = os.path.join(self.directory, f"{name}.mjpeg")
+
+        frame_info = []
+        offset = 0
+        with open(clip_path, "wb") as f:
+            for pts, data in frames:
+                f.write(data)
+                frame_info.append({
+                    "pts": pts,
+                    "offset": offset,
+                    "size": len(data),
+                    "detections": [list(detection) for detection in detections.get(pts, ())]
+                })
+                offset += len(data)
+        with open(os.path.join(self.directory, f"{name}.json"), "w") as f:
+            json.dump({"event": event, "clip": os.path.basename(clip_path), "frames": frame_info}, f, indent=1)
+
+        self.clips_written += 1
+        self.write_time += time.monotonic() - start
+        print(f"{CLIPS_LOG_FORMAT}Wrote {clip_path} ({len(frames)} frames, {offset >> 10} kB)")
+        return clip_path
+
+    def close(self):
+        self.running = False
+        self.writer.join(timeout=self.post_seconds + 2)
+        print(f"{CLIPS_LOG_FORMAT}Clip recorder stopped: {self.stats()}")
+
+    def stats(self):
+        return {
+            **self.ring.stats(),
+            "frames_decimated": self.frames_decimated,
+            "encoder_drops": self.encoder_drops,
+            "clips_written": self.clips_written,
+            "clips_dropped": self.clips_dropped,
+            "clips_pending": self.requests.qsize()
+        }
@@ -0,0 +1,50 @@
+import json
+import os
+
+CONFIG_LOG_FORMAT = "\033[1;33m[config] \033[0m \t"
+
+DEFAULT_PROFILE_PATH = os.path.expanduser("~/.config/detection-device/profile.json")
+
+# Configuration profile:
+# The pipeline parameters GstDetectionApp used to hard-code. A profile file
+# only needs the keys it changes; load_profile() fills in the rest from here.
+# 'python -m src.autotune' writes one from measurements on a replayed video.
+DEFAULT_PROFILE = {
+    "batch_size": 2,
+    "video_width": 1280,
+    "video_height": 720,
+    "video_fps": 30,
+    # Camera lores stream fed to inference (0 = off, the main stream is used);
+    # video_width x video_height is then the main stream's size, see sources.py
+    "lores_width": 0,
+    "lores_height": 0,
+    "pipeline_latency": 300,        # ms
+    "nms_score_threshold": 0.3,
+    "nms_iou_threshold": 0.45,
+}
+
+def load_profile(path=DEFAULT_PROFILE_PATH):
+    profile = dict(DEFAULT_PROFILE)
+    if path is None or not os.path.exists(path):
+        return profile
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"{CONFIG_LOG_FORMAT}Could not read profile {path}: {e}, using the defaults.")
+        return profile
+
+    for key, value in stored.get("profile", stored).items():
+        if key not in DEFAULT_PROFILE:
+            print(f"{CONFIG_LOG_FORMAT}Ignoring unknown profile key '{key}' in {path}.")
+            continue
+        profile[key] = type(DEFAULT_PROFILE[key])(value)
+    print(f"{CONFIG_LOG_FORMAT}Loaded profile from {path}: {profile}")
+    return profile
+
+# Writes {"profile": {...}, **metadata}; metadata records how the profile was chosen.
+def save_profile(profile, path=DEFAULT_PROFILE_PATH, **metadata):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"profile": profile, **metadata}, f, indent=2)
+    print(f"{CONFIG_LOG_FORMAT}Saved profile to {path}")
@@ -0,0 +1,169 @@
+import hailo
+import numpy as np
+from operator import itemgetter
+
+# Detection batch:
+# All detections of a frame as one NumPy structured array, so filtering and
+# ranking are array operations instead of Python loops over Hailo objects.
+# bbox is (xmin, ymin, width, height), normalized; track_id is -1 if untracked.
+DETECTION_DTYPE = np.dtype([
+    ("class_id", np.uint16),
+    ("confidence", np.float32),
+    ("bbox", np.float32, (4,)),
+    ("track_id", np.int32),
+])
+EMPTY_BATCH = np.zeros(0, DETECTION_DTYPE)
+
+# Normalized (xmin, ymin, width, height) boxes -> integer pixel corners
+# (x0, y0, x1, y1) in a frame of the given size, clipped to the frame. Takes
+# one box or an (N, 4) array such as batch["bbox"]. The camera's lores and main
+# streams show the same field of view, so the same boxes map into either.
+def bbox_to_pixels(bbox, width, height):
+    bbox = np.asarray(bbox, dtype=np.float32)
+    corners = np.concatenate([bbox[..., :2], bbox[..., :2] + bbox[..., 2:]], axis=-1)
+    corners *= np.array([width, height, width, height], dtype=np.float32)
+    corners = np.rint(corners).astype(np.int32)
+    np.clip(corners[..., 0::2], 0, width, out=corners[..., 0::2])
+    np.clip(corners[..., 1::2], 0, height, out=corners[..., 1::2])
+    return corners
+
+# Detection extractor:
+# Reads a frame's detections in a single pass (the Hailo API only hands out one
+# object at a time, so this pass stays in Python, but each getter is called
+# once per detection) and filters them in the same pass, through a
+# class_id -> (label, minimum confidence) table filled the first time a class
+# shows up:
+# - min_confidence, overridden per label by class_thresholds
+# - allowlist: only these labels are kept (None keeps all); other classes get
+#   an infinite minimum confidence
+# - min_area: minimum normalized box area (boxes are only read when set,
+#   or when with_boxes is True)
+# - top_k: keep the k most confident detections, sorted by confidence
+#   (None keeps all, in frame order)
+# Frames carry a handful of detections, where NumPy's fixed cost per call (a
+# few microseconds, plus copying the confidences out) outweighs the loop, so
+# the filters stay scalar and top-k only goes through NumPy from
+# NUMPY_TOP_K_MIN kept detections up (where it overtakes sorting them).
+# tuples() returns (label, confidence, track_id) tuples; extract() and
+# __call__() return a batch, for callers that want the boxes as an array.
+NUMPY_TOP_K_MIN = 512
+
+class DetectionExtractor:
+    def __init__(self, min_confidence=0.0, class_thresholds=None, allowlist=None,
+                 min_area=0.0, top_k=None, with_boxes=False):
+        self.min_confidence = min_confidence
+        self.class_thresholds = class_thresholds or {}
+        self.allowlist = set(allowlist) if allowlist is not None else None
+        self.min_area = min_area
+        self.top_k = top_k
+        self.with_boxes = with_boxes or min_area > 0
+
+        self.labels = {}    # class_id -> label
+        self.classes = {}   # class_id -> (label, minimum confidence)
+
+    def _learn_class(self, class_id, detection):
+        label = self.labels[class_id] = detection.get_label()
+        if self.allowlist is not None and label not in self.allowlist:
+            limit = float("inf")
+        else:
+            limit = self.class_thresholds.get(label, self.min_confidence)
+        known = self.classes[class_id] = (label, limit)
+        return known
+
+    # The kept detections in frame order, as (label, confidence, track_id)
+    # tuples, or (label, confidence, track_id, class_id, box) rows for a batch;
+    # track_id is None if untracked, box is None unless 'boxes'.
+    def _scan(self, roi, boxes, batch=False):
+        objects = roi.get_objects_typed(hailo.HAILO_DETECTION)
+        if not objects:
+            return []
+        classes = self.classes
+        min_area = self.min_area
+        unique_id_type = hailo.HAILO_UNIQUE_ID
+        rows = []
+        box = None
+        for detection in objects:
+            class_id = detection.get_class_id()
+            known = classes.get(class_id)
+            if known is None:
+                known = self._learn_class(class_id, detection)
+            confidence = detection.get_confidence()
+            if confidence < known[1]:
+                continue
+            if boxes:
+                bbox = detection.get_bbox()
+                box = (bbox.xmin(), bbox.ymin(), bbox.width(), bbox.height())
+                if box[2] * box[3] < min_area:
+                    continue
+            unique_ids = detection.get_objects_typed(unique_id_type)
+            if batch:
+                rows.append((known[0], confidence, unique_ids[0].get_id() if unique_ids else None, class_id, box))
+            else:
+                rows.append((known[0], confidence, unique_ids[0].get_id() if unique_ids else None))
+        return rows
+
+    def _top(self, rows):
+        top_k = self.top_k
+        if top_k is None or not rows:
+            return rows
+        if top_k == 1:
+            return [max(rows, key=itemgetter(1))]
+        if len(rows) <= top_k or len(rows) < NUMPY_TOP_K_MIN:
+            return sorted(rows, key=itemgetter(1), reverse=True)[:top_k]
+        confidences = np.fromiter((row[1] for row in rows), np.float32, len(rows))
+        best = np.argpartition(-confidences, top_k - 1)[:top_k]
+        best = best[np.argsort(-confidences[best], kind="stable")]
+        return [rows[i] for i in best.tolist()]
+
+    # The selected detections as (label, confidence, track_id) tuples, as used
+    # by the event records and the track table; track_id is None for untracked
+    # detections.
+    def tuples(self, roi):
+        return tuple(self._top(self._scan(roi, self.min_area > 0)))
+
+    # The filtered detections as a batch, in frame order (top_k is left to select()):
+    def extract(self, roi):
+        rows = self._scan(roi, self.with_boxes, batch=True)
+        if not rows:
+            return EMPTY_BATCH
+        batch = np.empty(len(rows), DETECTION_DTYPE)
+        batch["class_id"] = [row[3] for row in rows]
+        batch["confidence"] = [row[1] for row in rows]
+        batch["track_id"] = [row[2] if row[2] is not None else -1 for row in rows]
+        if self.with_boxes:
+            batch["bbox"] = [row[4] for row in rows]
+        else:
+            batch["bbox"] = 0.0
+        return batch
+
+    # top_k on a batch from extract():
+    def select(self, batch):
+        top_k = self.top_k
+        if top_k is None or not len(batch):
+            return batch
+        confidences = batch["confidence"]
+        if top_k == 1:
+            best = int(confidences.argmax())
+            return batch[best:best + 1]
+        if len(batch) > top_k:
+            batch = batch[np.argpartition(-confidences, top_k - 1)[:top_k]]
+            confidences = batch["confidence"]
+        return batch[np.argsort(-confidences, kind="stable")]
+
+    def __call__(self, roi):
+        return self.select(self.extract(roi))
+
+    def label(self, class_id):
+        return self.labels.get(class_id)
+
+    # A batch as (label, confidence, track_id) tuples, like tuples():
+    def to_tuples(self, batch):
+        if not len(batch):
+            return ()
+        labels = self.labels
+        return tuple(
+            (labels[class_id], confidence, track_id if track_id >= 0 else None)
+            for class_id, confidence, track_id in zip(
+                batch["class_id"].tolist(), batch["confidence"].tolist(), batch["track_id"].tolist()
+            )
+        )
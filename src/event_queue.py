@@ -0,0 +1,98 @@
+import threading
+from array import array
+from collections import deque
+
+# Detection record:
+# What the probe hands over to the event logic for one frame. Kept to plain
+# tuples so building one on the streaming thread is cheap:
+#   (frame_index, pts, probe_time, detections)
+# where detections is a tuple of (label, confidence, track_id) tuples,
+# probe_time is the time.monotonic() at which the probe saw the frame and pts
+# is the buffer PTS, which identifies the frame for tracing (see tracing.py).
+
+# Event ring:
+# Bounded single-producer/single-consumer queue between the pad probe and the
+# event thread. deque.append/popleft are atomic under the GIL, so the probe never
+# takes a lock; when the consumer falls behind the oldest record is dropped
+# (deque maxlen) and counted.
+class EventRing:
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.records = deque(maxlen=capacity)
+        self.ready = threading.Event()
+        self.pushed = 0
+        self.dropped = 0
+
+    # Producer side (streaming thread):
+    def push(self, record):
+        if len(self.records) == self.capacity:
+            self.dropped += 1
+        self.records.append(record)
+        self.pushed += 1
+        self.ready.set()
+
+    # Consumer side: returns the oldest record, or None after 'timeout' seconds.
+    def pop(self, timeout=None):
+        while True:
+            try:
+                return self.records.popleft()
+            except IndexError:
+                pass
+            self.ready.clear()
+            # Re-check after clearing, a push may have happened in between:
+            if self.records:
+                continue
+            if not self.ready.wait(timeout):
+                return None
+
+    def __len__(self):
+        return len(self.records)
+
+    def stats(self):
+        return {
+            "pushed": self.pushed,
+            "dropped": self.dropped,
+            "fill": len(self.records),
+            "capacity": self.capacity
+        }
+
+# Probe timer:
+# Keeps the last 'window' probe durations in a preallocated array. Recording is
+# one store and one increment; percentiles are only computed when asked for,
+# off the streaming thread.
+class ProbeTimer:
+    def __init__(self, window=1024):
+        self.window = window
+        self.samples = array('d', bytes(8 * window))
+        self.count = 0
+
+    def record(self, duration):
+        self.samples[self.count % self.window] = duration
+        self.count += 1
+
+    def percentiles(self, points=(50, 90, 99)):
+        valid = sorted(self.samples[:min(self.count, self.window)])
+        if not valid:
+            return {}
+        result = {f"p{p}_us": valid[min(len(valid) * p // 100, len(valid) - 1)] * 1e6 for p in points}
+        result["max_us"] = valid[-1] * 1e6
+        return result
+
+# Event consumer thread:
+# Pops records from the ring and hands them to 'handle' until stopped.
+class EventConsumer(threading.Thread):
+    def __init__(self, ring, handle, name="event_consumer"):
+        super().__init__(name=name, daemon=True)
+        self.ring = ring
+        self.handle = handle
+        self.running = True
+
+    def run(self):
+        while self.running:
+            record = self.ring.pop(timeout=0.5)
+            if record is not None:
+                self.handle(record)
+
+    def stop(self):
+        self.running = False
+        self.ring.ready.set()
@@ -0,0 +1,192 @@
+import socket
+import threading
+import time
+from collections import deque
+
+from .event_queue import EventRing, ProbeTimer, EventConsumer
+from .tracking import TrackTable
+from .streams import stream_of
+
+EVENT_HANDLER_LOG_FORMAT = "\033[1;35m[event_handler]\033[0m \t"
+
+# Reaction modes: what happens to the pipeline while the SLM/TTS stage is busy
+# - pause: PAUSE the whole pipeline, flush and go back to PLAYING on resume (legacy)
+# - gate:  keep the pipeline PLAYING and close the 'detection_gate' valve in front
+#          of the inference stage, so frames are dropped before reaching the NPU
+REACTION_PAUSE = "pause"
+REACTION_GATE = "gate"
+
+# Detection event logic:
+# Everything the event handler does with a frame's record, from the track
+# tables to sending the label. It needs neither hailo nor GStreamer, so a
+# recording can be replayed through it off the device (see recording.py).
+# DetectionEventHandler (callbacks.py) adds the pad probe that feeds the ring
+# and the pipeline pause of the pause reaction mode.
+class DetectionEvents:
+    def __init__(self, reaction_mode=REACTION_GATE, queue_size=64):
+        self.fcount = 0
+        self.pipeline = None
+        self.paused = False
+        self.reaction_mode = reaction_mode
+        self.gate = None    # Set by the app once the pipeline exists (gate mode only)
+        self.channel = None # Persistent LabelChannel to the SLM/TTS server, see ipc.py
+
+        self.events = EventRing(queue_size)
+        self.probe_timer = ProbeTimer()
+        self.consumer = None
+
+        # Only new or returning tracks trigger events, see tracking.py:
+        # Each stream has its own track table (self.tracks is stream 0's); extra
+        # ones are made by track_factory when their first frame arrives.
+        self.tracks = TrackTable()
+        self.track_factory = TrackTable
+        self.stream_tracks = {}
+
+        # Counters for the metrics endpoint (updated on the consumer thread):
+        self.detection_frames = 0
+        self.events_sent = 0
+        self.paused_since = None
+        self.paused_time = 0.0
+        self.label_sent_at = None
+        self.slm_round_trips = deque(maxlen=100)
+
+        # Resume matching: only the resume for the last label sent ('label_id',
+        # the channel's message id) lets detection go on, so a late resume for
+        # an earlier label cannot end the current pause. In pause mode the
+        # pipeline is resumed by itself after 'resume_timeout' seconds if that
+        # resume never comes (the gate has its own deadline, see DetectionGate).
+        self.resume_lock = threading.Lock()
+        self.label_id = None
+        self.resume_timeout = 30.0
+        self.deadline = None
+        self.timeouts = 0
+
+        # Optional FrameTracer (tracing.py), set by the app when tracing is enabled:
+        self.tracer = None
+        self.label_pts = None
+        # Optional ClipRecorder (clips.py): saves a clip around every event
+        self.clip_recorder = None
+        # Optional BarcodeScanner (barcodes.py): codes decoded on the event's track
+        # go out with its label; a decode still running gets 'barcode_wait' seconds
+        self.barcode_scanner = None
+        self.barcode_wait = 0.1
+
+    def increment(self):
+        self.fcount += 1
+
+    def get_count(self):
+        return self.fcount
+
+    # Called once the pipeline (or the gate) lets frames through again; a
+    # resume still on its way for the last label is stale from now on:
+    def resume(self):
+        if self.paused_since is not None:
+            self.paused_time += time.monotonic() - self.paused_since
+            self.paused_since = None
+        self.label_id = None
+        self.paused = False
+
+    # Called when the SLM/TTS server answers the last label:
+    def slm_replied(self):
+        if self.label_sent_at is not None:
+            replied_at = time.monotonic()
+            self.slm_round_trips.append(replied_at - self.label_sent_at)
+            if self.tracer is not None:
+                self.tracer.complete("slm_round_trip", self.label_sent_at, replied_at)
+                self.tracer.mark("slm_reply", self.label_pts, at=replied_at, final=True)
+            self.label_sent_at = None
+
+    def tracks_for(self, stream_id):
+        if stream_id == 0:
+            return self.tracks
+        tracks = self.stream_tracks.get(stream_id)
+        if tracks is None:
+            tracks = self.stream_tracks[stream_id] = self.track_factory()
+        return tracks
+
+    def start(self):
+        self.consumer = EventConsumer(self.events, self.handle_record)
+        self.consumer.start()
+
+    def stop(self):
+        if self.consumer is not None:
+            self.consumer.stop()
+
+    # Pause reaction mode (no gate): stops the pipeline until the resume.
+    # Needs GStreamer, see DetectionEventHandler in callbacks.py.
+    def pause_pipeline(self):
+        raise NotImplementedError("pause mode needs the pipeline, see callbacks.DetectionEventHandler")
+
+    # Event logic: runs on the consumer thread for every record pushed by the probe
+    def handle_record(self, record):
+        frame_index, pts, probe_time, detections = record
+        if self.gate is not None:
+            self.gate.frame_passed(probe_time)
+
+        if frame_index % 60 == 0:
+            print(f"Frame count: {frame_index}")
+        if frame_index % 600 == 0:
+            print(f"{EVENT_HANDLER_LOG_FORMAT}Probe time: {self.probe_timer.percentiles()}, queue: {self.events.stats()}")
+
+        # Customize as fit for intended purposes (TBD)
+
+        if self.clip_recorder is not None:
+            self.clip_recorder.note(pts, detections)
+
+        # Frames still in flight after an event are ignored, so they do not age the tracks:
+        if self.paused:
+            return
+        if detections:
+            self.detection_frames += 1
+        stream_id = stream_of(pts)
+        events = self.tracks_for(stream_id).update(probe_time, detections)
+        if self.tracer is not None:
+            self.tracer.mark("event_logic", pts, final=not events)
+        if not events:
+            return
+        # One event per frame (see TrackTable.update), so no other track loses its turn:
+        label, best_score, track_id = events[0]
+
+        print(f"{EVENT_HANDLER_LOG_FORMAT}Object detected: {label} (stream {stream_id}, track {track_id}), tracks: {self.tracks_for(stream_id).stats()}")
+        if self.clip_recorder is not None:
+            self.clip_recorder.trigger(pts, label, best_score, track_id, stream_id)
+        if self.channel is not None and not self.channel.connected.is_set():
+            # Server not connected yet: keep detecting instead of waiting for a resume that never comes
+            return
+
+        self.paused = True
+        self.paused_since = time.monotonic()
+        self.events_sent += 1
+        self.label_sent_at = self.paused_since
+        self.label_pts = pts
+        if self.gate is not None:
+            self.gate.close(probe_time)
+        else:
+            self.pause_pipeline()
+
+        if self.channel is not None:
+            # Persistent channel: the resume message comes back on the same connection
+            codes = None
+            if self.barcode_scanner is not None:
+                codes = self.barcode_scanner.codes_for(stream_id, track_id, label, wait=self.barcode_wait)
+            # Held while sending, so a quick resume waits until its id is known:
+            with self.resume_lock:
+                self.label_id = self.channel.send_label(label, best_score, track_id, stream_id, codes)
+            if self.tracer is not None:
+                self.tracer.mark("event_dispatch", pts)
+        else:
+            # Send label to SLM/TTS  helper thread
+            # Helper thread will send a signal to the SLM/TTL to start processing the label
+            # Once processed, receives "done" signal and resumes the pipeline
+            threading.Thread(
+                target=send_label_thread,
+                args=(label,),
+                daemon=True
+            ).start()
+
+def send_label_thread(label, host='localhost', slm_port=5001):
+    # Needs to be in a try - catch block in the future for unexpected exceptions...
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.connect((host, slm_port))
+        s.sendall(label.encode())
+        print(f"{EVENT_HANDLER_LOG_FORMAT}Sent object {label} to SLM/TTS server.")
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_LOG_FORMAT = "\033[1;33m[fact_cache] \033[0m \t"
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.cache/detection-device/facts.sqlite3")
+
+# Fact cache:
+# Sits in front of the Ollama query. Entries are keyed by (label, model, prompt)
+# and live in an in-memory LRU, backed by a SQLite file so they survive restarts.
+#
+# - ttl:           entries older than this are never served
+# - refresh_after: entries older than this are still served, but a background
+#                  refresh is started for them ("serve cached, refresh later")
+# - max_refreshes: cap on concurrent background refreshes; further stale hits
+#                  are served without starting one
+class FactCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, capacity=128, disk_capacity=4096,
+                 ttl=7 * 24 * 3600, refresh_after=6 * 3600, max_refreshes=1):
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+
+        self.entries = OrderedDict()    # key -> (value, created_at)
+        self.lock = threading.Lock()
+        self.refreshing = set()
+        self.refresh_slots = threading.BoundedSemaphore(max_refreshes)
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS facts "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM facts WHERE created_at < ?", (time.time() - ttl,))
+
+    @staticmethod
+    def make_key(label, model, prompt):
+        return hashlib.sha1(f"{label}\0{model}\0{prompt}".encode()).hexdigest()
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+            row = self.db.execute(
+                "SELECT value, created_at FROM facts WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = (row[0], row[1])
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def put(self, key, value):
+        entry = (value, time.time())
+        self._remember(key, entry)
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO facts (key, value, created_at) VALUES (?, ?, ?)",
+                (key, entry[0], entry[1])
+            )
+            self.db.execute(
+                "DELETE FROM facts WHERE key NOT IN "
+                "(SELECT key FROM facts ORDER BY created_at DESC LIMIT ?)",
+                (self.disk_capacity,)
+            )
+
+    # Returns the cached fact for (label, model, prompt), calling 'fetch' on a miss
+    # and 'refresh' (defaults to 'fetch') for background refreshes. Both should
+    # raise on failure, so errors are never cached.
+    def get_or_fetch(self, label, model, prompt, fetch, refresh=None):
+        start = time.monotonic()
+        key = self.make_key(label, model, prompt)
+        entry = self._get(key)
+        if entry is not None:
+            value, created_at = entry
+            age = time.time() - created_at
+            if age < self.ttl:
+                if age >= self.refresh_after:
+                    self.stale_hits += 1
+                    self._refresh(key, refresh or fetch)
+                self.hits += 1
+                self.hit_time += time.monotonic() - start
+                return value
+
+        self.misses += 1
+        try:
+            value = fetch()
+        finally:
+            self.miss_time += time.monotonic() - start
+        self.put(key, value)
+        return value
+
+    def _refresh(self, key, fetch):
+        with self.lock:
+            if key in self.refreshing or not self.refresh_slots.acquire(blocking=False):
+                return
+            self.refreshing.add(key)
+
+        def refresh():
+            try:
+                self.put(key, fetch())
+                self.refreshes += 1
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"{CACHE_LOG_FORMAT}Background refresh failed: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+                self.refresh_slots.release()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "entries": len(self.entries),
+            "avg_hit_ms": self.hit_time / self.hits * 1000 if self.hits else 0.0,
+            "avg_miss_ms": self.miss_time / self.misses * 1000 if self.misses else 0.0
+        }
+
+    def close(self):
+        with self.lock:
+            self.db.close()
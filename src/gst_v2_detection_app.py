@@ -1,4 +1,6 @@
+import copy
 import threading
+import time
 import gi
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib, GObject
@@ -16,12 +18,47 @@ from hailo_apps_infra.gstreamer_helper_pipelines import(
     DISPLAY_PIPELINE,
 )
 
-from .camera import cam_thread_func
-from .callbacks import callback_func, DetectionEventHandler, resume_pipeline_thread
+from .camera import (
+	push_thread_func,
+	make_camera_source,
+	stream_source_name,
+	IngestStats,
+	INGEST_POOLED
+)
+from .streams import MAX_STREAMS
+from .callbacks import (
+	callback_func,
+	DetectionEventHandler,
+	DetectionGate,
+	resume_pipeline_thread,
+	on_channel_message
+)
+from .events import REACTION_GATE
+from .ipc import LabelChannel, DEFAULT_CHANNEL_ADDRESS
+from .metrics import MetricsRegistry, MetricsServer, RateGauge, metrics_port
+from .tracing import FrameTracer, trace_path
+from .recording import DetectionRecorder
+from .config import load_profile
+from .shared_frames import ProcessFrameSource
+from .clips import ClipRecorder, clip_branch, clip_dir
+from .preview import PreviewServer, preview_branch, preview_port
+from .barcodes import BarcodeScanner
+from .startup import notify_ready
 
 DETECTION_LOG_FORMAT = "\033[1;32m[detection_app] \033[0m \t"
+
+# Traced stage boundaries, as (stage, element whose src pad is probed), in pipeline order.
+# Element names are the ones the hailo_apps_infra helper pipelines give them.
+TRACE_STAGES = [
+	("source", "app_source"),
+	("gate", "detection_gate"),
+	("inference", "inference_wrapper_agg"),
+	("tracker", "hailo_tracker"),
+	("callback", "identity_callback"),
+]
+
 class GstDetectionApp:
-	def __init__(self, app_callback, e_handler: DetectionEventHandler):
+	def __init__(self, app_callback, e_handler: DetectionEventHandler, frame_source=None, profile=None):
 		# Setting process title:
 		setproctitle.setproctitle("Object detection - Hailo")
 
@@ -33,12 +70,6 @@ class GstDetectionApp:
 		# Architecture: HAILO8L from running command "hailortcli fw-control identify" in terminal
 		# Architecture is used to select the proper HEF file for the model
 		
-		# Checking for TAPPAS post-process directory:
-		check_tappas = os.environ.get('TAPPAS_POST_PROC_DIR', 'not_found') 
-		if check_tappas == 'not_found':
-			print(f"{DETECTION_LOG_FORMAT}Post-processing directory environment variable not set. Probably because setup_env.sh was not sourced.")
-			exit(1)
-
 		# Other post-processing variables:
 		self.current_dir = os.path.dirname(os.path.abspath(__file__))
 		self.post_process_so = os.path.abspath(
@@ -50,6 +81,8 @@ class GstDetectionApp:
 		self.post_function_name = "filter_letterbox"
 
 		# Variables:
+		# Every frame source (camera, file replay, synthetic) feeds the same appsrc,
+		# so the source pipeline is always the 'rpi' one. See sources.py.
 		self.source = 'rpi' 
 		self.video_sink = "fakesink" #"autovideosink"
 		self.pipeline = None				# Created using the Gst.parse_launch function
@@ -57,17 +90,85 @@ class GstDetectionApp:
 		self.loop = None
 		self.threads = []
 		self.error_occurred = False
-		self.pipeline_latency = 300 # ms
+		self.pipeline_playing = False		# Reported once to the startup orchestrator, see startup.py
+		# Configuration profile: see config.py, written by 'python -m src.autotune'
+		if profile is None:
+			profile = load_profile()
+		self.profile = profile
+		self.pipeline_latency = profile["pipeline_latency"] # ms
+		self.resume_timeout = 30	# s, the detection gate reopens (or the paused pipeline resumes) by itself after this
+		self.ipc_address = DEFAULT_CHANNEL_ADDRESS	# SLM/TTS channel, None for the legacy per-event sockets
+		self.ingest_mode = INGEST_POOLED	# See camera.py for the available ingest modes
+		self.motion_gate = None				# Optional MotionGate (motion.py) to skip static frames
+		self.process_split = False			# Capture each source in its own process, see shared_frames.py
+		self.ingest_stats = IngestStats()
+		self.metrics_port = metrics_port()	# Prometheus endpoint, set through DETECTION_DEVICE_METRICS_PORT
+		self.metrics_server = None
+		self.ingest_rate = RateGauge()
+		self.callback_rate = RateGauge()
+		self.trace_path = trace_path("detector")	# Chrome trace output, set through DETECTION_DEVICE_TRACE
+		self.tracer = None
+		self.record_path = None		# Records every frame's detections for offline replay, see recording.py
+		self.recorder = None
+		# Event clips: a JPEG-encoded branch feeds a fixed-size ring, see clips.py.
+		# The branch is built when DETECTION_DEVICE_CLIPS names a directory.
+		self.clip_dir = clip_dir()
+		self.clip_memory = 16 << 20		# bytes held for the ring
+		self.clip_pre_seconds = 5.0
+		self.clip_post_seconds = 2.0
+		self.clip_fps = 10
+		self.clip_recorder = None
+		# Live MJPEG preview with overlays, only encoded while a client watches, see preview.py
+		# The branch is built when DETECTION_DEVICE_PREVIEW_PORT names a port.
+		self.preview_port = preview_port()
+		self.preview_fps = 5
+		self.preview_quality = 60
+		self.preview_server = None
+		# Barcode/QR decoding on the crops of tracked detections, sent with the event, see barcodes.py
+		self.barcode_scan = False
+		self.barcode_labels = None			# Labels whose crops are scanned, None for all
+		self.barcode_workers = 2
+		self.barcode_scanner = None
 		
 
 
 		# Hailo parameters:
-		self.batch_size = 2
-		self.nms_score_threshold = 0.3
-		self.nms_iou_threshold = 0.45
-		self.video_width = 1280
-		self.video_height = 720
+		self.batch_size = profile["batch_size"]
+		self.nms_score_threshold = profile["nms_score_threshold"]
+		self.nms_iou_threshold = profile["nms_iou_threshold"]
+		self.video_width = profile["video_width"]
+		self.video_height = profile["video_height"]
+		self.video_fps = profile["video_fps"]
 		self.video_format = "RGB"
+		self.lores_size = None
+		if profile["lores_width"] > 0 and profile["lores_height"] > 0:
+			self.lores_size = (profile["lores_width"], profile["lores_height"])
+
+		# Frame source: defaults to the Pi Camera. A list of sources runs them as
+		# separate streams through the same inference stage (see get_pipeline_string)
+		if isinstance(frame_source, (list, tuple)):
+			self.frame_sources = list(frame_source)
+			frame_source = self.frame_sources[0]
+		else:
+			self.frame_sources = None
+		if frame_source is None:
+			frame_source = make_camera_source(
+				self.video_width,
+				self.video_height,
+				self.video_fps,
+				self.ingest_mode,
+				lores_size=self.lores_size
+			)
+		self.frame_source = frame_source
+		if self.frame_sources is None:
+			self.frame_sources = [frame_source]
+		if len(self.frame_sources) > MAX_STREAMS:
+			print(f"{DETECTION_LOG_FORMAT}At most {MAX_STREAMS} frame sources are supported.")
+			exit(1)
+		self.stream_stats = [self.ingest_stats] + [IngestStats() for _ in self.frame_sources[1:]]
+		# The pipeline runs at the source's size (the lores size in dual-stream mode):
+		self.video_width = frame_source.width
+		self.video_height = frame_source.height
 		
 		
 		# Extracting the HEF Path: found in the 'resources' folder of the project
@@ -96,6 +197,13 @@ class GstDetectionApp:
 		# Creating the pipeline:
 		self.create_pipeline()
 		self.e_handler.pipeline = self.pipeline
+		self.e_handler.resume_timeout = self.resume_timeout
+		if self.e_handler.reaction_mode == REACTION_GATE:
+			self.e_handler.gate = DetectionGate(
+				self.pipeline,
+				resume_timeout=self.resume_timeout,
+				on_open=self.e_handler.resume
+			)
 
 	def shutdown(self, signum=None, frame=None):
 		print(f"\n{DETECTION_LOG_FORMAT}Shutting down the application...")
@@ -110,6 +218,15 @@ class GstDetectionApp:
 		GLib.idle_add(self.loop.quit)  # Quit the main loop
 
 	def create_pipeline(self):
+		# Checking for TAPPAS post-process directory:
+		# Needed by the Hailo elements, so it is checked here rather than in
+		# __init__; the pipeline string itself builds without it (see
+		# benchmarks/bench_pipeline.py)
+		check_tappas = os.environ.get('TAPPAS_POST_PROC_DIR', 'not_found') 
+		if check_tappas == 'not_found':
+			print(f"{DETECTION_LOG_FORMAT}Post-processing directory environment variable not set. Probably because setup_env.sh was not sourced.")
+			exit(1)
+
 		Gst.init(None)
 
 		self.pipeline_string = self.get_pipeline_string()
@@ -126,11 +243,28 @@ class GstDetectionApp:
 	def get_pipeline_string(self):
 
 		# Source pipeline:
-		source_pipeline = SOURCE_PIPELINE(
-			self.source,
-			self.video_width,
-			self.video_height
-		)
+		# Every stream gets its own source branch at its source's size, scaled
+		# to the pipeline resolution (stream 0's). Several streams are merged by
+		# a round-robin element, so the inference element sees their frames
+		# interleaved and its batches fill up; the stream ID rides in the PTS
+		# (see camera.py).
+		source_pipelines = [
+			stream_source_pipeline(self.source, source, self.video_width, self.video_height, stream_id)
+			for stream_id, source in enumerate(self.frame_sources)
+		]
+		if len(source_pipelines) == 1:
+			source_pipeline = source_pipelines[0]
+		else:
+			source_pipeline = (
+				' '.join(f'{branch} ! stream_mux.sink_{stream_id}' for stream_id, branch in enumerate(source_pipelines))
+				+ ' hailoroundrobin mode=0 name=stream_mux'
+			)
+
+		# Event clip branch: teed off in front of the detection gate, encoded on its own thread
+		clip_pipeline = ''
+		if self.clip_dir is not None:
+			source_pipeline = f'{source_pipeline} ! tee name=clip_tee'
+			clip_pipeline = f' {clip_branch()}'
 
 		# Detection pipeline:
 		detection_pipeline = INFERENCE_PIPELINE(
@@ -147,14 +281,30 @@ class GstDetectionApp:
 			detection_pipeline
 		)
 
+		# Detection gate: a valve in front of the inference stage that drops frames
+		# while the SLM/TTS stage is busy, without leaving the PLAYING state
+		detection_gate = 'valve name=detection_gate drop=false'
+
 		# Tracker pipeline:
-		tracker_pipeline = TRACKER_PIPELINE(
-			class_id=1
-		)
+		# hailotracker matches boxes by position and never reads the stream ID,
+		# so with several streams it would link boxes from different cameras
+		# into the same tracks. Tracking is then left out: the track tables
+		# (one per stream, see callbacks.py) key untracked detections by label.
+		tracker_pipeline = ''
+		if len(self.frame_sources) == 1:
+			tracker_pipeline = TRACKER_PIPELINE(
+				class_id=1
+			) + ' ! '
 
 		# User callback pipeline:
 		user_callback_pipeline = USER_CALLBACK_PIPELINE()
 
+		# Preview branch: teed off after the callback, closed while nobody watches
+		preview_pipeline = ''
+		if self.preview_port is not None:
+			user_callback_pipeline = f'{user_callback_pipeline} ! tee name=preview_tee'
+			preview_pipeline = f' {preview_branch(self.preview_fps, self.preview_quality)}'
+
 		# Display pipeline:
 		display_pipeline = DISPLAY_PIPELINE(
 			video_sink=self.video_sink
@@ -162,10 +312,13 @@ class GstDetectionApp:
 
 		pipeline_string = (
 			f'{source_pipeline} ! '
+			f'{detection_gate} ! '
 			f'{detection_pipeline_wrapper} ! '
-			f'{tracker_pipeline} ! '
+			f'{tracker_pipeline}'
 			f'{user_callback_pipeline} ! '
 			f'{display_pipeline}'
+			f'{clip_pipeline}'
+			f'{preview_pipeline}'
 		)
 
 		return pipeline_string
@@ -177,6 +330,60 @@ class GstDetectionApp:
 		self.pipeline.debug_to_dot_file(Gst.DebugGraphDetails.ALL, dot_file_path)
 		print(f"{DETECTION_LOG_FORMAT}Pipeline graph dumped to {dot_file_path}")
 		
+	# Metrics collector: read when /metrics is scraped, see metrics.py.
+	# Everything here comes from counters the hot paths already keep, or from
+	# element properties, so scraping adds nothing to the streaming thread.
+	def collect_metrics(self):
+		for stream_id, stats in enumerate(self.stream_stats):
+			labels = {"stream": stream_id}
+			yield ("ingest_frames_read_total", "counter", "Frames read from the frame source", labels, stats.frames_read)
+			yield ("ingest_frames_pushed_total", "counter", "Frames pushed into the pipeline", labels, stats.frames_pushed)
+			yield ("ingest_frames_skipped_total", "counter", "Frames skipped by the motion gate", labels, stats.frames_skipped)
+			yield ("ingest_push_failures_total", "counter", "Failed push-buffer calls", labels, stats.push_failures)
+			yield ("ingest_cpu_seconds_total", "counter", "CPU time of the push thread", labels, stats.cpu_time)
+		frames_pushed = sum(stats.frames_pushed for stats in self.stream_stats)
+		yield ("stage_fps", "gauge", "Frames per second since the last scrape", {"stage": "ingest"}, self.ingest_rate.update(frames_pushed))
+
+		handler = self.e_handler
+		yield ("callback_frames_total", "counter", "Frames seen by the identity_callback probe", None, handler.fcount)
+		yield ("stage_fps", "gauge", "Frames per second since the last scrape", {"stage": "callback"}, self.callback_rate.update(handler.fcount))
+		for name, value in handler.probe_timer.percentiles().items():
+			yield ("probe_time_us", "gauge", "Probe duration percentiles over the last 1024 frames", {"quantile": name}, value)
+		events = handler.events.stats()
+		yield ("event_queue_fill", "gauge", "Records waiting in the event ring", None, events["fill"])
+		yield ("event_queue_dropped_total", "counter", "Records dropped from the event ring", None, events["dropped"])
+		yield ("detection_frames_total", "counter", "Frames with at least one detection", None, handler.detection_frames)
+		yield ("events_sent_total", "counter", "Detection events sent to the SLM/TTS server", None, handler.events_sent)
+		paused_time = handler.paused_time
+		if handler.paused_since is not None:
+			paused_time += time.monotonic() - handler.paused_since
+		yield ("paused_seconds_total", "counter", "Time spent paused or gated for the SLM/TTS stage", None, paused_time)
+		if handler.slm_round_trips:
+			yield ("slm_round_trip_seconds", "gauge", "Last label -> resume round trip", None, handler.slm_round_trips[-1])
+		if self.clip_recorder is not None:
+			clips = self.clip_recorder.stats()
+			yield ("clip_ring_bytes", "gauge", "Encoded frames held in the clip ring", None, clips["bytes"])
+			yield ("clip_ring_seconds", "gauge", "Time span held in the clip ring", None, clips["span_s"])
+			yield ("clip_frames_lost_total", "counter", "Clip frames overwritten inside the clip window", None, clips["frames_lost"])
+			yield ("clip_encoder_drops_total", "counter", "Raw frames dropped in front of the clip encoder", None, clips["encoder_drops"])
+			yield ("clips_written_total", "counter", "Event clips written", None, clips["clips_written"])
+			yield ("clips_dropped_total", "counter", "Event clips dropped, writer behind", None, clips["clips_dropped"])
+		if handler.gate is not None:
+			yield ("gate_timeouts_total", "counter", "Detection gate reopened by the resume deadline", None, handler.gate.timeouts)
+		else:
+			yield ("pause_timeouts_total", "counter", "Paused pipeline resumed by the resume deadline", None, handler.timeouts)
+
+		iterator = self.pipeline.iterate_elements()
+		while True:
+			result, element = iterator.next()
+			if result != Gst.IteratorResult.OK:
+				break
+			if element.get_factory().get_name() != "queue":
+				continue
+			labels = {"queue": element.get_name()}
+			yield ("queue_level_buffers", "gauge", "Buffers held by the queue element", labels, element.get_property("current-level-buffers"))
+			yield ("queue_max_buffers", "gauge", "Queue element capacity in buffers", labels, element.get_property("max-size-buffers"))
+
 	# Pipeline event handler: handles messages received from the GStreamer pipeline
 	def pipeline_event_handler(self, bus, message, loop):
 		type = message.type
@@ -186,18 +393,22 @@ class GstDetectionApp:
 			self.error_occurred = True
 
 			self.shutdown()
+		elif type == Gst.MessageType.EOS:
+			print(f"{DETECTION_LOG_FORMAT}End of stream reached.")
+			self.shutdown()
+		elif type == Gst.MessageType.STATE_CHANGED and message.src == self.pipeline:
+			# Every element (hailonet with its HEF included) is set up once the pipeline is PLAYING:
+			old_state, new_state, pending = message.parse_state_changed()
+			if new_state == Gst.State.PLAYING and not self.pipeline_playing:
+				self.pipeline_playing = True
+				notify_ready("detector", "pipeline_playing")
 		# elif type == Gst.MessageType.QOS:
 			# qos = message.parse_qos()
 			# print(f"QOS: {qos}")
 		return True
 	
-	# Main function of the application: 
-	def run(self):
-
-		# Setting up the bus for receiving messages from the pipeline:
-		bus = self.pipeline.get_bus()
-		bus.add_signal_watch()
-		bus.connect("message", self.pipeline_event_handler, self.loop)
+	# Probes and per-run helpers on the pipeline (callback, tracing, recording):
+	def attach_probes(self):
 
 		# Connect pad probe to the identity element:
 		identity = self.pipeline.get_by_name("identity_callback")
@@ -208,6 +419,15 @@ class GstDetectionApp:
 			self.e_handler  # Pass user data to the callback
 		)
 
+		# Barcodes: crops are taken on the callback pad, decoded in the scanner's pool
+		if self.barcode_scan:
+			self.barcode_scanner = BarcodeScanner(workers=self.barcode_workers, labels=self.barcode_labels)
+			self.barcode_scanner.attach(self.pipeline, self.video_width, self.video_height)
+			self.e_handler.barcode_scanner = self.barcode_scanner
+
+		# Readiness: the first frame through inference, tracking and the callback
+		identity_pad.add_probe(Gst.PadProbeType.BUFFER, first_frame_probe)
+
 		# Check for the hailo_display element:
 		if self.pipeline.get_by_name("hailo_display") is None:
 			print(f"{DETECTION_LOG_FORMAT}hailo_display element not found in the pipeline.")
@@ -215,24 +435,60 @@ class GstDetectionApp:
 		# Disable QoS to increase FPS and reduce latency:
 		disable_qos(self.pipeline)
 
-		# Setting up PiCamera Thread:
-		cam_thread = threading.Thread(
-			target=cam_thread_func,
-			args=(self.pipeline, 1280, 720, 30),
-			daemon=True	
-		)
-		resume_thread = threading.Thread(
-			target=resume_pipeline_thread,
-			args=(self.pipeline, self.e_handler),
-			daemon=True
-		)
-
-		self.threads.append(cam_thread)
-		self.threads.append(resume_thread)
-		cam_thread.start()
-		resume_thread.start()
+		# Per-frame latency tracing: sampled frames are marked at each stage boundary,
+		# the event thread adds the event logic, dispatch and SLM reply, see tracing.py
+		if self.trace_path is not None:
+			self.tracer = FrameTracer()
+			self.tracer.attach(self.pipeline, TRACE_STAGES)
+			self.e_handler.tracer = self.tracer
+
+		# Detection recording:
+		if self.record_path is not None:
+			self.recorder = DetectionRecorder(self.record_path)
+			self.recorder.attach(self.pipeline)
+
+		# Event clips:
+		if self.clip_dir is not None:
+			self.clip_recorder = ClipRecorder(
+				self.clip_dir,
+				max_bytes=self.clip_memory,
+				pre_seconds=self.clip_pre_seconds,
+				post_seconds=self.clip_post_seconds,
+				clip_fps=self.clip_fps
+			)
+			self.clip_recorder.attach(self.pipeline)
+			self.e_handler.clip_recorder = self.clip_recorder
+
+		# Live preview: without the server the valve just stays closed
+		if self.preview_port is not None:
+			try:
+				self.preview_server = PreviewServer(self.preview_port)
+			except OSError as e:
+				print(f"{DETECTION_LOG_FORMAT}Preview server not started on port {self.preview_port}: {e}")
+			else:
+				self.preview_server.attach(self.pipeline)
+
+	# Frame source thread: pushes the source's frames into the app_source element
+	def start_frame_source(self):
+		if self.process_split:
+			self.frame_sources = [ProcessFrameSource(source) for source in self.frame_sources]
+			self.frame_source = self.frame_sources[0]
+		for stream_id, source in enumerate(self.frame_sources):
+			# Motion gates keep per-stream state, so extra streams get their own copy:
+			motion_gate = self.motion_gate
+			if motion_gate is not None and stream_id > 0:
+				motion_gate = copy.deepcopy(motion_gate)
+			cam_thread = threading.Thread(
+				target=push_thread_func,
+				args=(self.pipeline, source, self.ingest_mode, motion_gate, self.stream_stats[stream_id], self.tracer),
+				kwargs={"stream_id": stream_id, "element_name": stream_source_name(stream_id)},
+				daemon=True	
+			)
+			self.threads.append(cam_thread)
+			cam_thread.start()
 
-		# Start the pipeline:
+	# Start the pipeline:
+	def start_pipeline(self):
 		# 1.Set pipeline state to PAUSED to allow elements to prepare for data flow
 		self.pipeline.set_state(Gst.State.PAUSED) 
 
@@ -243,6 +499,55 @@ class GstDetectionApp:
 		# 3. Set the pipeline state to PLAYING to start processing data
 		self.pipeline.set_state(Gst.State.PLAYING)
 
+	# Main function of the application: 
+	def run(self):
+
+		# Setting up the bus for receiving messages from the pipeline:
+		bus = self.pipeline.get_bus()
+		bus.add_signal_watch()
+		bus.connect("message", self.pipeline_event_handler, self.loop)
+
+		self.attach_probes()
+		self.start_frame_source()
+
+		# Connection to the SLM/TTS server:
+		# Either the persistent channel (resume comes back on the same connection)
+		# or the legacy listener for per-event resume connections
+		if self.ipc_address is not None:
+			self.e_handler.channel = LabelChannel(
+				self.ipc_address,
+				on_message=lambda message: on_channel_message(self.pipeline, self.e_handler, message)
+			)
+		else:
+			resume_thread = threading.Thread(
+				target=resume_pipeline_thread,
+				args=(self.pipeline, self.e_handler),
+				daemon=True
+			)
+			self.threads.append(resume_thread)
+			resume_thread.start()
+
+		# Event logic runs on its own thread, fed by the probe:
+		self.e_handler.start()
+
+		# Metrics endpoint:
+		if self.metrics_port is not None:
+			registry = MetricsRegistry()
+			registry.register(self.collect_metrics)
+			if self.preview_server is not None:
+				registry.register(self.preview_server.collect_metrics)
+			if self.barcode_scanner is not None:
+				registry.register(self.barcode_scanner.collect_metrics)
+			try:
+				self.metrics_server = MetricsServer(registry, self.metrics_port).start()
+			except OSError as e:
+				print(f"{DETECTION_LOG_FORMAT}Metrics server not started on port {self.metrics_port}: {e}")
+
+		if self.preview_server is not None:
+			self.preview_server.start()
+
+		self.start_pipeline()
+
 		# DUmp dot file for debugging:
 		# GLib.timeout_add_seconds(3, self.dump_dot)
 
@@ -250,9 +555,18 @@ class GstDetectionApp:
 		try:
 			self.loop.run()
 		finally:
+			self.e_handler.stop()
 			for t in self.threads:
 				t.join(timeout=1)
 			self.pipeline.set_state(Gst.State.NULL)				
+			if self.tracer is not None:
+				self.tracer.dump(self.trace_path)
+			if self.recorder is not None:
+				self.recorder.close()
+			if self.clip_recorder is not None:
+				self.clip_recorder.close()
+			if self.barcode_scanner is not None:
+				self.barcode_scanner.close()
 			if self.error_occurred:
 				print(f"{DETECTION_LOG_FORMAT}Error received from bus, exitting with code 1...", file=sys.stderr)
 				sys.exit(1)
@@ -262,6 +576,36 @@ class GstDetectionApp:
 
 # -----------------------------------------------------------------------------------------------
 
+# Source pipeline of one stream:
+# SOURCE_PIPELINE('rpi') fixes the caps right behind appsrc, so the branch is
+# built at its frame source's own size; a stream of another size than the
+# pipeline's is then scaled (letterboxed) to width x height. SOURCE_PIPELINE
+# also names its appsrc and videoflip elements without the 'name' argument, so
+# the extra streams get theirs renamed to stay unique.
+def stream_source_pipeline(source, frame_source, width, height, stream_id):
+	if stream_id == 0:
+		branch = SOURCE_PIPELINE(source, frame_source.width, frame_source.height)
+	else:
+		branch = SOURCE_PIPELINE(source, frame_source.width, frame_source.height, name=f'source_{stream_id}').replace(
+			'name=app_source ', f'name={stream_source_name(stream_id)} '
+		).replace(
+			'name=videoflip ', f'name=videoflip_{stream_id} '
+		)
+	if (frame_source.width, frame_source.height) != (width, height):
+		branch = (
+			f'{branch} ! videoscale name=source_{stream_id}_fit add-borders=true ! '
+			f'video/x-raw, pixel-aspect-ratio=1/1, width={width}, height={height}'
+		)
+	return branch
+
+# First frame probe: reports the first frame that made it through the whole
+# pipeline (time to first inferred frame) and removes itself.
+def first_frame_probe(pad, info):
+	if info.get_buffer() is None:
+		return Gst.PadProbeReturn.OK
+	notify_ready("detector", "first_frame")
+	return Gst.PadProbeReturn.REMOVE
+
 # Disable Qos function:
 # Go through each element of the GStreamer pipeline and disable QoS in order to
 # increase FPS and reduce latency.
@@ -1,18 +1,134 @@
-import socket, requests, time
+import socket, requests, time, asyncio, json, re, threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from .ipc import (
+    listen, recv_message, send_message,
+    start_server, read_message, write_message,
+    DEFAULT_CHANNEL_ADDRESS, MSG_LABEL, MSG_ACK, MSG_RESUME
+)
+from .fact_cache import FactCache
+from .metrics import MetricsRegistry, MetricsServer, metrics_port, SLM_METRICS_OFFSET
+from .tracing import TraceRecorder, trace_path
+from .startup import notify_ready, wait_for_ollama, OLLAMA_BASE_URL
+
+OLLAMA_URL = f"{OLLAMA_BASE_URL}/api/generate"
+
+# Sentence splitter:
+# Collects streamed text and returns every sentence as soon as it is complete.
+# A sentence ends at '.', '!' or '?' followed by whitespace, so a token that ends
+# with a period is only split once the next one shows the sentence really ended.
+SENTENCE_END = re.compile(r"[.!?]+(?=\s)")
+
+class SentenceSplitter:
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            sentence = self.buffer[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        sentence = self.buffer.strip()
+        self.buffer = ""
+        return [sentence] if sentence else []
+
+def split_sentences(text):
+    splitter = SentenceSplitter()
+    return splitter.feed(text) + splitter.flush()
+
+# Codes decoded on the detection's crop, as sent with the label (see barcodes.py):
+def format_codes(codes):
+    return ", ".join(f"{code.get('type')} {code.get('data')}" for code in codes)
+
+# Output stage ordering:
+# With several generation workers, facts are spoken one at a time, in the order
+# they started. Sentences of a fact whose turn has not come yet are held back
+# and spoken as soon as every fact before it is done, so two facts never
+# interleave. Speaking happens under the lock, one sentence at a time.
+class OutputStage:
+    def __init__(self, speak):
+        self.speak = speak
+        self.lock = threading.Lock()
+        self.next_ticket = 0
+        self.turn = 0
+        self.held = {}
+        self.done = set()
+
+    def open(self):
+        with self.lock:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            self.held[ticket] = []
+            return ticket
+
+    def say(self, ticket, sentence):
+        with self.lock:
+            if ticket == self.turn:
+                self.speak(sentence)
+            else:
+                self.held[ticket].append(sentence)
+
+    def close(self, ticket):
+        with self.lock:
+            self.done.add(ticket)
+            while self.turn in self.done:
+                self.done.remove(self.turn)
+                del self.held[self.turn]
+                self.turn += 1
+                for sentence in self.held.get(self.turn, ()):
+                    self.speak(sentence)
+                if self.turn in self.held:
+                    self.held[self.turn] = []
 
 class LabelProcessingServer():
-    def __init__(self, label_port=5001, resume_port=5002, host='localhost', model="gemma:2b-instruct"):
+    def __init__(self, label_port=5001, resume_port=5002, host='localhost', model="gemma:2b-instruct",
+                 channel_address=DEFAULT_CHANNEL_ADDRESS, use_cache=True):
         self.label_port = label_port
         self.resume_port = resume_port
         self.host = host
         self.model = model
+        self.channel_address = channel_address
+        self.ollama_url = OLLAMA_URL
+        self.speech_time = 4    # s, placeholder for TTS playback
+        self.streaming = True   # Hand sentences to the output stage while Ollama is still generating
+        # How long Ollama keeps the model loaded after a request; the default of
+        # 5 minutes would make the first event after a quiet spell pay the load:
+        self.keep_alive = -1    # -1 = until Ollama stops
+        self.warm_up_label = "cat"
 
         self.session = requests.Session()
         self.session.trust_env = False
+
+        # Counters for the metrics endpoint (generate_fact may run on several
+        # threads at once, see AsyncLabelProcessingServer):
+        self.stats_lock = threading.Lock()
+        self.labels_processed = 0
+        self.generation_time = 0.0
+        self.first_output_time = 0.0
+        self.first_outputs = 0
+        self.output = OutputStage(self.speak)
+
+        # Chrome trace of the generation spans, enabled through DETECTION_DEVICE_TRACE.
+        # Merge it with the detector's trace to follow an event across both processes.
+        self.trace_path = trace_path("slm")
+        self.tracer = TraceRecorder("slm_server") if self.trace_path else None
+
+        # Facts already generated for a (label, model, prompt), see fact_cache.py:
+        self.cache = FactCache() if use_cache else None
         # Add a print for checking if ports were assigned (maybe)
 
     def listen_for_label(self):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             server.bind((self.host, self.label_port))
             server.listen(1)
 
@@ -26,13 +142,126 @@ class LabelProcessingServer():
                 self.process_label(label)
                 self.resume_detection()
 
+    # Persistent channel (see ipc.py):
+    # The detector keeps one connection open and sends framed label messages.
+    # Each label is acknowledged on receipt and answered with a resume message
+    # once processed, on the same connection.
+    def serve_channel(self):
+        self.start_warm_up()
+        with listen(self.channel_address) as server:
+            print(f"Waiting for the detector on {self.channel_address}...")
+            notify_ready("slm_server", "listening")
+            while True:
+                conn, addr = server.accept()
+                print("Detector connected.")
+                with conn:
+                    try:
+                        self.handle_channel(conn)
+                    except (OSError, ValueError) as e:
+                        print(f"Channel error: {e}")
+                print("Detector disconnected.")
+
+    def handle_channel(self, conn):
+        while True:
+            message = recv_message(conn)
+            if message is None:
+                return
+            if message.get("type") != MSG_LABEL:
+                continue
+
+            label = message["label"]
+            print(f"Received label {label} from OD (confidence: {message.get('confidence')}, track: {message.get('track_id')}).")
+            if message.get("codes"):
+                print(f"Codes on {label}: {format_codes(message['codes'])}")
+            send_message(conn, {"type": MSG_ACK, "id": message["id"]})
+            self.process_label(label)
+            send_message(conn, {"type": MSG_RESUME, "id": message["id"]})
+
     def process_label(self, label):
-        fun_fact = self.query_ollama(label)
-        print(f"Fun fact about {label}: {fun_fact}")
+        self.generate_fact(label)
         # Add TTS later
-        time.sleep(4)
+        time.sleep(self.speech_time)
         print(f"Processed label {label}. Resuming pipeline...")
 
+    # Warm-up: loads the model with a one-token answer to a real prompt as soon
+    # as Ollama is up, so the first event does not pay the load, and reports the
+    # time to first answer. Runs next to the listener, not before it.
+    def warm_up(self, timeout=120.0):
+        if not wait_for_ollama(timeout=timeout):
+            print("Ollama did not come up, the model was not warmed up.")
+            return
+        data = {
+            "model": self.model,
+            "prompt": self.build_prompt(self.warm_up_label),
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {"num_predict": 1}
+        }
+        start = time.monotonic()
+        try:
+            response = self.session.post(self.ollama_url, json=data, timeout=timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Ollama warm-up failed: {e}")
+            return
+        first_answer_ms = (time.monotonic() - start) * 1000
+        print(f"Model {self.model} warm, first answer after {first_answer_ms:.0f} ms.")
+        notify_ready("slm_server", "model_warm", first_answer_ms=first_answer_ms)
+
+    def start_warm_up(self):
+        thread = threading.Thread(target=self.warm_up, name="warm_up", daemon=True)
+        thread.start()
+        return thread
+
+    # Queries the fact for a label, streaming it to the output stage if enabled.
+    # Shared by the blocking and the asyncio server modes.
+    def generate_fact(self, label):
+        start = time.monotonic()
+        ticket = self.output.open()
+        first_output = []
+        def on_sentence(sentence):
+            if not first_output:
+                first_output.append(time.monotonic() - start)
+                if self.tracer is not None:
+                    self.tracer.complete("slm_first_sentence", start, start + first_output[0], {"label": label})
+                print(f"First sentence about {label} after {first_output[0] * 1000:.0f} ms.")
+            self.output.say(ticket, sentence)
+
+        try:
+            fun_fact = self.query_ollama(label, on_sentence if self.streaming else None)
+        finally:
+            self.output.close(ticket)
+        print(f"Fun fact about {label}: {fun_fact}")
+
+        end = time.monotonic()
+        with self.stats_lock:
+            self.labels_processed += 1
+            self.generation_time += end - start
+            if first_output:
+                self.first_output_time += first_output[0]
+                self.first_outputs += 1
+        if self.tracer is not None:
+            self.tracer.complete("slm_generate", start, end, {"label": label})
+        return fun_fact
+
+    # Metrics collector, see metrics.py
+    def collect_metrics(self):
+        yield ("slm_labels_processed_total", "counter", "Labels processed by the SLM/TTS server", None, self.labels_processed)
+        yield ("slm_generation_seconds_total", "counter", "Time spent generating facts", None, self.generation_time)
+        yield ("slm_first_output_seconds_total", "counter", "Sum of times to the first delivered sentence", None, self.first_output_time)
+        yield ("slm_first_outputs_total", "counter", "Facts with at least one delivered sentence", None, self.first_outputs)
+        if self.cache is not None:
+            stats = self.cache.stats()
+            for key in ("hits", "stale_hits", "misses", "refreshes", "refresh_errors"):
+                yield (f"fact_cache_{key}_total", "counter", f"Fact cache {key.replace('_', ' ')}", None, stats[key])
+            yield ("fact_cache_entries", "gauge", "Facts held in memory", None, stats["entries"])
+            yield ("fact_cache_avg_hit_ms", "gauge", "Average fact cache hit latency", None, stats["avg_hit_ms"])
+            yield ("fact_cache_avg_miss_ms", "gauge", "Average fact cache miss latency", None, stats["avg_miss_ms"])
+
+    # Output stage: receives the fact one sentence at a time
+    def speak(self, sentence):
+        # Add TTS later
+        print(f"Speaking: {sentence}")
 
     def resume_detection(self):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as resume_sock:
@@ -42,26 +271,173 @@ class LabelProcessingServer():
             except Exception as e:
                 print("Failed to send resume signal - SLM/TTS")
     
-    def query_ollama(self, label):
-        prompt = (
+    def build_prompt(self, label):
+        return (
             f"Tell me a random fact about {label}s in two short sentences. "
             "Use simple language. Do not use scientific terms."
-        ) 
-        ollama_local_url = "http://127.0.0.1:11434/api/generate"
+        )
+
+    # With 'on_sentence', the reply is streamed and every sentence is handed over
+    # as soon as it is complete (cached facts are handed over sentence by sentence too).
+    def query_ollama(self, label, on_sentence=None):
+        prompt = self.build_prompt(label)
+        streamed = []
+        def fetch():
+            if on_sentence is None:
+                return self.generate(prompt)
+            streamed.append(True)
+            return self.generate_stream(prompt, on_sentence)
+
+        try:
+            if self.cache is None:
+                fun_fact = fetch()
+            else:
+                # Background refreshes must not speak, so they use the plain request:
+                fun_fact = self.cache.get_or_fetch(
+                    label, self.model, prompt, fetch,
+                    refresh=lambda: self.generate(prompt)
+                )
+                print(f"Fact cache: {self.cache.stats()}")
+        except Exception as e:
+            print(f"Ollama API error: {e}")
+            return "No response"
+
+        if on_sentence is not None and not streamed:
+            for sentence in split_sentences(fun_fact):
+                on_sentence(sentence)
+        return fun_fact
+
+    # Raw Ollama request, raises on failure so errors never end up in the cache.
+    def generate(self, prompt):
         data = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False
+            "stream": False,
+            "keep_alive": self.keep_alive
         }
+        response = self.session.post(self.ollama_url, json=data, timeout=15)
+        response.raise_for_status()
+        return response.json()['response']
 
-        try:
-            response = self.session.post(ollama_local_url, json=data, timeout=15)
+    # Streaming Ollama request: reads the NDJSON chunks as they arrive and calls
+    # 'on_sentence' for every finished sentence. Returns the whole reply.
+    def generate_stream(self, prompt, on_sentence):
+        data = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive
+        }
+        splitter = SentenceSplitter()
+        parts = []
+        with self.session.post(self.ollama_url, json=data, timeout=15, stream=True) as response:
             response.raise_for_status()
-            return response.json()['response']
-        except Exception as e:
-            print(f"Ollama API error: {e}")
-            return "No response"
-        
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+                text = chunk.get("response", "")
+                parts.append(text)
+                for sentence in splitter.feed(text):
+                    on_sentence(sentence)
+                if chunk.get("done"):
+                    break
+        for sentence in splitter.flush():
+            on_sentence(sentence)
+        return "".join(parts)
+
+# Asyncio server mode:
+# Same wire behaviour as serve_channel (ack on receipt, resume once processed),
+# but any number of detectors can stay connected. Labels are acked and queued
+# straight away while earlier ones are still being generated, and 'workers'
+# generations run concurrently on a shared, pooled HTTP session so one slow
+# Ollama reply does not hold up the accept loop or the other connections.
+# Their sentences still reach the output stage one fact at a time (OutputStage).
+class AsyncLabelProcessingServer(LabelProcessingServer):
+    def __init__(self, *args, workers=2, queue_size=64, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue = None
+        self.executor = None
+
+        # One keep-alive connection per worker instead of a new one per request:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+
+    def collect_metrics(self):
+        yield from super().collect_metrics()
+        if self.queue is not None:
+            yield ("slm_queue_depth", "gauge", "Labels waiting for a generation worker", None, self.queue.qsize())
+
+    async def serve(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ollama")
+        worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        self.start_warm_up()
+        server = await start_server(self.handle_client, self.channel_address)
+        print(f"Waiting for detectors on {self.channel_address} ({self.workers} workers)...")
+        notify_ready("slm_server", "listening")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in worker_tasks:
+                task.cancel()
+            self.executor.shutdown(wait=False)
+
+    async def handle_client(self, reader, writer):
+        print("Detector connected.")
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                if message.get("type") != MSG_LABEL:
+                    continue
+                print(f"Received label {message['label']} from OD (confidence: {message.get('confidence')}, track: {message.get('track_id')}).")
+                if message.get("codes"):
+                    print(f"Codes on {message['label']}: {format_codes(message['codes'])}")
+                await self.queue.put((message, writer))
+                await write_message(writer, {"type": MSG_ACK, "id": message["id"]})
+        except (OSError, ValueError) as e:
+            print(f"Channel error: {e}")
+        finally:
+            writer.close()
+            print("Detector disconnected.")
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            message, writer = await self.queue.get()
+            try:
+                label = message["label"]
+                await loop.run_in_executor(self.executor, self.generate_fact, label)
+                # Add TTS later
+                await asyncio.sleep(self.speech_time)
+                print(f"Processed label {label}. Resuming pipeline...")
+                if not writer.is_closing():
+                    await write_message(writer, {"type": MSG_RESUME, "id": message["id"]})
+            except OSError as e:
+                print(f"Failed to send resume signal - SLM/TTS: {e}")
+            finally:
+                self.queue.task_done()
+
 if __name__ == "__main__":
-    server = LabelProcessingServer()
-    server.listen_for_label()
+    server = AsyncLabelProcessingServer()
+    port = metrics_port(SLM_METRICS_OFFSET)
+    if port is not None:
+        registry = MetricsRegistry()
+        registry.register(server.collect_metrics)
+        try:
+            MetricsServer(registry, port).start()
+        except OSError as e:
+            print(f"Metrics server not started on port {port}: {e}")
+    try:
+        asyncio.run(server.serve())
+    finally:
+        if server.tracer is not None:
+            server.tracer.dump(server.trace_path)
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+
+IPC_LOG_FORMAT = "\033[1;34m[ipc_channel] \033[0m \t"
+
+# Channel address:
+# A string is a Unix domain socket path, a (host, port) tuple is TCP.
+DEFAULT_CHANNEL_ADDRESS = "/tmp/detection_device_slm.sock"
+
+# Message types:
+# - label:  detector -> server, carries label, confidence, track_id and stream_id,
+#           and the codes decoded on the track's crops (see barcodes.py), if any
+# - ack:    server -> detector, the label was received and queued
+# - resume: server -> detector, the label was processed and detection can resume
+MSG_LABEL = "label"
+MSG_ACK = "ack"
+MSG_RESUME = "resume"
+
+# Framing: 4-byte big-endian payload length, followed by a UTF-8 JSON object.
+HEADER = struct.Struct("!I")
+MAX_MESSAGE_SIZE = 1 << 20
+
+def make_socket(address):
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+def encode_message(message):
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    return HEADER.pack(len(payload)) + payload
+
+def decode_payload(payload):
+    return json.loads(payload.decode())
+
+def send_message(sock, message):
+    sock.sendall(encode_message(message))
+
+def recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+# Returns the next message, or None once the peer closed the connection.
+def recv_message(sock):
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {size} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+    payload = recv_exact(sock, size)
+    if payload is None:
+        return None
+    return decode_payload(payload)
+
+# asyncio counterpart of recv_message for StreamReader objects.
+async def read_message(reader):
+    try:
+        header = await reader.readexactly(HEADER.size)
+        (size,) = HEADER.unpack(header)
+        if size > MAX_MESSAGE_SIZE:
+            raise ValueError(f"Message of {size} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+        payload = await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        return None
+    return decode_payload(payload)
+
+async def write_message(writer, message):
+    writer.write(encode_message(message))
+    await writer.drain()
+
+async def start_server(client_handler, address):
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.unlink(address)
+        return await asyncio.start_unix_server(client_handler, path=address)
+    host, port = address
+    return await asyncio.start_server(client_handler, host, port, reuse_address=True)
+
+def listen(address, backlog=1):
+    server = make_socket(address)
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.unlink(address)
+    else:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(address)
+    server.listen(backlog)
+    return server
+
+# Label channel (detector side):
+# One persistent connection to the LabelProcessingServer. Labels are written
+# directly from the caller's thread; a reader thread keeps the connection up
+# (reconnecting if the server restarts) and hands every incoming message to
+# 'on_message'.
+class LabelChannel:
+    def __init__(self, address=DEFAULT_CHANNEL_ADDRESS, on_message=None, reconnect_delay=1.0):
+        self.address = address
+        self.on_message = on_message
+        self.reconnect_delay = reconnect_delay
+        self.sock = None
+        self.lock = threading.Lock()
+        self.connected = threading.Event()
+        self.running = True
+        self.next_id = 0
+
+        self.thread = threading.Thread(target=self._reader, daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        while self.running:
+            sock = make_socket(self.address)
+            try:
+                sock.connect(self.address)
+            except OSError:
+                sock.close()
+                time.sleep(self.reconnect_delay)
+                continue
+            with self.lock:
+                self.sock = sock
+            self.connected.set()
+            print(f"{IPC_LOG_FORMAT}Connected to SLM/TTS server at {self.address}.")
+            return sock
+        return None
+
+    def _disconnect(self, sock):
+        with self.lock:
+            if self.sock is sock:
+                self.sock = None
+                self.connected.clear()
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def _reader(self):
+        while self.running:
+            sock = self._connect()
+            if sock is None:
+                return
+            try:
+                while True:
+                    message = recv_message(sock)
+                    if message is None:
+                        break
+                    if self.on_message is not None:
+                        self.on_message(message)
+            except (OSError, ValueError) as e:
+                if self.running:
+                    print(f"{IPC_LOG_FORMAT}Connection error: {e}")
+            self._disconnect(sock)
+            if self.running:
+                print(f"{IPC_LOG_FORMAT}Connection to SLM/TTS server lost, reconnecting...")
+
+    # Sends a label and returns its message id, or None if the server is not connected.
+    def send_label(self, label, confidence=None, track_id=None, stream_id=None, codes=None):
+        with self.lock:
+            if self.sock is None:
+                return None
+            self.next_id += 1
+            message = {
+                "type": MSG_LABEL,
+                "id": self.next_id,
+                "label": label,
+                "confidence": confidence,
+                "track_id": track_id,
+                "stream_id": stream_id
+            }
+            if codes:
+                message["codes"] = codes
+            try:
+                send_message(self.sock, message)
+            except OSError:
+                return None
+            return message["id"]
+
+    def close(self):
+        self.running = False
+        with self.lock:
+            sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_LOG_FORMAT = "\033[1;34m[metrics] \033[0m \t"
+
+METRIC_PREFIX = "detection_device_"
+
+# Metrics are off unless this environment variable names the detector's port;
+# the SLM/TTS server then serves on the next one. There is no default port:
+# 9100 is node_exporter's and often taken on a Pi.
+METRICS_PORT_ENV = "DETECTION_DEVICE_METRICS_PORT"
+DETECTOR_METRICS_OFFSET = 0
+SLM_METRICS_OFFSET = 1
+
+def metrics_port(offset=DETECTOR_METRICS_OFFSET):
+    port = os.environ.get(METRICS_PORT_ENV)
+    return int(port) + offset if port else None
+
+# Metrics registry:
+# Nothing is measured here. Components keep their own plain counters (an
+# attribute increment on the hot path) or stats() methods, and collectors read
+# them when /metrics is scraped. A collector is a function returning an
+# iterable of samples:
+#   (name, type, help, labels, value)
+# with type "counter" or "gauge" and labels a dict (or None).
+class MetricsRegistry:
+    def __init__(self):
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def register(self, collector):
+        self.collectors.append(collector)
+        return collector
+
+    def collect(self):
+        families = {}
+        with self.lock:
+            for collector in self.collectors:
+                try:
+                    samples = list(collector())
+                except Exception as e:
+                    print(f"{METRICS_LOG_FORMAT}Collector {collector} failed: {e}")
+                    continue
+                for name, metric_type, help_text, labels, value in samples:
+                    if value is None:
+                        continue
+                    family = families.setdefault(name, (metric_type, help_text, []))
+                    family[2].append((labels, value))
+        return families
+
+    # Prometheus text exposition format (version 0.0.4)
+    def render(self):
+        lines = []
+        for name, (metric_type, help_text, samples) in sorted(self.collect().items()):
+            full_name = METRIC_PREFIX + name
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value in samples:
+                if labels:
+                    label_str = ",".join(f'{key}="{escape_label(val)}"' for key, val in sorted(labels.items()))
+                    lines.append(f"{full_name}{{{label_str}}} {float(value)}")
+                else:
+                    lines.append(f"{full_name} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+# Rate gauge:
+# Turns a monotonically increasing count into a per-second rate between two scrapes.
+class RateGauge:
+    def __init__(self):
+        self.last_time = None
+        self.last_count = 0
+
+    def update(self, count):
+        now = time.monotonic()
+        rate = None
+        if self.last_time is not None and now > self.last_time:
+            rate = (count - self.last_count) / (now - self.last_time)
+        self.last_time = now
+        self.last_count = count
+        return rate
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Metrics server:
+# Serves the registry on http://<host>:<port>/metrics from a daemon thread.
+class MetricsServer:
+    def __init__(self, registry, port, host="127.0.0.1"):
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.registry = registry
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        host, port = self.server.server_address
+        print(f"{METRICS_LOG_FORMAT}Serving metrics on http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
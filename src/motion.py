@@ -0,0 +1,104 @@
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+# Motion gate:
+# Cheap check in the ingest path that lets the pipeline idle while the scene is
+# static. Each frame is sampled (nearest neighbour, so it costs tens of
+# microseconds rather than an area average over the full frame) into a small
+# grayscale thumbnail and compared with the previous one; the fraction of thumbnail pixels that changed by more than
+# 'pixel_threshold' is the motion score.
+#
+# - Active: every frame is admitted. The gate goes idle once the score stayed
+#   below 'off_threshold' for 'hold_time' seconds.
+# - Idle: only one frame in 'idle_keep' is admitted (0 admits none), and only one
+#   frame in 'check_every' is even looked at. A score of at least 'on_threshold'
+#   switches back to active and admits that frame.
+#
+# on_threshold > off_threshold plus the hold time give the hysteresis.
+# While idle, each check compares against the thumbnail of the previous check.
+# Reaction latency is measured from the last idle check that saw no motion to
+# the first admitted frame after motion, an upper bound on onset -> inference.
+class MotionGate:
+    def __init__(self, thumb_size=(64, 36), pixel_threshold=25, on_threshold=0.02,
+                 off_threshold=0.005, hold_time=5.0, idle_keep=15, check_every=3):
+        self.thumb_size = thumb_size
+        self.pixel_threshold = pixel_threshold
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.hold_time = hold_time
+        self.idle_keep = idle_keep
+        self.check_every = check_every
+
+        width, height = thumb_size
+        self.thumb = np.empty((height, width, 3), dtype=np.uint8)
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.previous = np.empty((height, width), dtype=np.uint8)
+        self.diff = np.empty((height, width), dtype=np.uint8)
+        self.has_previous = False
+
+        self.active = True
+        self.last_motion = None
+        self.last_quiet_check = None
+        self.idle_frames = 0
+
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.activations = 0
+        self.reaction_latencies = deque(maxlen=100)
+
+    def score(self, frame):
+        cv2.resize(frame, self.thumb_size, dst=self.thumb, interpolation=cv2.INTER_NEAREST)
+        cv2.cvtColor(self.thumb, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        if not self.has_previous:
+            self.has_previous = True
+            self.previous[:] = self.gray
+            return 1.0
+        cv2.absdiff(self.gray, self.previous, dst=self.diff)
+        self.previous[:] = self.gray
+        return np.count_nonzero(self.diff > self.pixel_threshold) / self.diff.size
+
+    # Returns True if the frame should be pushed to the pipeline.
+    def admit(self, frame, now=None):
+        if now is None:
+            now = time.monotonic()
+
+        if self.active:
+            motion = self.score(frame)
+            if motion >= self.off_threshold or self.last_motion is None:
+                self.last_motion = now
+            elif now - self.last_motion >= self.hold_time:
+                self.active = False
+                self.idle_frames = 0
+                self.last_quiet_check = now
+            self.frames_inferred += 1
+            return True
+
+        self.idle_frames += 1
+        if self.idle_frames % self.check_every == 0:
+            if self.score(frame) >= self.on_threshold:
+                self.active = True
+                self.last_motion = now
+                self.activations += 1
+                self.reaction_latencies.append(now - self.last_quiet_check)
+                self.frames_inferred += 1
+                return True
+            self.last_quiet_check = now
+
+        if self.idle_keep and self.idle_frames % self.idle_keep == 0:
+            self.frames_inferred += 1
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def stats(self):
+        latencies = self.reaction_latencies
+        return {
+            "active": self.active,
+            "inferred": self.frames_inferred,
+            "skipped": self.frames_skipped,
+            "activations": self.activations,
+            "avg_reaction_ms": sum(latencies) / len(latencies) * 1000 if latencies else None,
+            "max_reaction_ms": max(latencies) * 1000 if latencies else None
+        }
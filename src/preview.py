@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREVIEW_LOG_FORMAT = "\033[1;34m[preview] \033[0m \t"
+
+PREVIEW_PORT = 8080
+BOUNDARY = "frame"
+
+# Port for the preview; the preview branch is only built when this environment
+# variable is set (e.g. to PREVIEW_PORT).
+PREVIEW_PORT_ENV = "DETECTION_DEVICE_PREVIEW_PORT"
+
+def preview_port():
+    port = os.environ.get(PREVIEW_PORT_ENV)
+    return int(port) if port else None
+
+# Preview branch of the pipeline, teed off after the callback so the Hailo
+# metadata is on the frames and hailooverlay can draw the detections. The
+# valve is closed (drop=true) while nobody watches: the tee then hands each
+# frame to a valve that drops it, and nothing downstream of it runs. Once open,
+# the leaky queue moves the rest onto its own thread, videorate keeps 'fps'
+# frames per second before anything is drawn or encoded, and the appsink keeps
+# only the newest JPEG.
+def preview_branch(fps=5, quality=60, tee_name="preview_tee", overlay="hailooverlay name=preview_overlay"):
+    return (
+        f'{tee_name}. ! valve name=preview_gate drop=true ! '
+        'queue name=preview_q leaky=downstream max-size-buffers=2 max-size-bytes=0 max-size-time=0 ! '
+        f'videorate drop-only=true max-rate={fps} ! '
+        f'{overlay} ! '
+        'videoconvert n-threads=2 ! video/x-raw, format=I420 ! '
+        f'jpegenc quality={quality} ! '
+        'appsink name=preview_sink emit-signals=true sync=false async=false max-buffers=1 drop=true'
+    )
+
+# Frame hub:
+# Holds the newest JPEG and wakes the clients waiting for it. Clients that are
+# slower than the preview rate skip frames instead of queueing them. The first
+# client to connect opens the valve and the last one to leave closes it again,
+# through on_clients(count).
+class FrameHub:
+    def __init__(self, on_clients=None):
+        self.on_clients = on_clients
+        self.condition = threading.Condition()
+        self.frame = None
+        self.sequence = 0
+        self.clients = 0
+        self.frames_published = 0
+
+    def publish(self, jpeg):
+        with self.condition:
+            self.frame = jpeg
+            self.sequence += 1
+            self.frames_published += 1
+            self.condition.notify_all()
+
+    def wait_frame(self, last_sequence, timeout=2.0):
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence != last_sequence, timeout)
+            return self.sequence, self.frame
+
+    # The valve is switched under the lock, so a client leaving while another
+    # joins cannot leave it closed with someone watching.
+    def join(self):
+        with self.condition:
+            self.clients += 1
+            if self.clients == 1:
+                # A frame from before the valve was closed would be stale:
+                self.frame = None
+                if self.on_clients is not None:
+                    self.on_clients(self.clients)
+
+    def leave(self):
+        with self.condition:
+            self.clients -= 1
+            if self.clients == 0 and self.on_clients is not None:
+                self.on_clients(self.clients)
+
+PREVIEW_PAGE = (
+    b"<!DOCTYPE html><html><head><title>Detection preview</title></head>"
+    b"<body style='margin:0;background:#000'><img src='/stream.mjpg' style='width:100%'></body></html>"
+)
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(PREVIEW_PAGE)))
+            self.end_headers()
+            self.wfile.write(PREVIEW_PAGE)
+        elif path == "/stream.mjpg":
+            self.stream()
+        else:
+            self.send_error(404)
+
+    def stream(self):
+        hub = self.server.hub
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        hub.join()
+        try:
+            sequence = 0
+            while True:
+                sequence, frame = hub.wait_frame(sequence)
+                if frame is None:
+                    continue
+                self.wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(frame)}\r\n\r\n".encode()
+                )
+                self.wfile.write(frame)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            hub.leave()
+
+    def log_message(self, format, *args):
+        pass
+
+# Preview server:
+# Serves the preview page on http://<host>:<port>/ and the stream itself on
+# /stream.mjpg, from daemon threads. attach() connects it to the preview
+# branch of a pipeline.
+class PreviewServer:
+    def __init__(self, port=PREVIEW_PORT, host="127.0.0.1"):
+        self.hub = FrameHub(on_clients=self._on_clients)
+        self.server = ThreadingHTTPServer((host, port), PreviewHandler)
+        self.server.daemon_threads = True
+        self.server.hub = self.hub
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.valve = None
+        self.gate_changes = 0
+        self.opened_at = None
+        self.open_time = 0.0
+
+    def attach(self, pipeline, valve_name="preview_gate", sink_name="preview_sink"):
+        from gi.repository import Gst
+        self.Gst = Gst
+        self.valve = pipeline.get_by_name(valve_name)
+        pipeline.get_by_name(sink_name).connect("new-sample", self._on_sample)
+
+    def _on_sample(self, sink):
+        Gst = self.Gst
+        sample = sink.emit("pull-sample")
+        if sample is None:
+            return Gst.FlowReturn.OK
+        buffer = sample.get_buffer()
+        ok, map_info = buffer.map(Gst.MapFlags.READ)
+        if ok:
+            try:
+                self.hub.publish(bytes(map_info.data))
+            finally:
+                buffer.unmap(map_info)
+        return Gst.FlowReturn.OK
+
+    def _on_clients(self, count):
+        watching = count > 0
+        if watching:
+            self.opened_at = time.monotonic()
+        elif self.opened_at is not None:
+            self.open_time += time.monotonic() - self.opened_at
+            self.opened_at = None
+        self.gate_changes += 1
+        if self.valve is not None:
+            self.valve.set_property("drop", not watching)
+        print(f"{PREVIEW_LOG_FORMAT}{count} preview client(s), encoding {'on' if watching else 'off'}.")
+
+    def start(self):
+        self.thread.start()
+        host, port = self.server.server_address
+        print(f"{PREVIEW_LOG_FORMAT}Serving the preview on http://{host}:{port}/")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # Metrics collector, see metrics.py
+    def collect_metrics(self):
+        open_time = self.open_time
+        if self.opened_at is not None:
+            open_time += time.monotonic() - self.opened_at
+        yield ("preview_clients", "gauge", "Connected preview clients", None, self.hub.clients)
+        yield ("preview_frames_total", "counter", "Preview frames encoded", None, self.hub.frames_published)
+        yield ("preview_encoding_seconds_total", "counter", "Time the preview branch was open", None, open_time)
@@ -0,0 +1,326 @@
+import json
+import struct
+import sys
+import threading
+import time
+from collections import deque
+import numpy as np
+
+RECORDING_LOG_FORMAT = "\033[1;33m[recording] \033[0m \t"
+
+# Detection recording format:
+# A header followed by chunks, each holding the frames flushed together as
+# columns, so a reader can memory-map the file and view every column as a
+# NumPy array without parsing rows:
+#
+#   header: MAGIC (8 bytes)
+#   chunk:  CHUNK_HEADER (tag, frames, detections, new label bytes)
+#           new labels as a JSON list (label ids continue across chunks)
+#           frame columns:     FRAME_COLUMNS, one value per frame
+#           detection columns: DETECTION_COLUMNS, one value per detection
+#
+# Every block starts on an 8-byte boundary. Detections are stored in frame
+# order; a frame's detections are the next 'count' rows. track_id is -1 for
+# untracked detections.
+MAGIC = b"DDREC\x00\x01\x00"
+CHUNK_HEADER = struct.Struct("<4sIII")
+CHUNK_TAG = b"CHNK"
+ALIGN = 8
+
+FRAME_COLUMNS = [
+    ("frame_index", np.uint32, ()),
+    ("pts", np.int64, ()),
+    ("probe_time", np.float64, ()),
+    ("count", np.uint16, ()),
+]
+DETECTION_COLUMNS = [
+    ("label_id", np.uint16, ()),
+    ("confidence", np.float32, ()),
+    ("bbox", np.float32, (4,)),     # xmin, ymin, width, height (normalized)
+    ("track_id", np.int32, ()),
+]
+
+def padding(size):
+    return -size % ALIGN
+
+# Detection recorder:
+# Attach it to the identity_callback pad (attach()) to record every frame's
+# detections. The probe only reads the detections into a tuple and appends it
+# to a deque; a writer thread turns the pending frames into columns and appends
+# them as one chunk every 'flush_interval' seconds. At most 'max_pending' frames
+# wait for the writer: if it falls behind, the oldest are dropped and counted.
+class DetectionRecorder:
+    def __init__(self, path, flush_interval=1.0, max_pending=1024):
+        import hailo
+        self.hailo = hailo
+        self.path = path
+        self.flush_interval = flush_interval
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.labels = {}
+        self.pending = deque(maxlen=max_pending)
+        self.frame_index = 0
+        self.frames_dropped = 0
+        self.frames_written = 0
+        self.detections_written = 0
+        self.chunks_written = 0
+        self.running = True
+        self.wakeup = threading.Event()
+        self.writer = threading.Thread(target=self._write_loop, name="detection_recorder", daemon=True)
+        self.writer.start()
+
+    # Probe side (streaming thread):
+    def record(self, buffer):
+        hailo = self.hailo
+        detections = []
+        for detection in self.hailo.get_roi_from_buffer(buffer).get_objects_typed(hailo.HAILO_DETECTION):
+            bbox = detection.get_bbox()
+            unique_ids = detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)
+            detections.append((
+                detection.get_label(),
+                detection.get_confidence(),
+                bbox.xmin(), bbox.ymin(), bbox.width(), bbox.height(),
+                unique_ids[0].get_id() if unique_ids else -1
+            ))
+        self.frame_index += 1
+        if len(self.pending) == self.pending.maxlen:
+            self.frames_dropped += 1
+        self.pending.append((self.frame_index, buffer.pts, time.monotonic(), detections))
+
+    def attach(self, pipeline, element_name="identity_callback"):
+        from gi.repository import Gst
+
+        def probe(pad, info):
+            buffer = info.get_buffer()
+            if buffer is not None:
+                self.record(buffer)
+            return Gst.PadProbeReturn.OK
+
+        pipeline.get_by_name(element_name).get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, probe)
+        print(f"{RECORDING_LOG_FORMAT}Recording detections to {self.path}")
+
+    def _write_loop(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.flush()
+
+    # Writer side: drains the pending frames into one chunk.
+    def flush(self):
+        frames = []
+        while True:
+            try:
+                frames.append(self.pending.popleft())
+            except IndexError:
+                break
+        if not frames:
+            return
+
+        new_labels = []
+        label_ids = []
+        confidences = []
+        bboxes = []
+        track_ids = []
+        for _, _, _, detections in frames:
+            for label, confidence, xmin, ymin, width, height, track_id in detections:
+                label_id = self.labels.get(label)
+                if label_id is None:
+                    label_id = self.labels[label] = len(self.labels)
+                    new_labels.append(label)
+                label_ids.append(label_id)
+                confidences.append(confidence)
+                bboxes.append((xmin, ymin, width, height))
+                track_ids.append(track_id)
+
+        frame_columns = [
+            np.fromiter((frame[0] for frame in frames), np.uint32, len(frames)),
+            np.fromiter((frame[1] for frame in frames), np.int64, len(frames)),
+            np.fromiter((frame[2] for frame in frames), np.float64, len(frames)),
+            np.fromiter((len(frame[3]) for frame in frames), np.uint16, len(frames)),
+        ]
+        detection_columns = [
+            np.asarray(label_ids, np.uint16),
+            np.asarray(confidences, np.float32),
+            np.asarray(bboxes, np.float32).reshape(-1, 4),
+            np.asarray(track_ids, np.int32),
+        ]
+        labels_json = json.dumps(new_labels).encode()
+
+        chunk = [CHUNK_HEADER.pack(CHUNK_TAG, len(frames), len(label_ids), len(labels_json)), labels_json]
+        size = CHUNK_HEADER.size + len(labels_json)
+        for column in frame_columns + detection_columns:
+            chunk.append(b"\x00" * padding(size))
+            size += padding(size)
+            data = column.tobytes()
+            chunk.append(data)
+            size += len(data)
+        chunk.append(b"\x00" * padding(size))
+        self.file.write(b"".join(chunk))
+        self.file.flush()
+
+        self.frames_written += len(frames)
+        self.detections_written += len(label_ids)
+        self.chunks_written += 1
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+        self.writer.join()
+        self.flush()
+        self.file.close()
+        print(
+            f"{RECORDING_LOG_FORMAT}Recorded {self.frames_written} frames, {self.detections_written} detections to {self.path}"
+            f" ({self.frames_dropped} frames dropped)"
+        )
+
+    def stats(self):
+        return {
+            "frames": self.frames_written,
+            "detections": self.detections_written,
+            "chunks": self.chunks_written,
+            "pending": len(self.pending),
+            "dropped": self.frames_dropped
+        }
+
+# Detection recording (reader):
+# Memory-maps a recording and exposes its columns. With a single chunk the
+# columns are views into the mapping; with several they are concatenated once.
+class DetectionRecording:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a detection recording: {path}")
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+
+        self.labels = []
+        frame_chunks = {name: [] for name, _, _ in FRAME_COLUMNS}
+        detection_chunks = {name: [] for name, _, _ in DETECTION_COLUMNS}
+        offset = len(MAGIC)
+        while offset + CHUNK_HEADER.size <= len(self.data):
+            tag, num_frames, num_detections, labels_size = CHUNK_HEADER.unpack_from(self.data, offset)
+            if tag != CHUNK_TAG:
+                raise ValueError(f"Corrupt chunk at offset {offset} in {self.path}")
+            offset += CHUNK_HEADER.size
+            self.labels.extend(json.loads(bytes(self.data[offset:offset + labels_size])))
+            offset += labels_size
+            for columns, count, chunks in (
+                (FRAME_COLUMNS, num_frames, frame_chunks),
+                (DETECTION_COLUMNS, num_detections, detection_chunks)
+            ):
+                for name, dtype, shape in columns:
+                    offset += padding(offset)
+                    column = np.frombuffer(self.data, dtype=dtype, count=count * int(np.prod(shape)), offset=offset)
+                    chunks[name].append(column.reshape((count,) + shape))
+                    offset += column.nbytes
+            offset += padding(offset)
+
+        def join(chunks, dtype, shape):
+            if not chunks:
+                return np.zeros((0,) + shape, dtype)
+            return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+        self.frames = {name: join(frame_chunks[name], dtype, shape) for name, dtype, shape in FRAME_COLUMNS}
+        self.detections = {name: join(detection_chunks[name], dtype, shape) for name, dtype, shape in DETECTION_COLUMNS}
+        # Row of each frame's first detection:
+        self.offsets = np.zeros(len(self.frames["count"]) + 1, np.int64)
+        np.cumsum(self.frames["count"], out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.frames["count"])
+
+    def duration(self):
+        probe_times = self.frames["probe_time"]
+        return float(probe_times[-1] - probe_times[0]) if len(probe_times) else 0.0
+
+    # Yields the frames as event queue records (see event_queue.py):
+    #   (frame_index, pts, probe_time, ((label, confidence, track_id), ...))
+    def records(self):
+        labels = self.labels
+        label_ids = self.detections["label_id"].tolist()
+        confidences = self.detections["confidence"].tolist()
+        track_ids = [None if track_id < 0 else track_id for track_id in self.detections["track_id"].tolist()]
+        offsets = self.offsets.tolist()
+        frame_indices = self.frames["frame_index"].tolist()
+        pts = self.frames["pts"].tolist()
+        probe_times = self.frames["probe_time"].tolist()
+        for i in range(len(frame_indices)):
+            detections = tuple(
+                (labels[label_ids[row]], confidences[row], track_ids[row])
+                for row in range(offsets[i], offsets[i + 1])
+            )
+            yield (frame_indices[i], pts[i], probe_times[i], detections)
+
+# Replay loopback:
+# Stands in for both the detection gate and the SLM/TTS channel when the
+# handler is driven from a recording: every label is answered at once, so
+# the event logic keeps seeing frames. send_label takes the same arguments as
+# LabelChannel.send_label (ipc.py); bench_recording checks that they match.
+class ReplayLoopback:
+    def __init__(self, handler):
+        self.handler = handler
+        self.connected = threading.Event()
+        self.connected.set()
+        self.sent = []
+
+    def close(self, detected_at):
+        pass
+
+    def open(self, reason="resume"):
+        pass
+
+    def frame_passed(self, seen_at):
+        pass
+
+    def send_label(self, label, confidence=None, track_id=None, stream_id=None, codes=None):
+        self.sent.append((label, confidence, track_id, codes))
+        self.handler.slm_replied()
+        self.handler.resume()
+        return len(self.sent)
+
+# Replays a recording into 'handle' (e.g. DetectionEvents.handle_record).
+# speed=None replays as fast as possible, otherwise at 'speed' times real time.
+# Returns the wall-clock time the replay took.
+def replay_recording(recording, handle, speed=None):
+    start = time.monotonic()
+    first_probe_time = None
+    for record in recording.records():
+        if speed is not None:
+            if first_probe_time is None:
+                first_probe_time = record[2]
+            delay = (record[2] - first_probe_time) / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        handle(record)
+    return time.monotonic() - start
+
+def replay_into_handler(path, speed=None):
+    from .events import DetectionEvents
+
+    recording = DetectionRecording(path)
+    handler = DetectionEvents()
+    loopback = ReplayLoopback(handler)
+    handler.gate = loopback
+    handler.channel = loopback
+    elapsed = replay_recording(recording, handler.handle_record, speed)
+    duration = recording.duration()
+    print(
+        f"{RECORDING_LOG_FORMAT}Replayed {len(recording)} frames ({duration:.1f} s recorded) in {elapsed:.2f} s "
+        f"({duration / elapsed if elapsed else float('inf'):.0f}x real time), {len(loopback.sent)} events: "
+        f"{handler.tracks.stats()}"
+    )
+    return loopback.sent
+
+# Usage (from the repository root):
+#   python -m src.recording info detections.ddrec
+#   python -m src.recording replay detections.ddrec [speed]
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("info", "replay"):
+        print("Usage: python -m src.recording info|replay <recording> [speed]")
+        sys.exit(1)
+    if sys.argv[1] == "info":
+        recording = DetectionRecording(sys.argv[2])
+        print(
+            f"{len(recording)} frames, {len(recording.detections['label_id'])} detections, "
+            f"{recording.duration():.1f} s, labels: {recording.labels}"
+        )
+    else:
+        replay_into_handler(sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else None)
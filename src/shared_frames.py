@@ -0,0 +1,165 @@
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+from .sources import FrameSource, FramePacer
+
+SHARED_FRAMES_LOG_FORMAT = "\033[1;36m[shared_frames] \033[0m \t"
+
+# Shared frame ring:
+# 'slots' frames of one geometry in a single multiprocessing.shared_memory
+# block. Slots are handed back and forth as indices through two queues, so
+# only (slot, frame_index, capture_time) tuples cross the process boundary:
+# - free:  slots the capture process may write into
+# - ready: written slots, in capture order; None marks the end of the stream
+class SharedFrameRing:
+    def __init__(self, width, height, slots=4, channels=3, name=None, context=None):
+        self.shape = (height, width, channels)
+        self.slots = slots
+        frame_bytes = height * width * channels
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=frame_bytes * slots)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        if context is not None:
+            self.free = context.Queue()
+            self.ready = context.Queue()
+            for slot in range(slots):
+                self.free.put(slot)
+
+    # What the capture process needs to attach to the ring:
+    def handle(self):
+        return (self.shm.name, self.shape[1], self.shape[0], self.slots, self.shape[2], self.free, self.ready)
+
+    @classmethod
+    def attach(cls, handle):
+        name, width, height, slots, channels, free, ready = handle
+        ring = cls(width, height, slots, channels, name=name)
+        ring.free = free
+        ring.ready = ready
+        return ring
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+# Capture process:
+# Opens the (pickled, not yet opened) source, paces it if needed and writes
+# every frame into a free slot, converting B, G, R frames to R, G, B on the
+# way. A live source never waits for a slot: with none free the frame is
+# dropped and counted. Replays wait, so no frame is lost.
+def capture_process_main(source, handle, stop, dropped):
+    ring = SharedFrameRing.attach(handle)
+    pacer = FramePacer(source.fps, enabled=source.realtime and not source.self_paced)
+    frame_index = 0
+    try:
+        with source:
+            while not stop.is_set():
+                pacer.wait()
+                frame = source.read()
+                if frame is None:
+                    break
+                capture_time = time.monotonic()
+                slot = None
+                while slot is None and not stop.is_set():
+                    try:
+                        slot = ring.free.get(block=not source.realtime, timeout=0.5)
+                    except queue.Empty:
+                        if source.realtime:
+                            break
+                if slot is None:
+                    if source.realtime:
+                        with dropped.get_lock():
+                            dropped.value += 1
+                    continue
+                if source.bgr:
+                    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=ring.frames[slot])
+                else:
+                    np.copyto(ring.frames[slot], frame)
+                ring.ready.put((slot, frame_index, capture_time))
+                frame_index += 1
+    finally:
+        ring.ready.put(None)
+        ring.close()
+
+# Process frame source:
+# A FrameSource whose frames are captured (and colour converted) by another
+# source in a separate process, so decoding, camera handling and conversion
+# do not compete with the GStreamer callbacks for this process' GIL. read()
+# returns a view of the shared slot; the slot goes back to the capture process
+# on the next read(), after push_thread_func copied the frame into its buffer.
+class ProcessFrameSource(FrameSource):
+    self_paced = True   # The capture process paces the source
+
+    def __init__(self, source, slots=4):
+        super().__init__(source.width, source.height, source.fps, realtime=source.realtime)
+        self.source = source
+        self.slots = slots
+        self.context = multiprocessing.get_context("spawn")
+        self.ring = None
+        self.process = None
+        self.stop = None
+        self.dropped = self.context.Value("L", 0)
+        self.current_slot = None
+
+    def open(self):
+        self.ring = SharedFrameRing(self.width, self.height, self.slots, context=self.context)
+        self.stop = self.context.Event()
+        self.process = self.context.Process(
+            target=capture_process_main,
+            args=(self.source, self.ring.handle(), self.stop, self.dropped),
+            name="capture",
+            daemon=True
+        )
+        self.process.start()
+        print(f"{SHARED_FRAMES_LOG_FORMAT}Capture process {self.process.pid} started with {self.slots} shared slots.")
+
+    def read(self):
+        self._release()
+        while True:
+            try:
+                item = self.ring.ready.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if not self.process.is_alive():
+                    return None
+        if item is None:
+            return None
+        slot, frame_index, capture_time = item
+        self.current_slot = slot
+        self.capture_time = capture_time
+        return self.ring.frames[slot]
+
+    def _release(self):
+        if self.current_slot is not None:
+            self.ring.free.put(self.current_slot)
+            self.current_slot = None
+
+    def close(self):
+        if self.process is None:
+            return
+        self.stop.set()
+        self._release()
+        # Keep handing slots back until the capture process has seen the stop:
+        while self.process.is_alive():
+            try:
+                item = self.ring.ready.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            self.ring.free.put(item[0])
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+        self.ring.close()
+        self.process = None
+        print(f"{SHARED_FRAMES_LOG_FORMAT}Capture process stopped, {self.dropped.value} frames dropped for lack of a free slot.")
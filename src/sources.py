@@ -0,0 +1,304 @@
+import os
+import time
+import cv2
+import numpy as np
+
+RESOURCES_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../resources")
+)
+
+# Frame sources:
+# Everything that can feed the 'app_source' element of the pipeline. A source
+# exposes its geometry before it is opened (the pipeline caps are built from it)
+# and hands out HxWx3 uint8 frames from read() until it returns None.
+#
+# - bgr:      True if frames are in B, G, R byte order and need a swap before pushing
+# - realtime: True to pace frames at 'fps', False to push them as fast as possible
+# - self_paced: True if read() already blocks until the next frame (cameras)
+# - capture_time: time.monotonic() at which the last frame was captured, for
+#   sources that know it better than the moment read() returned (else None)
+class FrameSource:
+    bgr = False
+    self_paced = False
+    capture_time = None
+
+    def __init__(self, width, height, fps, realtime=True):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.realtime = realtime
+
+    def open(self):
+        pass
+
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Pi Camera source:
+# Picamera2 names formats after the little-endian word, so 'BGR888' yields
+# R, G, B byte order and 'RGB888' yields B, G, R. The camera paces itself,
+# so 'realtime' is always True.
+class PicameraSource(FrameSource):
+    self_paced = True
+
+    def __init__(self, width=1280, height=720, fps=30, format='BGR888'):
+        super().__init__(width, height, fps, realtime=True)
+        self.format = format
+        self.bgr = format == 'RGB888'
+        self.cam = None
+
+    def open(self):
+        # Imported here so the other sources work on machines without a camera:
+        from picamera2 import Picamera2
+
+        self.cam = Picamera2()
+        main_conf = {
+            'size': (self.width, self.height),
+            'format': self.format
+        }
+        controls = {'FrameRate': self.fps}
+
+        config = self.cam.create_preview_configuration(
+            main=main_conf,
+            controls=controls
+        )
+        self.cam.configure(config)
+
+        self.width, self.height = config['main']['size']
+        self.fps = config['controls']['FrameRate']
+        self.cam.start()
+
+    def read(self):
+        return self.cam.capture_array('main')
+
+    def close(self):
+        if self.cam is not None:
+            self.cam.close()
+            self.cam = None
+
+# Dual-stream camera source:
+# The ISP scales a second, low-resolution ('lores') stream of the same field of
+# view next to the main one, so inference frames leave the camera at model
+# resolution instead of being converted, copied and scaled down at full size.
+# read() returns the lores frame; the main frame of the same request is only
+# fetched while 'keep_main' is set (display, snapshots) and is then in
+# 'main_frame'. Both streams show the same field of view, so normalized
+# detection coordinates are valid in either (see detections.bbox_to_pixels).
+# Only the Pi 5 ISP outputs RGB on the lores stream; older ones give YUV420,
+# which is then converted to R, G, B here, at lores size.
+class DualStreamCameraSource(PicameraSource):
+    def __init__(self, width=1280, height=720, fps=30, lores_width=640, lores_height=360,
+                 format='BGR888', keep_main=False):
+        super().__init__(width, height, fps, format=format)
+        self.main_width = width
+        self.main_height = height
+        self.width = lores_width
+        self.height = lores_height
+        self.keep_main = keep_main
+        self.main_frame = None
+        self.lores_format = format
+        self.rgb = None
+
+    def open(self):
+        from picamera2 import Picamera2
+
+        self.cam = Picamera2()
+        for lores_format in (self.format, 'YUV420'):
+            config = self.cam.create_preview_configuration(
+                main={'size': (self.main_width, self.main_height), 'format': self.format},
+                lores={'size': (self.width, self.height), 'format': lores_format},
+                controls={'FrameRate': self.fps}
+            )
+            try:
+                self.cam.configure(config)
+            except (RuntimeError, ValueError):
+                if lores_format == 'YUV420':
+                    raise
+                continue
+            break
+
+        self.lores_format = lores_format
+        if lores_format == 'YUV420':
+            self.bgr = False    # Converted straight to R, G, B in read()
+        self.main_width, self.main_height = config['main']['size']
+        self.width, self.height = config['lores']['size']
+        self.fps = config['controls']['FrameRate']
+        self.cam.start()
+
+    def read(self):
+        if self.keep_main:
+            (self.main_frame, lores), metadata = self.cam.capture_arrays(["main", "lores"])
+        else:
+            lores = self.cam.capture_array('lores')
+        if self.lores_format != 'YUV420':
+            return lores
+        # Planar YUV420 rows may be padded to the ISP's stride; the padding ends
+        # up in extra columns on the right, which are cut off:
+        if self.rgb is None:
+            self.rgb = np.empty((self.height, lores.shape[1], 3), dtype=np.uint8)
+        cv2.cvtColor(lores, cv2.COLOR_YUV420p2RGB, dst=self.rgb)
+        return self.rgb[:, :self.width]
+
+# File replay source:
+# Decodes a video file (e.g. the bundled resources/example.mp4) with OpenCV.
+# The geometry is probed when the source is created so the pipeline can be
+# built before the thread starts reading.
+class FileSource(FrameSource):
+    bgr = True
+
+    def __init__(self, path, realtime=True, loop=False, max_frames=None):
+        if not os.path.isabs(path) and not os.path.exists(path):
+            path = os.path.join(RESOURCES_DIR, path)
+        self.path = path
+        self.loop = loop
+        self.max_frames = max_frames
+        self.capture = None
+        self.frames_read = 0
+
+        capture = cv2.VideoCapture(self.path)
+        if not capture.isOpened():
+            raise FileNotFoundError(f"Could not open video file: {self.path}")
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = int(round(capture.get(cv2.CAP_PROP_FPS))) or 30
+        capture.release()
+
+        super().__init__(width, height, fps, realtime=realtime)
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.path)
+        self.frames_read = 0
+
+    def read(self):
+        if self.max_frames is not None and self.frames_read >= self.max_frames:
+            return None
+
+        ok, frame = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+        if not ok:
+            return None
+
+        self.frames_read += 1
+        return frame
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+# Synthetic source:
+# Deterministic frames (a square sweeping over a gradient) for CPU-only runs.
+# A small set of frames is rendered up front and cycled, so generating frames
+# costs nothing compared to the path being measured.
+class SyntheticSource(FrameSource):
+    def __init__(self, width=1280, height=720, fps=30, realtime=False, num_frames=None, cycle=30):
+        super().__init__(width, height, fps, realtime=realtime)
+        self.num_frames = num_frames
+        self.cycle = cycle
+        self.frames = []
+        self.frames_read = 0
+
+    def open(self):
+        gradient = np.linspace(0, 255, self.width, dtype=np.uint8)
+        background = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        background[:] = gradient[None, :, None]
+
+        side = max(self.height // 4, 1)
+        self.frames = []
+        for i in range(self.cycle):
+            frame = background.copy()
+            x = (i * (self.width - side)) // max(self.cycle - 1, 1)
+            y = (self.height - side) // 2
+            frame[y:y + side, x:x + side] = (255, 64, 0)
+            self.frames.append(frame)
+        self.frames_read = 0
+
+    def read(self):
+        if self.num_frames is not None and self.frames_read >= self.num_frames:
+            return None
+        frame = self.frames[self.frames_read % self.cycle]
+        self.frames_read += 1
+        return frame
+
+# Memory source:
+# Replays frames held in memory, cycling through them until 'num_frames' were
+# read. from_source() preloads them from another source, optionally resized, so
+# a replay costs neither decoding nor scaling - like a camera handing over
+# ready frames.
+class MemorySource(FrameSource):
+    def __init__(self, frames, fps=30, realtime=True, num_frames=None, bgr=False):
+        height, width = frames[0].shape[:2]
+        super().__init__(width, height, fps, realtime=realtime)
+        self.frames = frames
+        self.num_frames = num_frames
+        self.bgr = bgr
+        self.frames_read = 0
+
+    @classmethod
+    def from_source(cls, source, max_frames=300, size=None, realtime=True, num_frames=None):
+        frames = []
+        with source:
+            while len(frames) < max_frames:
+                frame = source.read()
+                if frame is None:
+                    break
+                if size is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+                    frame = cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+                elif source.self_paced:
+                    frame = frame.copy()
+                frames.append(frame)
+        if not frames:
+            raise ValueError("The source did not return any frames to preload")
+        return cls(frames, source.fps, realtime=realtime, num_frames=num_frames, bgr=source.bgr)
+
+    def open(self):
+        self.frames_read = 0
+
+    def read(self):
+        if self.num_frames is not None and self.frames_read >= self.num_frames:
+            return None
+        frame = self.frames[self.frames_read % len(self.frames)]
+        self.frames_read += 1
+        return frame
+
+# Frame pacer:
+# Sleeps until the next frame is due when a source replays in real time.
+# Deadlines are absolute, so slow frames do not accumulate drift.
+class FramePacer:
+    def __init__(self, fps, enabled=True):
+        self.period = 1.0 / fps
+        self.enabled = enabled
+        self.next_deadline = None
+
+    def wait(self):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if self.next_deadline is None:
+            self.next_deadline = now
+        delay = self.next_deadline - now
+        if delay > 0:
+            time.sleep(delay)
+        self.next_deadline = max(self.next_deadline + self.period, now - self.period)
+
+# Source factory:
+# Maps a short spec to a source: 'rpi', 'synthetic', or a video file path
+# (bare file names are looked up in the resources folder).
+def make_source(spec, realtime=True, **kwargs):
+    if spec == 'rpi':
+        return PicameraSource(**kwargs)
+    if spec == 'synthetic':
+        return SyntheticSource(realtime=realtime, **kwargs)
+    return FileSource(spec, realtime=realtime, **kwargs)
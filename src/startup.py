@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import requests
+
+STARTUP_LOG_FORMAT = "\033[1;35m[startup] \033[0m \t"
+
+OLLAMA_BASE_URL = "http://127.0.0.1:11434"
+DEFAULT_MODEL = "gemma:2b-instruct"
+
+# Readiness channel:
+# The orchestrator starts every component with the write end of one pipe,
+# named by READY_FD_ENV, and the time.monotonic() it started at in
+# START_TIME_ENV. A component writes one JSON line per readiness event when it
+# actually gets there (socket listening, pipeline PLAYING, first frame, ...),
+# so nothing waits a fixed time. Started by hand, components only log.
+READY_FD_ENV = "DETECTION_DEVICE_READY_FD"
+START_TIME_ENV = "DETECTION_DEVICE_START"
+
+_ready_lock = threading.Lock()
+
+def startup_time():
+    start = os.environ.get(START_TIME_ENV)
+    return float(start) if start else None
+
+def notify_ready(component, event="ready", **info):
+    now = time.monotonic()
+    start = startup_time()
+    elapsed = f" after {(now - start) * 1000:.0f} ms" if start is not None else ""
+    print(f"{STARTUP_LOG_FORMAT}{component}: {event}{elapsed}")
+
+    fd = os.environ.get(READY_FD_ENV)
+    if not fd:
+        return
+    message = json.dumps({"component": component, "event": event, "time": now, **info}) + "\n"
+    with _ready_lock:
+        try:
+            os.write(int(fd), message.encode())
+        except OSError:
+            pass
+
+# Ollama:
+# 'ollama serve' is started if its API does not answer, then polled at a short
+# interval (the API is its only readiness signal) instead of sleeping. The
+# model is pulled once if missing; warming it up is the SLM server's job, see
+# LabelProcessingServer.warm_up.
+def ollama_running(base_url=OLLAMA_BASE_URL):
+    try:
+        return requests.get(f"{base_url}/api/version", timeout=0.5).ok
+    except requests.RequestException:
+        return False
+
+def wait_for_ollama(base_url=OLLAMA_BASE_URL, timeout=30.0, interval=0.05):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if ollama_running(base_url):
+            return True
+        time.sleep(interval)
+    return False
+
+def ensure_model(model, base_url=OLLAMA_BASE_URL):
+    tags = requests.get(f"{base_url}/api/tags", timeout=5).json()
+    names = {entry["name"] for entry in tags.get("models", [])}
+    if model in names:
+        return
+    print(f"{STARTUP_LOG_FORMAT}Pulling Ollama model {model}...")
+    response = requests.post(f"{base_url}/api/pull", json={"model": model, "stream": False}, timeout=None)
+    response.raise_for_status()
+
+# Startup orchestrator:
+# Starts Ollama (if needed), the SLM/TTS server and the detector at the same
+# time and reports each readiness event as it arrives:
+# - ollama:     API answering
+# - slm_server: listening on the channel; model_warm once the warm-up request
+#               returned (time to first answer)
+# - detector:   pipeline_playing once the pipeline (HEF included) is set up;
+#               first_frame when the first frame reaches the callback probe
+# The detector runs in the foreground. An SLM/TTS server that is already
+# running is reused (its readiness was reported when it started).
+class StartupOrchestrator:
+    def __init__(self, model=DEFAULT_MODEL, log_dir=".", start_server=True):
+        self.model = model
+        self.log_dir = log_dir
+        self.start_server = start_server
+        self.start = time.monotonic()
+        self.events = {}    # (component, event) -> seconds since start
+        self.read_fd, self.write_fd = os.pipe()
+
+    def environment(self):
+        env = dict(os.environ)
+        env[READY_FD_ENV] = str(self.write_fd)
+        env[START_TIME_ENV] = repr(self.start)
+        return env
+
+    # Background services are detached, so they outlive the detector like they
+    # did when start.sh started them with nohup.
+    def spawn(self, name, command, log_file=None, ready=True, detach=False):
+        stdout = open(os.path.join(self.log_dir, log_file), "ab") if log_file else None
+        process = subprocess.Popen(
+            command,
+            env=self.environment() if ready else None,
+            pass_fds=(self.write_fd,) if ready else (),
+            stdout=stdout,
+            stderr=subprocess.STDOUT if stdout else None,
+            start_new_session=detach
+        )
+        if stdout is not None:
+            stdout.close()
+        print(f"{STARTUP_LOG_FORMAT}Started {name} (pid {process.pid}).")
+        return process
+
+    def record(self, component, event, at):
+        elapsed = at - self.start
+        self.events[(component, event)] = elapsed
+        print(f"{STARTUP_LOG_FORMAT}{component}: {event} after {elapsed * 1000:.0f} ms")
+        if (component, event) == ("detector", "first_frame"):
+            print(f"{STARTUP_LOG_FORMAT}Time to first inferred frame: {elapsed:.2f} s")
+        elif (component, event) == ("slm_server", "model_warm"):
+            print(f"{STARTUP_LOG_FORMAT}Time to first answer: {elapsed:.2f} s")
+
+    def _read_events(self):
+        with os.fdopen(self.read_fd, "r") as pipe:
+            for line in pipe:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                self.record(message["component"], message["event"], message["time"])
+
+    def _start_ollama(self):
+        if not ollama_running():
+            if shutil.which("ollama") is None:
+                print(f"{STARTUP_LOG_FORMAT}Ollama is not installed, the SLM server will not get any facts.")
+                return
+            self.spawn("ollama", ["ollama", "serve"], "ollama_server.log", ready=False, detach=True)
+            if not wait_for_ollama():
+                print(f"{STARTUP_LOG_FORMAT}Ollama API did not come up.")
+                return
+        self.record("ollama", "ready", time.monotonic())
+        try:
+            ensure_model(self.model)
+        except requests.RequestException as e:
+            print(f"{STARTUP_LOG_FORMAT}Could not check the Ollama model: {e}")
+
+    def run(self):
+        reader = threading.Thread(target=self._read_events, daemon=True)
+        reader.start()
+
+        # The SLM server waits for Ollama on its own, so all three start together:
+        ollama_thread = threading.Thread(target=self._start_ollama, daemon=True)
+        ollama_thread.start()
+        if self.start_server and not server_running():
+            self.spawn("SLM/TTS server", [sys.executable, "-m", "src.info_server"], "slm_tts.log", detach=True)
+        detector = self.spawn("detector", [sys.executable, "main.py"])
+        os.close(self.write_fd)
+
+        try:
+            return detector.wait()
+        except KeyboardInterrupt:
+            # The detector got the same SIGINT and shuts down on its own:
+            return detector.wait()
+        finally:
+            print(f"{STARTUP_LOG_FORMAT}Startup timeline: " + ", ".join(
+                f"{component} {event} {elapsed:.2f} s" for (component, event), elapsed in self.events.items()
+            ))
+
+def server_running():
+    return subprocess.run(["pgrep", "-f", "src.info_server"], stdout=subprocess.DEVNULL).returncode == 0
+
+# Usage (from the repository root, after sourcing setup_env.sh):
+#   python -m src.startup
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start Ollama, the SLM/TTS server and the detector concurrently.")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--log-dir", default=".", help="where ollama_server.log and slm_tts.log go")
+    parser.add_argument("--no-server", action="store_true", help="use an SLM/TTS server that is already running")
+    args = parser.parse_args()
+
+    orchestrator = StartupOrchestrator(args.model, args.log_dir, start_server=not args.no_server)
+    sys.exit(orchestrator.run())
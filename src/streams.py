@@ -0,0 +1,14 @@
+# Stream IDs:
+# With several frame sources sharing one inference stage, the stream a frame
+# came from travels in the lowest bits of its PTS: every element keeps the PTS,
+# so the callback can demultiplex without any metadata. Tagging moves a PTS by
+# less than MAX_STREAMS nanoseconds.
+# Kept free of GStreamer so the event logic can be replayed off the device
+# (see events.py and recording.py); camera.py re-exports these.
+MAX_STREAMS = 8
+
+def tag_stream(pts, stream_id):
+    return pts - pts % MAX_STREAMS + stream_id
+
+def stream_of(pts):
+    return pts % MAX_STREAMS
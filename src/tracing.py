@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+import threading
+import time
+
+TRACE_LOG_FORMAT = "\033[1;34m[tracing] \033[0m \t"
+
+# Directory for trace files; tracing is off unless this environment variable is set.
+TRACE_DIR_ENV = "DETECTION_DEVICE_TRACE"
+
+def trace_path(name):
+    trace_dir = os.environ.get(TRACE_DIR_ENV)
+    if not trace_dir:
+        return None
+    os.makedirs(trace_dir, exist_ok=True)
+    return os.path.join(trace_dir, f"{name}.trace.json")
+
+# Trace recorder:
+# Collects events in Chrome trace-event format (chrome://tracing, Perfetto).
+# Timestamps come from time.monotonic(), which is system-wide on Linux, so
+# files written by different processes line up when merged.
+class TraceRecorder:
+    def __init__(self, process_name, max_events=200000):
+        self.pid = os.getpid()
+        self.max_events = max_events
+        self.events = [{
+            "name": "process_name", "ph": "M", "pid": self.pid, "tid": 0,
+            "args": {"name": process_name}
+        }]
+        self.thread_names = set()
+        self.lock = threading.Lock()
+
+    def _append(self, event):
+        with self.lock:
+            if len(self.events) >= self.max_events:
+                return
+            tid = event["tid"]
+            if tid not in self.thread_names:
+                self.thread_names.add(tid)
+                self.events.append({
+                    "name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                    "args": {"name": threading.current_thread().name}
+                })
+            self.events.append(event)
+
+    # Complete event between two time.monotonic() values, on the calling thread.
+    def complete(self, name, start, end, args=None):
+        self._append({
+            "name": name, "ph": "X", "pid": self.pid, "tid": threading.get_ident(),
+            "ts": start * 1e6, "dur": max(end - start, 0.0) * 1e6, "args": args or {}
+        })
+
+    def instant(self, name, at=None, args=None):
+        self._append({
+            "name": name, "ph": "i", "s": "t", "pid": self.pid, "tid": threading.get_ident(),
+            "ts": (time.monotonic() if at is None else at) * 1e6, "args": args or {}
+        })
+
+    def dump(self, path):
+        with self.lock:
+            events = list(self.events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"{TRACE_LOG_FORMAT}Wrote {len(events)} trace events to {path}")
+
+# Frame tracer:
+# Follows one frame in 'sample_every' through the pipeline. The push thread
+# stamps a sampled frame with its capture time, keyed by its PTS (which every
+# element keeps), and pad probes at stage boundaries mark when the frame gets
+# there. Each stage becomes a complete event from the previous mark, on the
+# thread that reached the stage, so cross-thread hand-offs show up directly.
+class FrameTracer(TraceRecorder):
+    def __init__(self, process_name="detector", sample_every=30, max_frames=256, **kwargs):
+        super().__init__(process_name, **kwargs)
+        self.sample_every = sample_every
+        self.max_frames = max_frames
+        self.frames = {}    # pts -> (last stage, last mark time)
+
+    def sampled(self, frame_index):
+        return frame_index % self.sample_every == 0
+
+    def stamp(self, pts, capture_time):
+        with self.lock:
+            if len(self.frames) >= self.max_frames:
+                # Frames that never reached the last stage (e.g. dropped) expire here:
+                self.frames.pop(next(iter(self.frames)))
+            self.frames[pts] = ("capture", capture_time)
+
+    def mark(self, stage, pts, at=None, final=False):
+        entry = self.frames.get(pts)
+        if entry is None:
+            return
+        at = time.monotonic() if at is None else at
+        previous_stage, previous_time = entry
+        self.complete(stage, previous_time, at, {"pts": pts, "from": previous_stage})
+        with self.lock:
+            if final:
+                self.frames.pop(pts, None)
+            else:
+                self.frames[pts] = (stage, at)
+
+    # Adds a buffer probe on the src pad of each named element, marking 'stage'.
+    # stages: list of (stage name, element name) in pipeline order.
+    def attach(self, pipeline, stages):
+        from gi.repository import Gst
+
+        def probe(pad, info, stage):
+            buffer = info.get_buffer()
+            if buffer is not None and buffer.pts in self.frames:
+                self.mark(stage, buffer.pts)
+            return Gst.PadProbeReturn.OK
+
+        for stage, element_name in stages:
+            element = pipeline.get_by_name(element_name)
+            if element is None:
+                print(f"{TRACE_LOG_FORMAT}Element {element_name} not found, stage '{stage}' is not traced.")
+                continue
+            element.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, probe, stage)
+
+# Capture -> stage latencies (ms) per traced frame, from a FrameTracer's events:
+# a frame's first event starts at its capture time.
+def stage_latencies(tracer, stages):
+    frames = {}
+    for event in tracer.events:
+        if event.get("ph") != "X" or "pts" not in event["args"]:
+            continue
+        frame = frames.setdefault(event["args"]["pts"], {})
+        frame["capture"] = min(frame.get("capture", event["ts"]), event["ts"])
+        frame[event["name"]] = event["ts"] + event["dur"]
+    latencies = {stage: [] for stage in stages}
+    for frame in frames.values():
+        for stage in stages:
+            if stage in frame:
+                latencies[stage].append((frame[stage] - frame["capture"]) / 1000)
+    return latencies
+
+# Merges trace files from several processes into one file for the viewer:
+#   python -m src.tracing merged.json detector.trace.json slm.trace.json
+def merge_traces(output, inputs):
+    events = []
+    for path in inputs:
+        with open(path) as f:
+            events.extend(json.load(f)["traceEvents"])
+    with open(output, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    print(f"{TRACE_LOG_FORMAT}Merged {len(inputs)} traces ({len(events)} events) into {output}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m src.tracing <output.json> <trace.json> [<trace.json> ...]")
+        sys.exit(1)
+    merge_traces(sys.argv[1], sys.argv[2:])
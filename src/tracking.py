@@ -0,0 +1,123 @@
+from collections import OrderedDict
+
+# Track table:
+# Per-track state for event triggering, keyed by the tracker's unique ID
+# (detections without one fall back to one pseudo-track per label). A track
+# emits an event once it has been seen for 'dwell_time' with at least
+# 'min_confidence'. It emits again only if it returns after being absent for
+# 'return_after' and its last event is older than 'cooldown'. Tracks not seen
+# for 'expire_after' are evicted, and at most 'max_tracks' are kept.
+# A frame emits at most one event, for its most confident eligible track; the
+# others are not stamped and stay eligible, so they fire on a later frame.
+#
+# Times come from the frames themselves (the probe timestamps), and a gap in
+# the frame stream - e.g. while the detection gate is closed - advances the
+# table's clock by at most 'max_frame_gap'. A person standing still while the
+# SLM/TTS stage talks is therefore neither absent nor returning afterwards.
+class Track:
+    __slots__ = ("label", "confidence", "first_seen", "last_seen", "last_event")
+
+    def __init__(self, label, confidence, now):
+        self.label = label
+        self.confidence = confidence
+        self.first_seen = now
+        self.last_seen = now
+        self.last_event = None
+
+class TrackTable:
+    def __init__(self, dwell_time=0.5, min_confidence=0.5, cooldown=30.0,
+                 return_after=3.0, expire_after=60.0, max_tracks=256, max_frame_gap=0.5):
+        self.dwell_time = dwell_time
+        self.min_confidence = min_confidence
+        self.cooldown = cooldown
+        self.return_after = return_after
+        self.expire_after = expire_after
+        self.max_tracks = max_tracks
+        self.max_frame_gap = max_frame_gap
+
+        self.tracks = OrderedDict()     # key -> Track, least recently seen first
+        self.clock = 0.0
+        self.last_time = None
+
+        self.new_tracks = 0
+        self.returning_tracks = 0
+        self.events = 0
+        self.evicted = 0
+
+    # Feeds one frame's detections, as (label, confidence, track_id) tuples seen at
+    # time 'now' (seconds). Returns the detection that should trigger an event, as
+    # a list of at most one.
+    def update(self, now, detections):
+        if self.last_time is not None:
+            self.clock += min(max(now - self.last_time, 0.0), self.max_frame_gap)
+        self.last_time = now
+        clock = self.clock
+
+        best = None
+        for label, confidence, track_id in detections:
+            if confidence < self.min_confidence:
+                continue
+            key = track_id if track_id is not None else ("label", label)
+
+            track = self.tracks.get(key)
+            if track is None:
+                track = Track(label, confidence, clock)
+                self.tracks[key] = track
+                self.new_tracks += 1
+            else:
+                if clock - track.last_seen > self.return_after:
+                    # Back after an absence: the dwell time starts over
+                    track.first_seen = clock
+                    self.returning_tracks += 1
+                track.label = label
+                track.confidence = confidence
+                track.last_seen = clock
+                self.tracks.move_to_end(key)
+
+            if clock - track.first_seen < self.dwell_time:
+                continue
+            if track.last_event is not None and (
+                track.last_event >= track.first_seen or clock - track.last_event < self.cooldown
+            ):
+                continue
+            if best is None or confidence > best[1][1]:
+                best = (track, (label, confidence, track_id))
+
+        events = []
+        if best is not None:
+            track, event = best
+            track.last_event = clock
+            self.events += 1
+            events.append(event)
+        self._evict(clock)
+        return events
+
+    def _evict(self, clock):
+        # Least recently seen tracks come first, so stop at the first live one:
+        while self.tracks:
+            key, track = next(iter(self.tracks.items()))
+            if len(self.tracks) <= self.max_tracks and clock - track.last_seen <= self.expire_after:
+                break
+            del self.tracks[key]
+            self.evicted += 1
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def stats(self):
+        return {
+            "tracks": len(self.tracks),
+            "new": self.new_tracks,
+            "returning": self.returning_tracks,
+            "events": self.events,
+            "evicted": self.evicted
+        }
+
+# Replays recorded detections, as (time, detections) pairs, through a table and
+# returns the (time, event) pairs it emits. Used to tune the parameters offline.
+def replay_detections(table, records):
+    emitted = []
+    for now, detections in records:
+        for event in table.update(now, detections):
+            emitted.append((now, event))
+    return emitted